@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+""" Time typical notebook draws for bit generators, with and without buffering
+
+Each draw is a call like those in the book, made once per trial, such as
+``rnd.choice(['heads', 'tails'], size=20)``.  We report the time per call, in
+microseconds.
+"""
+
+from argparse import ArgumentParser, RawDescriptionHelpFormatter
+from pathlib import Path
+import sys
+import timeit
+
+HERE = Path(__file__).parent
+sys.path.append(str(HERE.parent / 'source'))
+
+from resampling.rng import BIT_GENERATORS, make_generator
+
+COINS = ['heads', 'tails']
+DIE = [1, 2, 3, 4, 5, 6]
+
+# Typical draws from the notebooks.
+DRAWS = {
+    'random()': lambda rnd: rnd.random(),
+    'integers(0, 2, 20)': lambda rnd: rnd.integers(0, 2, size=20),
+    'integers(1, 7, 2)': lambda rnd: rnd.integers(1, 7, size=2),
+    'choice(coins, 20)': lambda rnd: rnd.choice(COINS, size=20),
+    'choice(die, 10)': lambda rnd: rnd.choice(DIE, size=10),
+    'choice(2, p, 1)': lambda rnd: rnd.choice(COINS, p=[0.7, 0.3]),
+    'random(100_000)': lambda rnd: rnd.random(100_000),
+}
+
+
+def get_parser():
+    parser = ArgumentParser(description=__doc__,  # Usage from docstring
+                            formatter_class=RawDescriptionHelpFormatter)
+    parser.add_argument('-n', '--number', type=int, default=10_000,
+                        help='Number of calls to time for each draw')
+    parser.add_argument('-b', '--buffer-size', type=int, default=2 ** 16,
+                        help='Buffer size for buffered generators')
+    return parser
+
+
+def main():
+    parser = get_parser()
+    args = parser.parse_args()
+    configs = [(name, size) for name in BIT_GENERATORS
+               for size in (0, args.buffer_size)]
+    col_names = [f'{name}{"+buf" if size else ""}' for name, size in configs]
+    print(f'{"draw":20s}' + ''.join(f'{c:>14s}' for c in col_names))
+    for draw_name, draw in DRAWS.items():
+        # Fewer calls for large draws.
+        number = args.number
+        if '_' in draw_name:
+            number = max(10, number // 100)
+        row = []
+        for bg_name, size in configs:
+            rnd = make_generator(1014, bg_name, size)
+            secs = min(timeit.repeat(lambda: draw(rnd), number=number,
+                                     repeat=3))
+            row.append(secs / number * 1e6)
+        print(f'{draw_name:20s}' + ''.join(f'{t:14.2f}' for t in row))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+""" Report and check import time of the book helper modules
+
+We run ``python -X importtime`` in the ``source`` directory, once to import
+nothing, and once to import each helper module.  The import time for a module
+is the sum of the cumulative times of the top-level imports that were not in
+the baseline run, in milliseconds, minimum over several repeats.  We also
+list the imports taking the most time on their own.
+
+``_common.py`` is not a module; the notebooks run it as a script, so we time
+``exec`` of its source, with the seed that ``_common.R`` would inject.
+
+Exits with status 1 if any module is over its budget.  Use
+``--budget liquor_analysis=80`` to override the budget for a module.
+"""
+
+from argparse import ArgumentParser, RawDescriptionHelpFormatter
+from pathlib import Path
+import re
+import subprocess
+import sys
+
+HERE = Path(__file__).parent
+SOURCE = HERE.parent / 'source'
+
+# Import time budgets in milliseconds.  These are loose enough to allow for
+# slow machines, but tight enough to catch an eager import of Pandas or
+# Matplotlib, or loading data at import.
+BUDGETS = {
+    '_common.py': 150,
+    'gridtabber': 20,
+    'liquor_analysis': 150,
+    'data': 150,
+    'resampling': 300,
+}
+
+# Lines from -X importtime output.
+IMPORT_RE = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)')
+
+
+def parse_importtime(stderr):
+    """ Return list of (module, self_us, cumulative_us, level) tuples
+
+    `level` is 0 for top-level imports, 1 for imports these trigger, and so
+    on.
+    """
+    records = []
+    for line in stderr.splitlines():
+        match = IMPORT_RE.match(line)
+        if match is None:
+            continue
+        self_us, cum_us, indent, name = match.groups()
+        records.append((name, int(self_us), int(cum_us), len(indent) // 2))
+    return records
+
+
+def import_code(module):
+    if module.endswith('.py'):
+        return (f'_QUARTO_SEED = 1014\n'
+                f'exec(open({module!r}).read())')
+    return f'import {module}'
+
+
+def run_importtime(code, cwd=SOURCE):
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                          cwd=cwd, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f'Failed to run {code!r}:\n{proc.stderr}')
+    return parse_importtime(proc.stderr)
+
+
+def new_imports(records, baseline):
+    """ Records for modules not imported in `baseline`
+    """
+    seen = {r[0] for r in baseline}
+    return [r for r in records if r[0] not in seen]
+
+
+def import_ms(module, n_repeats=3):
+    """ Import time for `module` in ms, and new imports for best run
+    """
+    baseline = run_importtime('pass')
+    best = None
+    for _ in range(n_repeats):
+        records = new_imports(run_importtime(import_code(module)), baseline)
+        total = sum(r[2] for r in records if r[3] == 0) / 1000
+        if best is None or total < best[0]:
+            best = (total, records)
+    return best
+
+
+def parse_budgets(specs):
+    budgets = dict(BUDGETS)
+    for spec in specs:
+        module, _, ms = spec.partition('=')
+        if not ms:
+            raise ValueError(f'Budget should be <module>=<ms>, not {spec!r}')
+        budgets[module] = float(ms)
+    return budgets
+
+
+def get_parser():
+    parser = ArgumentParser(description=__doc__,  # Usage from docstring
+                            formatter_class=RawDescriptionHelpFormatter)
+    parser.add_argument('modules', nargs='*',
+                        help='Modules to check (default all with budgets)')
+    parser.add_argument('-b', '--budget', action='append', default=[],
+                        help='Budget as <module>=<ms>; can repeat')
+    parser.add_argument('-n', '--n-repeats', type=int, default=3,
+                        help='Take minimum time over this many runs')
+    parser.add_argument('-t', '--top', type=int, default=5,
+                        help='Number of heaviest imports to report')
+    return parser
+
+
+def main():
+    parser = get_parser()
+    args = parser.parse_args()
+    budgets = parse_budgets(args.budget)
+    modules = args.modules if args.modules else list(budgets)
+    over = []
+    for module in modules:
+        total, records = import_ms(module, args.n_repeats)
+        budget = budgets.get(module)
+        status = ('' if budget is None else
+                  f' (budget {budget:.0f} ms)' +
+                  (' OVER' if total > budget else ''))
+        print(f'{module}: {total:.1f} ms{status}')
+        # Heaviest imports by their own (not cumulative) time.
+        for name, self_us, _, _ in sorted(records, key=lambda r: -r[1])[
+                :args.top]:
+            print(f'    {name:30s}{self_us / 1000:8.1f} ms')
+        if budget is not None and total > budget:
+            over.append(module)
+    if over:
+        print(f'Over budget: {", ".join(over)}')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -2,11 +2,27 @@
 """ Postprocess Quarto site for variables that have not been substituted.
 
 Maybe relevant: `https://github.com/quarto-dev/quarto-cli/issues/8987`_.
+
+We look at all the HTML and JSON files in the build directory, and its
+subdirectories.  We record the size, modification time and hash of each file
+we have processed in a manifest file next to the build directory (so we do
+not publish it with the site), and skip files that have not changed since.
+We process the other files across worker processes.  We only decode files
+that contain ``{{<`` or ``{{&lt;``, and we process large files, such as
+``search.json``, in blocks, so we never hold more than a block or two in
+memory.
 """
 
 from argparse import ArgumentParser, RawDescriptionHelpFormatter
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+import hashlib
+import json
+import os
 from pathlib import Path
 import re
+import tempfile
+
 import yaml
 
 TEXT_EXTS = ('.html', '.json')
@@ -15,19 +31,172 @@ VAR_RE = re.compile(
     r'\{\{(<|&lt;)\svar\s+(?P<varname>\w+)\s+(>|&gt;)\}\}',
     flags=re.MULTILINE | re.VERBOSE)
 
+# Byte strings that must be present for VAR_RE to match.
+VAR_STARTS = (b'{{<', b'{{&lt;')
+
+# Name of manifest file, next to build directory, given build directory name.
+MANIFEST_TEMPLATE = '.{}-postprocess.json'
+
+# Process files larger than this in blocks of this size.
+BLOCK_BYTES = 2 ** 23
+
+# Longer than any variable reference matching VAR_RE.
+MAX_MATCH = 256
+
+
+def substitute(data, var_conf):
+    """ Replace variable references in bytes `data` with values in `var_conf`
+    """
+    if not any(start in data for start in VAR_STARTS):
+        return data
+    text = data.decode('utf-8')
+    return VAR_RE.sub(lambda m: str(var_conf[m.group('varname')]),
+                      text).encode('utf-8')
+
+
+def _safe_cut(block):
+    # Index in `block` before which no variable reference can be cut off by
+    # the end of the block.  The block may end with the first "{" of a
+    # reference, so look for any "{", then step back to the first of a run.
+    start = max(0, len(block) - MAX_MATCH)
+    cut = block.rfind(b'{', start)
+    if cut != -1:
+        while cut > start and block[cut - 1] == ord('{'):
+            cut -= 1
+        return cut
+    # Do not split a UTF-8 character; step back to start of last character.
+    cut = len(block) - 1
+    while cut > 0 and block[cut] & 0xC0 == 0x80:
+        cut -= 1
+    return cut if cut >= 0 and block[cut] >= 0xC0 else len(block)
+
+
+def _stream_substitute(path, var_conf, block_bytes):
+    # Substitute block by block into temporary file; return hash.
+    hasher = hashlib.sha256()
+    changed = False
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix='.tmp-')
+    try:
+        with open(path, 'rb') as in_f, os.fdopen(fd, 'wb') as out_f:
+            carry = b''
+            while True:
+                block = in_f.read(block_bytes)
+                data = carry + block
+                cut = _safe_cut(data) if block else len(data)
+                out = substitute(data[:cut], var_conf)
+                changed = changed or out != data[:cut]
+                out_f.write(out)
+                hasher.update(out)
+                carry = data[cut:]
+                if not block:
+                    break
+        if changed:
+            os.replace(tmp_name, path)
+    finally:
+        if os.path.exists(tmp_name):
+            os.unlink(tmp_name)
+    return hasher.hexdigest()
+
+
+def process_file(path, var_conf, block_bytes=BLOCK_BYTES):
+    """ Substitute variables in file `path`; return hash of new contents
+    """
+    path = Path(path)
+    if path.stat().st_size > block_bytes:
+        return _stream_substitute(path, var_conf, block_bytes)
+    data = path.read_bytes()
+    out = substitute(data, var_conf)
+    if out != data:
+        path.write_bytes(out)
+    return hashlib.sha256(out).hexdigest()
+
+
+def _process_one(var_conf, path):
+    return process_file(path, var_conf)
+
+
+def find_files(build_path, exts):
+    """ Paths below `build_path` with extensions in `exts`, at any depth
+    """
+    for dirpath, dirnames, filenames in os.walk(build_path):
+        dirnames.sort()
+        for fname in sorted(filenames):
+            if os.path.splitext(fname)[1] in exts:
+                yield Path(dirpath) / fname
+
+
+def _stamp(path):
+    stat = path.stat()
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def _file_hash(path):
+    hasher = hashlib.sha256()
+    with open(path, 'rb') as fobj:
+        for block in iter(lambda: fobj.read(BLOCK_BYTES), b''):
+            hasher.update(block)
+    return hasher.hexdigest()
+
+
+def manifest_path_for(build_path):
+    """ Path of manifest for `build_path`, outside `build_path`
+    """
+    build_path = Path(build_path).resolve()
+    return build_path.parent / MANIFEST_TEMPLATE.format(build_path.name)
+
 
-def postprocess_site(build_path, var_conf, exts):
+def postprocess_site(build_path, var_conf, exts=TEXT_EXTS, n_workers=None):
+    """ Substitute variables in files below `build_path`, skipping unchanged
 
-    def _var_replace(m):
-        return var_conf[m.groupdict()['varname']]
+    Parameters
+    ----------
+    build_path : Path
+        Directory containing built site.
+    var_conf : dict
+        Maps variable names to values.
+    exts : sequence of str, optional
+        Extensions of files to process.
+    n_workers : None or int, optional
+        Number of worker processes.  None means the number of CPUs.
 
-    for path in build_path.glob('*'):
-        if path.suffix not in exts:
+    Returns
+    -------
+    processed : list of Path
+        Files we processed (rather than skipped).
+    """
+    build_path = Path(build_path)
+    manifest_path = manifest_path_for(build_path)
+    var_hash = hashlib.sha256(json.dumps(
+        var_conf, sort_keys=True, default=str).encode()).hexdigest()
+    manifest = {}
+    if manifest_path.is_file():
+        manifest = json.loads(manifest_path.read_text())
+    # Changing the variables invalidates the manifest.
+    files = (manifest.get('files', {}) if manifest.get('vars') == var_hash
+             else {})
+    new_files, todo = {}, []
+    for path in find_files(build_path, exts):
+        key = path.relative_to(build_path).as_posix()
+        record = files.get(key)
+        stamp = _stamp(path)
+        if record is not None and (record[:2] == stamp or
+                                   record[2] == _file_hash(path)):
+            new_files[key] = stamp + [record[2]]
             continue
-        in_txt = path.read_text()
-        out_txt = VAR_RE.sub(_var_replace, in_txt)
-        if in_txt != out_txt:
-            path.write_text(out_txt)
+        todo.append(path)
+    n_workers = os.cpu_count() if n_workers is None else n_workers
+    if n_workers > 1 and len(todo) > 1:
+        with ProcessPoolExecutor(n_workers) as executor:
+            hashes = list(executor.map(partial(_process_one, var_conf), todo,
+                                       chunksize=8))
+    else:
+        hashes = [process_file(path, var_conf) for path in todo]
+    for path, digest in zip(todo, hashes):
+        new_files[path.relative_to(build_path).as_posix()] = (
+            _stamp(path) + [digest])
+    manifest_path.write_text(json.dumps({'vars': var_hash,
+                                         'files': new_files}))
+    return todo
 
 
 def get_parser():
@@ -39,6 +208,9 @@ def get_parser():
                         help='Quarto variable file')
     parser.add_argument('--build-dir',
                         help='Directory containing built files')
+    parser.add_argument('-j', '--n-workers', type=int,
+                        help='Number of worker processes '
+                        '(default number of CPUs)')
     return parser
 
 
@@ -50,11 +222,11 @@ def main():
                 source_path / '_variables.yml')
     with open(args.quarto_config, 'rt') as fobj:
         quarto_conf = yaml.load(fobj, Loader=yaml.FullLoader)
-    build_path = (Path(args.build_dir) if args.var_config else
+    build_path = (Path(args.build_dir) if args.build_dir else
                   source_path / quarto_conf['project']['output-dir'])
     with open(var_path, 'rt') as fobj:
         var_conf = yaml.load(fobj, Loader=yaml.FullLoader)
-    postprocess_site(build_path, var_conf, TEXT_EXTS)
+    postprocess_site(build_path, var_conf, TEXT_EXTS, args.n_workers)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,351 @@
+#!/usr/bin/env python3
+""" Render chapters for both editions in parallel, then assemble the books
+
+Rendering the editions one after another, and the chapters of each edition
+one at a time, leaves most cores idle.  Here we render each chapter of each
+edition as a separate job, across a pool of workers.
+
+The two editions cannot share a source directory, because each needs its own
+``_quarto-{lang}.yml`` and ``_variables.yml``.  We therefore copy the source
+directory to ``_render-{lang}`` next to it (only copying changed files, and
+removing deleted files, on later runs), and render each edition there.
+
+Renders of chapters in the same project are not safe to run at the same
+time, because they write project-wide files: ``.quarto/`` (including the
+cross-reference indexes), ``_freeze/site_libs``, and, in the output
+directory, ``site_libs/``, ``search.json`` and the sidebar.  Each worker
+therefore renders its chapters in its own copy of the edition directory,
+``_render-{lang}-{n}``, writing its output to a private directory.  After
+each chapter, we copy its frozen results back to the edition directory,
+holding a lock while we write there.  All renders share the Python chunk
+cache in ``source/.chunk_cache`` (see ``source/chunk_cache.py``), so it does
+not matter which copy renders a chapter.
+
+We start the slowest chapters first, using durations from earlier runs, so
+no long chapter starts at the end.  Chapters we have not timed go first.
+When all the chapters for an edition are done, we render its whole book.
+With ``freeze: auto`` in the configuration, this reuses the chapter results,
+so it only assembles the book and resolves cross-references.
+
+Use as::
+
+    scripts/render_book.py  # Both editions, one worker per CPU.
+    scripts/render_book.py python -j 8 --to pdf
+"""
+
+from argparse import ArgumentParser, RawDescriptionHelpFormatter
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+import json
+import os
+from pathlib import Path
+import queue
+import shutil
+import subprocess
+import sys
+import threading
+import time
+
+import yaml
+
+HERE = Path(__file__).parent
+ROOT = HERE.parent
+SOURCE = ROOT / 'source'
+
+LANGUAGES = ('python', 'r')
+
+# Durations of jobs in earlier runs.
+TIMES_FILE = ROOT / '.render_times.json'
+
+# Python chunk cache for all renders.
+CHUNK_CACHE = SOURCE / '.chunk_cache'
+
+# Output directory for chapter renders in the worker copies, relative to the
+# copy.
+CHAPTER_OUTPUT = '_chapter-output'
+
+# Files and directories that we do not copy to, or remove from, the render
+# copies.
+SKIP_COPY = {'.quarto', '_freeze', '.chunk_cache', '_cache', 'build.ninja',
+             '.ninja_log', '.freeze-edition', '__pycache__', CHAPTER_OUTPUT}
+
+# Files that `prepare` writes in the edition directories.
+GENERATED = {'_quarto-python.yml', '_quarto-r.yml', '_variables.yml'}
+
+
+def get_chapters(source=SOURCE):
+    """ Chapters and appendices from the Quarto template
+    """
+    with open(source / '_quarto.yml.template') as fobj:
+        config = yaml.safe_load(fobj)
+    return config['book']['chapters'] + config['book']['appendices']
+
+
+def _remove(path):
+    if path.is_dir() and not path.is_symlink():
+        shutil.rmtree(path)
+    else:
+        path.unlink()
+
+
+def sync_tree(src, dst, skip=SKIP_COPY, mirror=True):
+    """ Make `dst` a copy of `src`, copying only missing or changed files
+
+    We copy files that are missing in `dst`, or that have a different size
+    or mtime, and, if `mirror` is True, remove files that are not in `src`.
+    We neither copy nor remove files and directories with names in `skip`.
+    """
+    src, dst = Path(src), Path(dst)
+    dst.mkdir(parents=True, exist_ok=True)
+    names = set()
+    for entry in os.scandir(src):
+        if entry.name in skip:
+            continue
+        names.add(entry.name)
+        out_path = dst / entry.name
+        is_dir = entry.is_dir(follow_symlinks=False)
+        if (out_path.exists() or out_path.is_symlink()) and (
+                is_dir != (out_path.is_dir() and
+                           not out_path.is_symlink())):
+            _remove(out_path)
+        if is_dir:
+            sync_tree(entry.path, out_path, skip, mirror)
+            continue
+        stat = entry.stat()
+        if out_path.is_file():
+            out_stat = out_path.stat()
+            if (out_stat.st_size == stat.st_size and
+                    out_stat.st_mtime == stat.st_mtime):
+                continue
+        shutil.copy2(entry.path, out_path)
+    if not mirror:
+        return
+    for entry in os.scandir(dst):
+        if entry.name not in skip and entry.name not in names:
+            _remove(Path(entry.path))
+
+
+class Workspace:
+    """ Private copies of an edition directory, for chapter renders
+
+    Parameters
+    ----------
+    project_dir : str or Path
+        Edition directory.
+    config_name : str
+        Name of Quarto configuration file in `project_dir`.  In the copies,
+        we set the output directory to :data:`CHAPTER_OUTPUT`.
+    n_copies : int
+        Maximum number of copies, and so of renders at the same time.
+    """
+
+    def __init__(self, project_dir, config_name, n_copies):
+        self.project_dir = Path(project_dir)
+        self.config_name = config_name
+        self._free = queue.Queue()
+        for i in range(n_copies):
+            self._free.put(self.project_dir.with_name(
+                f'{self.project_dir.name}-{i}'))
+        self._lock = threading.Lock()
+
+    def _private_output(self, copy_dir):
+        path = copy_dir / self.config_name
+        config = yaml.safe_load(path.read_text())
+        config['project']['output-dir'] = CHAPTER_OUTPUT
+        path.write_text(yaml.safe_dump(config, allow_unicode=True,
+                                       sort_keys=False))
+
+    def run(self, chapter, render):
+        """ Call ``render(copy_dir)`` for `chapter` in a free copy
+
+        Then copy the frozen results for `chapter`, and the shared
+        ``_freeze/site_libs``, back to the edition directory.
+        """
+        copy_dir = self._free.get()
+        try:
+            sync_tree(self.project_dir, copy_dir)
+            self._private_output(copy_dir)
+            render(copy_dir)
+            with self._lock:
+                # Other copies add to site_libs, so only add files there.
+                for name, mirror in ((Path(chapter).stem, True),
+                                     ('site_libs', False)):
+                    frozen = copy_dir / '_freeze' / name
+                    if frozen.is_dir():
+                        sync_tree(frozen,
+                                  self.project_dir / '_freeze' / name, (),
+                                  mirror)
+        finally:
+            self._free.put(copy_dir)
+
+
+def schedule(jobs, durations):
+    """ Sort `jobs` with slowest first; jobs without durations go first
+
+    Parameters
+    ----------
+    jobs : sequence of (lang, chapter) tuples
+    durations : dict
+        Maps ``'{lang}:{chapter}'`` to duration in seconds.
+
+    Returns
+    -------
+    jobs : list of (lang, chapter) tuples
+
+    Examples
+    --------
+    >>> schedule([('r', 'a.Rmd'), ('r', 'b.Rmd'), ('python', 'a.Rmd')],
+    ...          {'r:a.Rmd': 10, 'r:b.Rmd': 30})
+    [('python', 'a.Rmd'), ('r', 'b.Rmd'), ('r', 'a.Rmd')]
+    """
+    return sorted(jobs, key=lambda job: -durations.get(job_name(*job),
+                                                        float('inf')))
+
+
+def job_name(lang, chapter):
+    return f'{lang}:{chapter}'
+
+
+def run_jobs(jobs, run_chapter, run_book, n_workers=None):
+    """ Run chapter jobs in order across workers, then book job for each lang
+
+    Parameters
+    ----------
+    jobs : sequence of (lang, chapter) tuples
+        In order in which to start them.
+    run_chapter : callable
+        Called as ``run_chapter(lang, chapter)`` in a worker thread.
+    run_book : callable
+        Called as ``run_book(lang)`` in a worker thread, once all chapters
+        for `lang` are done.
+    n_workers : None or int, optional
+        Number of jobs to run at the same time.  None means number of CPUs.
+
+    Returns
+    -------
+    durations : dict
+        Maps job names (``'{lang}:{chapter}'`` or ``'{lang}:book'``) to
+        durations in seconds.
+    """
+    remaining = {}
+    for lang, _ in jobs:
+        remaining[lang] = remaining.get(lang, 0) + 1
+    durations = {}
+
+    def timed(name, func, *args):
+        start = time.perf_counter()
+        func(*args)
+        durations[name] = time.perf_counter() - start
+
+    todo = list(jobs)  # Book jobs have chapter None.
+    n_workers = os.cpu_count() if n_workers is None else n_workers
+    with ThreadPoolExecutor(n_workers) as executor:
+        futures = {}
+        while todo or futures:
+            # Only submit jobs that can start now, so that, after an error,
+            # no queued jobs keep us waiting.
+            while todo and len(futures) < n_workers:
+                lang, chapter = job = todo.pop(0)
+                if chapter is None:
+                    future = executor.submit(timed, job_name(lang, 'book'),
+                                             run_book, lang)
+                else:
+                    future = executor.submit(timed, job_name(lang, chapter),
+                                             run_chapter, lang, chapter)
+                futures[future] = job
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                lang, chapter = futures.pop(future)
+                # Raise any error, once the running jobs finish.
+                future.result()
+                if chapter is None:
+                    continue
+                remaining[lang] -= 1
+                if remaining[lang] == 0:
+                    # Book next, ahead of chapters for other editions.
+                    todo.insert(0, (lang, None))
+    return durations
+
+
+def render_dir(lang):
+    return ROOT / f'_render-{lang}'
+
+
+def prepare(lang):
+    """ Update render copy of source for `lang`, and write its configuration
+    """
+    out_dir = render_dir(lang)
+    sync_tree(SOURCE, out_dir, SKIP_COPY | GENERATED)
+    subprocess.run([sys.executable, str(HERE / 'set_version.py'),
+                    f'--output=_quarto-{lang}.yml', lang],
+                   cwd=out_dir, check=True, stdout=subprocess.DEVNULL)
+
+
+def quarto(lang, fmt, chapter=None, cwd=None):
+    cmd = ['quarto', 'render'] + ([chapter, '--no-clean'] if chapter
+                                  else []) + ['--to', fmt, '--profile', lang]
+    cwd = render_dir(lang) if cwd is None else cwd
+    env = {**os.environ, 'CHUNK_CACHE_DIR': str(CHUNK_CACHE)}
+    proc = subprocess.run(cmd, cwd=cwd, env=env, capture_output=True,
+                          text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f'{" ".join(cmd)} failed:\n{proc.stderr}')
+
+
+def get_parser():
+    parser = ArgumentParser(description=__doc__,  # Usage from docstring
+                            formatter_class=RawDescriptionHelpFormatter)
+    parser.add_argument('langs', nargs='*',
+                        help='Editions to render, from "python", "r" '
+                        '(default both)')
+    parser.add_argument('-j', '--n-workers', type=int,
+                        help='Number of renders at the same time '
+                        '(default number of CPUs)')
+    parser.add_argument('--to', default='html',
+                        help='Output format')
+    parser.add_argument('-n', '--dry-run', action='store_true',
+                        help='Show order of chapter renders and exit')
+    return parser
+
+
+def main():
+    parser = get_parser()
+    args = parser.parse_args()
+    langs = args.langs if args.langs else LANGUAGES
+    for lang in langs:
+        if lang not in LANGUAGES:
+            parser.error(f'Edition should be one of {LANGUAGES}')
+    durations = (json.loads(TIMES_FILE.read_text()) if TIMES_FILE.is_file()
+                 else {})
+    fmt_durations = durations.get(args.to, {})
+    jobs = schedule([(lang, chapter) for lang in langs
+                     for chapter in get_chapters()], fmt_durations)
+    if args.dry_run:
+        for lang, chapter in jobs:
+            secs = fmt_durations.get(job_name(lang, chapter))
+            print(f'{lang:8s}{chapter:40s}'
+                  f'{"?" if secs is None else f"{secs:.0f}"}')
+        return
+    n_workers = os.cpu_count() if args.n_workers is None else args.n_workers
+    workspaces = {}
+    for lang in langs:
+        prepare(lang)
+        workspaces[lang] = Workspace(render_dir(lang), f'_quarto-{lang}.yml',
+                                     n_workers)
+
+    def run_chapter(lang, chapter):
+        workspaces[lang].run(chapter, lambda copy_dir: quarto(
+            lang, args.to, chapter, copy_dir))
+
+    start = time.perf_counter()
+    new = run_jobs(jobs, run_chapter, lambda lang: quarto(lang, args.to),
+                   n_workers)
+    durations[args.to] = {**fmt_durations, **new}
+    TIMES_FILE.write_text(json.dumps(durations, indent=2))
+    total = sum(new.values())
+    wall = time.perf_counter() - start
+    print(f'Rendered {len(jobs)} chapters in {wall:.0f}s '
+          f'({total:.0f}s of renders, speedup {total / wall:.1f})')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,32 +1,68 @@
 """ Script run before every notebook
 """
 
+import zlib as _zlib
+
+import numpy as _np
 import numpy.random as _npr
 
 _default_rng = _npr.default_rng
 
 
-def _make_default_seeded_rng(default_seed):
+def _make_default_seeded_rng(default_seed, bit_generator='PCG64',
+                             buffer_size=0):
 
     def dsrng(*args, **kwargs):
         """ Use original default_rng if any arguments, else use given seed
         """
         if args or kwargs:
             return _default_rng(*args, **kwargs)
-        # Seed injected from _common.R script.
-        return _default_rng(default_seed)
+        if bit_generator == 'PCG64' and not buffer_size:
+            # Seed injected from _common.R script.
+            return _default_rng(default_seed)
+        from resampling.rng import make_generator
+        return make_generator(default_seed, bit_generator, buffer_size)
 
     return dsrng
 
 
-_npr.default_rng = _make_default_seeded_rng(_QUARTO_SEED)
+# Bit generator and buffer size can be injected from _common.R script.
+_npr.default_rng = _make_default_seeded_rng(
+    _QUARTO_SEED,
+    globals().get('_QUARTO_BIT_GENERATOR', 'PCG64'),
+    globals().get('_QUARTO_RNG_BUFFER', 0))
 
 
 # Python variable in Python edition else R variable.
-def get_var(name):
+def get_var(name, copy=True):
+    """ Value of Python variable `name`, or else R variable `name`
+
+    R numeric vectors come back as NumPy arrays sharing R's memory; see
+    ._to_py in _common.R.  By default we return a copy, so changes in
+    Python do not change the R variable.  Use ``copy=False`` to skip the
+    copy, for large vectors you will only read.
+    """
     if name in globals():
         return globals()[name]
-    return getattr(r, name)
+    value = getattr(r, '._to_py')(name)
+    if copy and isinstance(value, _np.ndarray):
+        value = value.copy()
+    return value
+
+
+def _var_token(name):
+    """ Token that changes when Python array `name` changes, else None
+
+    _common.R uses this to reuse its conversion of large arrays.  None means
+    the value is not worth caching (or we cannot check it cheaply).
+    """
+    value = globals().get(name)
+    if not isinstance(value, _np.ndarray) or value.dtype.hasobject:
+        return None
+    # Checksum reads, but does not copy, contiguous data.
+    data = _np.ascontiguousarray(value)
+    crc = _zlib.crc32(data.reshape(-1).view(_np.uint8))
+    return f'{id(value)}:{value.dtype.str}:{value.shape}:{crc}'
 
 
 def print_tab(tab_md, caption, label):
@@ -0,0 +1,389 @@
+#!/usr/bin/env python3
+""" Cache of executed Python chunks, for replay on unchanged chunks
+
+When we render a chapter, ``_common.R`` asks this cache for each Python
+chunk, before running it.  The key for a chunk is a hash of:
+
+* the chunk source;
+* the contents of data files the source refers to, such as
+  ``data/cholost.csv``, and of local modules and packages it imports, such
+  as ``liquor_analysis`` and ``resampling``, including the data files and
+  modules that these refer to in turn;
+* the ``_QUARTO_SEED`` from ``_common.R``;
+* the key of the previous chunk in the chapter, so the key also covers all
+  the code that built the state this chunk starts from.
+
+Editing prose therefore leaves the keys unchanged, and we replay the stored
+output (text and figures) instead of running the chunk.  Editing a chunk
+changes its key, and the keys of all later chunks in the chapter.
+
+Before running a chunk after one or more replayed chunks, we restore the
+Python variables saved after the last replayed chunk, and re-run the
+top-level imports, and function and class definitions, of the replayed
+chunks.  We do not save names from ``_common.py``, because the render has
+them already.  If we could not save some other variable, and the
+definitions do not restore it, we re-run the whole code of the replayed
+chunks, without output.
+
+We keep at most :data:`MAX_BYTES` of entries, removing the least recently
+used.  Set the ``CHUNK_CACHE_DIR`` environment variable to use another cache
+directory, for example to share one cache between copies of this directory.
+Processes sharing a cache take a lock on the cache directory while they
+change entries.  To clear the cache, or the entries for some chapters::
+
+    ./chunk_cache.py --clear
+    ./chunk_cache.py --clear monte_carlo.Rmd
+"""
+
+from argparse import ArgumentParser, RawDescriptionHelpFormatter
+import ast
+from contextlib import contextmanager
+import fcntl
+import hashlib
+import json
+import os
+from pathlib import Path
+import pickle
+import re
+import shutil
+import tempfile
+import types
+
+HERE = Path(__file__).parent
+
+# Default cache directory.  Not matching "*_cache/", so "ninja clean" leaves
+# it alone.
+CACHE_DIR = Path(os.environ.get('CHUNK_CACHE_DIR', HERE / '.chunk_cache'))
+
+# Default maximum total size of cache entries.
+MAX_BYTES = 2 * 2 ** 30
+
+# Change this to invalidate all entries.
+CACHE_VERSION = 1
+
+# String literals that look like data file names.
+DATA_RE = re.compile(r'''['"]([^'"\s]+\.(?:csv|tsv|txt|json|npy|npz))['"]''')
+
+# Top-level imports of modules that may be local.
+IMPORT_RE = re.compile(r'^\s*(?:from|import)\s+([A-Za-z_]\w*)', re.M)
+
+# Datasets loaded through the data package, as in ``data.galton_families``
+# or ``data.load('galton_families')``.
+DATASET_RE = re.compile(r'''\bdata\.(?:load\(\s*['"])?(\w+)''')
+
+# Statements we re-run after restoring saved variables.
+DEFINITIONS = (ast.Import, ast.ImportFrom, ast.FunctionDef,
+               ast.AsyncFunctionDef, ast.ClassDef)
+
+
+def _file_hash(path):
+    return hashlib.sha256(Path(path).read_bytes()).hexdigest()
+
+
+def _module_files(name, root):
+    # Files for local module or package `name`, if any.
+    path = root / f'{name}.py'
+    if path.is_file():
+        return [path]
+    if (root / name / '__init__.py').is_file():
+        return sorted((root / name).rglob('*.py'))
+    return []
+
+
+def input_files(code, root=HERE):
+    """ Data files and local modules that Python `code` may read
+
+    We follow local modules, to find the data files and modules they read.
+    We look for data files relative to `root`, and in its ``data``
+    directory.
+
+    Parameters
+    ----------
+    code : str
+        Chunk source.
+    root : str or Path, optional
+        Directory in which the chunk runs.
+
+    Returns
+    -------
+    paths : list of Path
+        Existing files, in order of first mention.
+    """
+    root = Path(root)
+    paths = []
+    texts = [code]
+    while texts:
+        text = texts.pop(0)
+        candidates = DATA_RE.findall(text) + [
+            f'{name}.csv' for name in DATASET_RE.findall(text)]
+        for candidate in candidates:
+            for path in (root / candidate, root / 'data' / candidate):
+                if path.is_file():
+                    if path not in paths:
+                        paths.append(path)
+                    break
+        for name in IMPORT_RE.findall(text):
+            for path in _module_files(name, root):
+                if path not in paths:
+                    paths.append(path)
+                    texts.append(path.read_text())
+    return paths
+
+
+def chunk_key(code, previous='', seed=None, root=HERE):
+    """ Key for chunk with source `code` after chunk with key `previous`
+    """
+    hasher = hashlib.sha256(json.dumps(
+        [CACHE_VERSION, previous, seed, code]).encode())
+    for path in input_files(code, root):
+        hasher.update(f'{path.name}:{_file_hash(path)}'.encode())
+    return hasher.hexdigest()
+
+
+def _state_names(namespace, baseline=None):
+    # Names of user variables we should save after a chunk.  We skip names
+    # still bound to the same object as in `baseline`.
+    baseline = {} if baseline is None else baseline
+    return [name for name, value in namespace.items()
+            if not name.startswith('_') and name != 'r'
+            and not isinstance(value, types.ModuleType)
+            and (name not in baseline or baseline[name] is not value)]
+
+
+def snapshot(namespace, baseline=None):
+    """ Pickle variables from `namespace`; return bytes, unsaved names
+
+    We skip variables bound to the same object as in `baseline`.
+    """
+    state, unsaved = {}, []
+    for name in _state_names(namespace, baseline):
+        value = namespace[name]
+        try:
+            contents = pickle.dumps(value)
+            # Functions and classes pickle by reference; check they load.
+            if getattr(value, '__module__', None) == '__main__':
+                raise pickle.PicklingError
+        except Exception:
+            unsaved.append(name)
+            continue
+        state[name] = contents
+    return pickle.dumps(state), unsaved
+
+
+def definitions(code):
+    """ Top-level definitions in `code`, names bound by other statements
+
+    Returns
+    -------
+    defs : ast.Module
+        Top-level imports, and function and class definitions, in `code`.
+    others : set
+        Names bound by other top-level statements.
+    """
+    tree = ast.parse(code)
+    defs, others = [], set()
+    for node in tree.body:
+        if isinstance(node, DEFINITIONS):
+            defs.append(node)
+            continue
+        others.update(n.id for n in ast.walk(node)
+                      if isinstance(n, ast.Name)
+                      and isinstance(n.ctx, ast.Store))
+    return ast.Module(body=defs, type_ignores=[]), others
+
+
+def _dir_size(path):
+    return sum(p.stat().st_size for p in path.rglob('*') if p.is_file())
+
+
+class ChunkCache:
+    """ Store of outputs and state for executed chunks
+
+    Parameters
+    ----------
+    cache_dir : str or Path, optional
+        Directory for entries.
+    max_bytes : int, optional
+        Maximum total size of entries.
+    baseline : None or dict, optional
+        Namespace before the first chunk, such as after running
+        ``_common.py``.  We do not save variables still bound to the same
+        objects.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=MAX_BYTES,
+                 baseline=None):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.baseline = {} if baseline is None else dict(baseline)
+
+    def _entry(self, key):
+        return self.cache_dir / key
+
+    @contextmanager
+    def _locked(self):
+        # Exclusive lock on cache, across threads and processes.
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        with open(self.cache_dir / '.lock', 'w') as fobj:
+            fcntl.flock(fobj, fcntl.LOCK_EX)
+            yield
+
+    def get(self, key, root=HERE):
+        """ Return stored output for `key`, or None if no entry
+
+        Restores stored figure files, relative to `root`.
+        """
+        entry = self._entry(key)
+        meta_path = entry / 'meta.json'
+        if not meta_path.is_file():
+            return None
+        with self._locked():  # Another process may be pruning.
+            if not meta_path.is_file():
+                return None
+            meta = json.loads(meta_path.read_text())
+            for i, fname in enumerate(meta['files']):
+                out_path = Path(root) / fname
+                out_path.parent.mkdir(parents=True, exist_ok=True)
+                shutil.copyfile(entry / 'files' / str(i), out_path)
+            # Mark as recently used.
+            os.utime(meta_path)
+        return meta['output']
+
+    def put(self, key, output, code, files=(), namespace=None,
+            chapter=None, root=HERE):
+        """ Store `output`, `files` and state for chunk with `key`
+
+        Parameters
+        ----------
+        key : str
+            From :func:`chunk_key`.
+        output : str
+            Output of chunk, to replay.
+        code : str
+            Chunk source, to re-run if we cannot restore the state.
+        files : sequence of str, optional
+            Files, relative to `root`, written by the chunk, such as figures.
+        namespace : None or dict, optional
+            Namespace after running chunk; we save what we can.
+        chapter : None or str, optional
+            Chapter containing the chunk, for :meth:`clear`.
+        root : str or Path, optional
+            Directory in which the chunk ran.
+        """
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = Path(tempfile.mkdtemp(dir=self.cache_dir, prefix='.tmp-'))
+        (tmp_path / 'files').mkdir()
+        for i, fname in enumerate(files):
+            shutil.copyfile(Path(root) / fname, tmp_path / 'files' / str(i))
+        unsaved = []
+        if namespace is not None:
+            state, unsaved = snapshot(namespace, self.baseline)
+            (tmp_path / 'state.pkl').write_bytes(state)
+        (tmp_path / 'code.py').write_text(code)
+        (tmp_path / 'meta.json').write_text(json.dumps(
+            {'output': output, 'files': list(files), 'chapter': chapter,
+             'unsaved': unsaved}))
+        entry = self._entry(key)
+        with self._locked():
+            shutil.rmtree(entry, ignore_errors=True)
+            os.replace(tmp_path, entry)
+            self._prune(self.max_bytes)
+
+    def restore(self, keys, namespace):
+        """ Restore state after replayed chunks with `keys` into `namespace`
+
+        `keys` are for consecutive replayed chunks, in order.
+        """
+        if not keys:
+            return
+        last = self._entry(keys[-1])
+        state_path = last / 'state.pkl'
+        with self._locked():
+            meta = json.loads((last / 'meta.json').read_text())
+            codes = [(key, (self._entry(key) / 'code.py').read_text())
+                     for key in keys]
+            state = (pickle.loads(state_path.read_bytes())
+                     if state_path.is_file() else None)
+        if state is not None:
+            namespace.update({name: pickle.loads(contents)
+                              for name, contents in state.items()})
+            others = set()
+            for key, code in codes:
+                defs, chunk_others = definitions(code)
+                others |= chunk_others
+                exec(compile(defs, f'<chunk {key[:8]}>', 'exec'), namespace)
+            if not any(name in others or name not in namespace
+                       for name in meta['unsaved']):
+                return
+        for key, code in codes:
+            exec(compile(code, f'<chunk {key[:8]}>', 'exec'), namespace)
+
+    def entries(self):
+        """ List of (key, size in bytes, last used time, chapter)
+        """
+        if not self.cache_dir.is_dir():
+            return []
+        out = []
+        for entry in self.cache_dir.iterdir():
+            meta_path = entry / 'meta.json'
+            if entry.name.startswith('.') or not meta_path.is_file():
+                continue
+            chapter = json.loads(meta_path.read_text())['chapter']
+            out.append((entry.name, _dir_size(entry),
+                        meta_path.stat().st_mtime, chapter))
+        return out
+
+    def prune(self, max_bytes=None):
+        """ Remove least recently used entries until under `max_bytes`
+        """
+        with self._locked():
+            self._prune(self.max_bytes if max_bytes is None else max_bytes)
+
+    def _prune(self, max_bytes):
+        entries = sorted(self.entries(), key=lambda e: e[2])
+        total = sum(e[1] for e in entries)
+        for key, size, _, _ in entries:
+            if total <= max_bytes:
+                break
+            shutil.rmtree(self._entry(key), ignore_errors=True)
+            total -= size
+
+    def clear(self, chapters=None):
+        """ Remove all entries, or entries for `chapters`
+        """
+        with self._locked():
+            for key, _, _, chapter in self.entries():
+                if chapters is None or chapter in chapters:
+                    shutil.rmtree(self._entry(key), ignore_errors=True)
+
+
+def get_parser():
+    parser = ArgumentParser(description=__doc__,  # Usage from docstring
+                            formatter_class=RawDescriptionHelpFormatter)
+    parser.add_argument('chapters', nargs='*',
+                        help='Chapters to clear (default all)')
+    parser.add_argument('--clear', action='store_true',
+                        help='Remove entries')
+    parser.add_argument('--max-mb', type=float,
+                        help='Remove least recently used entries to bring '
+                        'cache under this size')
+    parser.add_argument('--cache-dir', default=CACHE_DIR,
+                        help='Cache directory')
+    return parser
+
+
+def main():
+    parser = get_parser()
+    args = parser.parse_args()
+    cache = ChunkCache(args.cache_dir)
+    if args.clear:
+        cache.clear(args.chapters if args.chapters else None)
+    if args.max_mb is not None:
+        cache.prune(int(args.max_mb * 2 ** 20))
+    entries = cache.entries()
+    total = sum(e[1] for e in entries)
+    print(f'{len(entries)} entries, {total / 2 ** 20:.1f} MB')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,191 @@
+""" Cached loader for the book datasets
+
+Use as::
+
+    import data
+    galton = data.galton_families  # Parsed (or loaded from cache) here.
+    galton['father']  # Read-only memory-mapped array.
+    galton.to_frame()  # Pandas data frame.
+
+The first time we load a CSV file, we parse it with Pandas, using the column
+types in :data:`SCHEMAS`, and write each column to a ``.npy`` file in the
+``_cache`` directory.  The cache directory name includes a hash of the CSV
+contents and the schema, so editing the CSV file gives a new cache.  Later
+loads, including those from other kernels in the same render, memory-map the
+``.npy`` files, without importing Pandas or parsing the CSV.
+"""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+import shutil
+import tempfile
+
+import numpy as np
+
+HERE = Path(__file__).parent
+
+# Directory for cached columns.
+CACHE_DIR = HERE / '_cache'
+
+# Change this to invalidate all caches.
+CACHE_VERSION = 1
+
+# Column types, where Pandas would guess wrong, or we want to be explicit.
+# Columns not listed get the type Pandas guesses.
+SCHEMAS = {
+    'athletic_iq': {'athletic_score': 'int64', 'iq_score': 'int64',
+                    'athletic_rank': 'int64', 'iq_rank': 'int64'},
+    'birthweights': {'Treatment': 'str', 'Birthweight': 'float64'},
+    'congress_118': {'District': 'str', 'Median_Income': 'int64',
+                     'Representative': 'str', 'Party': 'str'},
+    'congress_2023': {'Ascending_Rank': 'int64', 'District': 'str',
+                      'Median_Income': 'int64', 'Representative': 'str',
+                      'Party': 'str'},
+    # Family identifiers like "001" and "021A" are labels, not numbers.
+    'galton_families': {'family': 'str', 'father': 'float64',
+                        'mother': 'float64'},
+    'liquor_prices': {'state_type': 'str', 'price': 'float64'},
+    'pig_rations': {'ration': 'str', 'weight_gain': 'float64'},
+    'premier_league': {'team': 'str', 'points': 'int64', 'wages': 'int64'},
+}
+
+
+class Table:
+    """ Columns of a dataset, as arrays
+
+    Parameters
+    ----------
+    name : str
+        Dataset name.
+    columns : dict
+        Maps column names to 1-D arrays.
+    """
+
+    def __init__(self, name, columns):
+        self.name = name
+        self._columns = columns
+
+    @property
+    def columns(self):
+        return list(self._columns)
+
+    def __getitem__(self, column):
+        return self._columns[column]
+
+    def __len__(self):
+        return len(next(iter(self._columns.values()), ()))
+
+    def to_frame(self):
+        """ Return Pandas data frame with copy of columns
+        """
+        import pandas as pd
+        return pd.DataFrame({k: np.array(v) for k, v in
+                             self._columns.items()})
+
+    def __repr__(self):
+        return (f'Table({self.name!r}, columns={self.columns}, '
+                f'n_rows={len(self)})')
+
+
+# Tables loaded in this process.
+_TABLES = {}
+
+
+def names():
+    """ Names of available datasets
+    """
+    return sorted(p.stem for p in HERE.glob('*.csv'))
+
+
+def cache_key(csv_path, schema=None):
+    """ Hash of CSV contents, schema and cache version
+    """
+    hasher = hashlib.sha256(Path(csv_path).read_bytes())
+    hasher.update(json.dumps([schema, CACHE_VERSION],
+                             sort_keys=True).encode())
+    return hasher.hexdigest()[:16]
+
+
+def _parse(csv_path, schema):
+    import pandas as pd
+    df = pd.read_csv(csv_path, dtype=schema)
+    if not isinstance(df.index, pd.RangeIndex):
+        # First column has no header; Pandas made it the index.
+        df = df.reset_index()
+    columns = {}
+    for name in df.columns:
+        values = df[name].to_numpy()
+        if values.dtype == object:
+            # Fixed-width strings can be memory-mapped.
+            values = values.astype(str)
+        columns[name] = values
+    return columns
+
+
+def _write_cache(cache_path, columns):
+    # Write to temporary directory, then rename, so other processes never
+    # see a partial cache.
+    CACHE_DIR.mkdir(exist_ok=True)
+    tmp_path = Path(tempfile.mkdtemp(dir=CACHE_DIR, prefix='.tmp-'))
+    for i, values in enumerate(columns.values()):
+        np.save(tmp_path / f'{i}.npy', values, allow_pickle=False)
+    (tmp_path / 'columns.json').write_text(json.dumps(list(columns)))
+    try:
+        os.replace(tmp_path, cache_path)
+    except OSError:  # Another process got there first.
+        shutil.rmtree(tmp_path, ignore_errors=True)
+
+
+def _read_cache(cache_path):
+    col_names = json.loads((cache_path / 'columns.json').read_text())
+    return {name: np.load(cache_path / f'{i}.npy', mmap_mode='r')
+            for i, name in enumerate(col_names)}
+
+
+def _clear_stale(name, keep):
+    for path in CACHE_DIR.glob(f'{name}-*'):
+        if path != keep:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def load(name, use_cache=True):
+    """ Load dataset `name`, using the cache if possible
+
+    Parameters
+    ----------
+    name : str
+        Dataset name; the CSV file is ``<name>.csv`` in this directory.
+    use_cache : bool, optional
+        If False, parse the CSV, and do not read or write the cache.
+
+    Returns
+    -------
+    table : Table
+    """
+    if use_cache and name in _TABLES:
+        return _TABLES[name]
+    csv_path = HERE / f'{name}.csv'
+    if not csv_path.is_file():
+        raise ValueError(f'No dataset {name!r}; choose from {names()}')
+    schema = SCHEMAS.get(name)
+    if not use_cache:
+        return Table(name, _parse(csv_path, schema))
+    cache_path = CACHE_DIR / f'{name}-{cache_key(csv_path, schema)}'
+    if not (cache_path / 'columns.json').is_file():
+        _write_cache(cache_path, _parse(csv_path, schema))
+        _clear_stale(name, cache_path)
+    table = _TABLES[name] = Table(name, _read_cache(cache_path))
+    return table
+
+
+def __getattr__(name):
+    # Load datasets on first attribute access.
+    if (HERE / f'{name}.csv').is_file():
+        return load(name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(list(globals()) + names())
@@ -1,15 +1,23 @@
 #!/usr/bin/env python3
 """ Generate reorganized Congress table
+
+Usage: ./congress.py [congress_118.csv]
+
+Without an input file, get ``congress_118.csv`` via ``registry.py``.
 """
 
 from pathlib import Path
+import sys
 
 import pandas as pd
 
 HERE = Path(__file__).parent
 
-GITHUB_DATASETS = 'https://raw.githubusercontent.com/odsti/datasets/main/'
-url = GITHUB_DATASETS + 'congress_118/processed/congress_118.csv'
-df = pd.read_csv(url).sort_values('Median_Income')
+if len(sys.argv) > 1:
+    in_path = sys.argv[1]
+else:
+    from registry import source_path
+    in_path = source_path('congress_2023', 'congress_118')
+df = pd.read_csv(in_path).sort_values('Median_Income')
 df.insert(0, 'Ascending_Rank', range(1, len(df) + 1))
 df.to_csv(HERE / 'congress_2023.csv', index=None)
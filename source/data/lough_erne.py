@@ -4,6 +4,7 @@
 
 from pathlib import Path
 import re
+import sys
 
 import pdftotext
 
@@ -12,8 +13,12 @@ import pandas as pd
 
 HERE = Path(__file__).parent
 
-paper_fname = (HERE / '..' / '..' / '..' / 'simon-book-files' /
-               'zhou2000long.pdf')
+if len(sys.argv) > 1:
+    paper_fname = sys.argv[1]
+else:
+    # Location in manifest.json.
+    from registry import source_path
+    paper_fname = source_path('lough_erne', 'zhou2000long')
 
 with open(paper_fname, "rb") as f:
     page3 = pdftotext.PDF(f)[2]
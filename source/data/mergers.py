@@ -2,12 +2,16 @@
 """ Write mergers table ranks
 """
 
+from pathlib import Path
+
 import pandas as pd
 
 import scipy.stats as sps
 
-mergers = pd.read_csv('mergers.csv')
+HERE = Path(__file__).parent
+
+mergers = pd.read_csv(HERE / 'mergers.csv')
 mergers.loc[:, 'Merged':] = sps.rankdata(mergers.loc[:, 'Merged':], axis=1)
 mergers.loc[:, 'Merged':] = mergers.loc[:, 'Merged':].astype(int)
 
-mergers.to_csv('merger_ranks.csv', index=None)
+mergers.to_csv(HERE / 'merger_ranks.csv', index=None)
@@ -1,16 +1,23 @@
 #!/usr/bin/env python3
 """ Generate simplified Premier League table
+
+Usage: ./premier_league.py [premier_league_2021.csv]
+
+Without an input file, get ``premier_league_2021.csv`` via ``registry.py``.
 """
 
 from pathlib import Path
+import sys
 
 import pandas as pd
 
 HERE = Path(__file__).parent
 
-GITHUB_DATASETS = 'https://raw.githubusercontent.com/odsti/datasets/main/'
-
-url = GITHUB_DATASETS + 'premier_league/processed/premier_league_2021.csv'
-df = pd.read_csv(url)[['team', 'points', 'wages_year']]
+if len(sys.argv) > 1:
+    in_path = sys.argv[1]
+else:
+    from registry import source_path
+    in_path = source_path('premier_league', 'premier_league_2021')
+df = pd.read_csv(in_path)[['team', 'points', 'wages_year']]
 df = df.rename(columns={'wages_year': 'wages'})
 df.to_csv(HERE / 'premier_league.csv', index=None)
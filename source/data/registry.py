@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+""" Build the derived datasets from their sources, skipping unchanged builds
+
+``manifest.json`` in this directory lists, for each dataset we generate:
+
+* ``sources``: maps a source name to a ``url`` (or a ``path``, relative to
+  this directory), and the expected ``sha256`` of its contents, or null if
+  we have not pinned it yet.  A ``path`` starting with ``${book_files}`` is
+  in the directory of book files that are not in this repository, such as
+  papers.  Give this directory with ``--book-files``, or the
+  ``SIMON_BOOK_FILES`` environment variable.
+* ``recipe``: script that generates the outputs; we run it in this
+  directory, as ``python <recipe> <source-path> ...``, with the source
+  paths in manifest order.
+* ``outputs``: the files the recipe writes.
+
+We keep fetched sources in ``_cache/sources``, under the sha256 of their
+contents, so we fetch a pinned source once, and then work offline.  We record
+a hash of the recipe and its source hashes, and of the outputs, for each
+build; if these have not changed, the build is a no-op.
+
+Use as::
+
+    ./registry.py  # Build everything out of date.
+    ./registry.py congress_2023 --force  # Rebuild one dataset.
+    ./registry.py --refresh --pin  # Refetch remote sources, record sha256.
+    ./registry.py lough_erne --book-files ~/simon-book-files
+"""
+
+from argparse import ArgumentParser, RawDescriptionHelpFormatter
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import json
+import os
+from pathlib import Path
+from string import Template
+import subprocess
+import sys
+import tempfile
+import threading
+from urllib.request import urlopen
+
+HERE = Path(__file__).parent
+
+# Default manifest.
+MANIFEST = HERE / 'manifest.json'
+
+# Timeout for fetching a source, in seconds.
+TIMEOUT = 60
+
+# Environment variable giving directory of book files not in this repository.
+BOOK_FILES_VAR = 'SIMON_BOOK_FILES'
+
+
+def sha256(contents):
+    return hashlib.sha256(contents).hexdigest()
+
+
+def fetch_url(url):
+    """ Return contents at `url` as bytes
+    """
+    with urlopen(url, timeout=TIMEOUT) as response:
+        return response.read()
+
+
+def _write_atomic(path, contents):
+    # Write to temporary file, then rename, so readers never see a partial
+    # file.
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix='.tmp-')
+    with os.fdopen(fd, 'wb') as fobj:
+        fobj.write(contents)
+    os.replace(tmp_name, path)
+
+
+class Registry:
+    """ Datasets, their sources and recipes, from a manifest
+
+    Parameters
+    ----------
+    manifest_path : str or Path, optional
+        JSON manifest.  Relative source paths, recipes and outputs are
+        relative to the directory containing the manifest.
+    cache_dir : None or str or Path, optional
+        Directory for fetched sources and build records.  None gives
+        ``_cache`` in the manifest directory.
+    fetcher : callable, optional
+        Called as ``fetcher(url)``; returns contents as bytes.
+    book_files : None or str or Path, optional
+        Directory for source paths starting with ``${book_files}``.  None
+        gives the value of the ``SIMON_BOOK_FILES`` environment variable.
+    """
+
+    def __init__(self, manifest_path=MANIFEST, cache_dir=None,
+                 fetcher=fetch_url, book_files=None):
+        self.manifest_path = Path(manifest_path)
+        self.root = self.manifest_path.parent
+        self.cache_dir = (self.root / '_cache' if cache_dir is None
+                          else Path(cache_dir))
+        self.fetcher = fetcher
+        self.book_files = (os.environ.get(BOOK_FILES_VAR)
+                           if book_files is None else str(book_files))
+        self.manifest = json.loads(self.manifest_path.read_text())
+        self._index_lock = threading.Lock()
+
+    @property
+    def names(self):
+        return sorted(self.manifest)
+
+    def _spec(self, name):
+        if name not in self.manifest:
+            raise ValueError(f'No dataset {name!r}; choose from {self.names}')
+        return self.manifest[name]
+
+    def _sources(self, name):
+        return self._spec(name).get('sources', {})
+
+    def _local_path(self, name, source):
+        path = self._sources(name)[source]['path']
+        if '${book_files}' in path and self.book_files is None:
+            raise ValueError(
+                f'{name} source {source} is in the book files directory; '
+                f'set {BOOK_FILES_VAR} or use --book-files')
+        return self.root / Template(path).substitute(
+            book_files=self.book_files)
+
+    def _index_path(self):
+        return self.cache_dir / 'sources' / 'index.json'
+
+    def _read_index(self):
+        path = self._index_path()
+        return json.loads(path.read_text()) if path.is_file() else {}
+
+    def _record(self, url, digest):
+        # Remember the contents we last fetched from `url`, so we can use an
+        # unpinned source offline.
+        with self._index_lock:
+            index = self._read_index()
+            index[url] = digest
+            _write_atomic(self._index_path(),
+                          json.dumps(index, indent=2).encode())
+
+    def fetch(self, name, source, refresh=False):
+        """ Fetch `source` of dataset `name`, if necessary; return sha256
+
+        We only fetch if the source is not in the cache, or `refresh` is
+        True.
+
+        Raises
+        ------
+        ValueError
+            If the contents do not match the pinned sha256.
+        """
+        spec = self._sources(name)[source]
+        pinned = spec.get('sha256')
+        if 'path' in spec:
+            path = self._local_path(name, source)
+            if not path.is_file():
+                raise ValueError(f'{name} source {source} should be at '
+                                 f'{path}, but there is no such file')
+            digest = sha256(path.read_bytes())
+        else:
+            digest = pinned or self._read_index().get(spec['url'])
+            if (refresh or digest is None or
+                    not self._cache_path(digest).is_file()):
+                contents = self.fetcher(spec['url'])
+                digest = sha256(contents)
+                if pinned is None or digest == pinned:
+                    _write_atomic(self._cache_path(digest), contents)
+                    self._record(spec['url'], digest)
+        if pinned is not None and digest != pinned:
+            raise ValueError(f'{name} source {source} has sha256 {digest}, '
+                             f'but manifest expects {pinned}')
+        return digest
+
+    def _cache_path(self, digest):
+        return self.cache_dir / 'sources' / digest
+
+    def source_path(self, name, source):
+        """ Local path of `source` for dataset `name`, fetching if necessary
+        """
+        spec = self._sources(name)[source]
+        if 'path' in spec:
+            self.fetch(name, source)
+            return self._local_path(name, source)
+        return self._cache_path(self.fetch(name, source))
+
+    def refresh(self, names=None, n_workers=8, pin=False):
+        """ Refetch remote sources for `names`, concurrently
+
+        Parameters
+        ----------
+        names : None or sequence of str, optional
+            Datasets to refresh.  None means all.
+        n_workers : int, optional
+            Number of sources to fetch at the same time.
+        pin : bool, optional
+            If True, record the sha256 of unpinned sources in the manifest.
+
+        Returns
+        -------
+        digests : dict
+            Maps ``(name, source)`` to sha256 of contents.
+        """
+        names = self.names if names is None else names
+        keys = [(name, source) for name in names
+                for source, spec in self._sources(name).items()
+                if 'url' in spec]
+        with ThreadPoolExecutor(max(1, n_workers)) as executor:
+            digests = dict(zip(keys, executor.map(
+                lambda key: self.fetch(*key, refresh=True), keys)))
+        if pin:
+            for (name, source), digest in digests.items():
+                self._sources(name)[source]['sha256'] = digest
+            self.manifest_path.write_text(
+                json.dumps(self.manifest, indent=2) + '\n')
+        return digests
+
+    def _builds_path(self):
+        return self.cache_dir / 'builds.json'
+
+    def _build_key(self, name):
+        spec = self._spec(name)
+        hasher = hashlib.sha256((self.root / spec['recipe']).read_bytes())
+        for source in self._sources(name):
+            hasher.update(self.fetch(name, source).encode())
+        return hasher.hexdigest()
+
+    def _output_hashes(self, name):
+        hashes = {}
+        for output in self._spec(name)['outputs']:
+            path = self.root / output
+            hashes[output] = (sha256(path.read_bytes()) if path.is_file()
+                              else None)
+        return hashes
+
+    def is_current(self, name):
+        """ True if outputs for `name` are from the current recipe and sources
+        """
+        self._spec(name)  # Check `name`.
+        path = self._builds_path()
+        builds = json.loads(path.read_text()) if path.is_file() else {}
+        record = builds.get(name)
+        return (record is not None and
+                record['key'] == self._build_key(name) and
+                record['outputs'] == self._output_hashes(name))
+
+    def build(self, name, force=False):
+        """ Run recipe for `name` if out of date; return True if we ran it
+        """
+        if not force and self.is_current(name):
+            return False
+        spec = self._spec(name)
+        paths = [str(self.source_path(name, source))
+                 for source in self._sources(name)]
+        subprocess.run([sys.executable, spec['recipe']] + paths,
+                       cwd=self.root, check=True)
+        path = self._builds_path()
+        builds = json.loads(path.read_text()) if path.is_file() else {}
+        builds[name] = {'key': self._build_key(name),
+                        'outputs': self._output_hashes(name)}
+        _write_atomic(path, json.dumps(builds, indent=2).encode())
+        return True
+
+
+def source_path(name, source):
+    """ Local path of `source` for dataset `name` in default manifest
+    """
+    return Registry().source_path(name, source)
+
+
+def get_parser():
+    parser = ArgumentParser(description=__doc__,  # Usage from docstring
+                            formatter_class=RawDescriptionHelpFormatter)
+    parser.add_argument('names', nargs='*',
+                        help='Datasets to build (default all)')
+    parser.add_argument('-f', '--force', action='store_true',
+                        help='Build even if outputs are up to date')
+    parser.add_argument('-r', '--refresh', action='store_true',
+                        help='Refetch remote sources before building')
+    parser.add_argument('-p', '--pin', action='store_true',
+                        help='With --refresh, record sha256 in manifest')
+    parser.add_argument('-j', '--n-workers', type=int, default=8,
+                        help='Number of sources to fetch at the same time')
+    parser.add_argument('--book-files',
+                        help='Directory of book files not in this '
+                        f'repository (default ${BOOK_FILES_VAR})')
+    return parser
+
+
+def main():
+    parser = get_parser()
+    args = parser.parse_args()
+    registry = Registry(book_files=args.book_files)
+    names = args.names if args.names else registry.names
+    if args.refresh:
+        try:
+            registry.refresh(names, args.n_workers, args.pin)
+        except (ValueError, OSError) as err:  # OSError includes URLError.
+            print(f'refresh failed: {err}')
+            sys.exit(1)
+    failed = []
+    for name in names:
+        try:
+            ran = registry.build(name, args.force)
+        except (ValueError, OSError, subprocess.CalledProcessError) as err:
+            print(f'{name}: failed: {err}')
+            failed.append(name)
+            continue
+        print(f'{name}: {"built" if ran else "up to date"}')
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1 @@
+run_noteout.py
\ No newline at end of file
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+""" Run several noteout filters in one process.
+
+Link to this file with a name in ``PIPELINES`` to make an executable filter
+running that pipeline.  For example, ``noteout_pre.py`` runs the filters
+``filter_pre`` then ``filter_divspans``.  Other names run the single filter of
+the same name, as for ``wrap_noteout.py``.
+
+Running the filters separately means starting Python, importing noteout and
+panflute, and reading and writing the JSON for the whole document, for each
+filter.  Here we do that once for the pipeline, and pass the parsed document
+from filter to filter, so the result is the same as running them in
+sequence.
+
+The filters in a pipeline must run at the same point in the render, with no
+other filters between them, so we keep separate pipelines for ``pre-ast``
+and ``post-quarto``.  ``add-meta.lua`` runs between ``filter_divspans`` and
+``mark_notebooks`` in ``pre-ast``, so ``mark_notebooks`` runs on its own.
+"""
+
+from pathlib import Path
+from importlib import import_module
+
+# Filters to run for each name of link to this file.
+PIPELINES = {
+    'noteout_pre': ['filter_pre', 'filter_divspans'],
+    'noteout_post': ['export_notebooks', 'filter_nb_only'],
+}
+
+
+def run_pipeline(names, doc, package='noteout'):
+    """ Apply noteout filters `names` in order to panflute `doc`
+
+    Each filter module has a ``main(doc=None)`` function that, given a
+    document, filters and returns it, as for ``panflute.run_filter``.
+    """
+    for name in names:
+        mod = import_module(f'{package}.{name}')
+        out = mod.main(doc)
+        doc = doc if out is None else out
+    return doc
+
+
+def main():
+    import panflute as pf
+    stem = Path(__file__).stem
+    doc = pf.load()
+    doc = run_pipeline(PIPELINES.get(stem, [stem]), doc)
+    pf.dump(doc)
+
+
+if __name__ == "__main__":
+    main()
@@ -12,6 +12,7 @@ Ninja variables are listed a https://ninja-build.org/manual.html#ref_rule
 
 from glob import glob
 import os
+import re
 import yaml
 
 from ninja import Writer
@@ -25,12 +26,83 @@ languages = ('python', 'r')
 def replace_ext(fn, new_ext):
     return os.path.splitext(fn)[0] + new_ext
 
-clean_cmd = 'rm -rf _quarto-*.yml *_cache/ .quarto/ notebooks/*'
+
+# Files that chapters refer to, and that should trigger a re-render.
+DATA_RE = re.compile(r"""data/[\w.-]+\.csv|Path\('data'\) / '([\w.-]+\.csv)'""")
+# Datasets loaded through the data package, as in ``data.liquor_prices``.
+DATASET_RE = re.compile(r'''\bdata\.(?:load\(\s*['"])?(\w+)''')
+IMAGE_RE = re.compile(r'(?:diagrams|images)/[\w.-]+\.(?:svg|png|pdf|jpe?g)')
+MODULE_RE = re.compile(r'^\s*(?:from|import)\s+([A-Za-z_]\w*)', re.M)
+# Files for chapters that use the common setup.
+COMMON_DEPS = ['_common.R', '_common.py', 'chunk_cache.py']
+
+
+def code_deps(text, seen):
+    """ Data files and local modules that code in `text` uses
+
+    Follows the local modules (and packages) that `text` imports, so a
+    chapter depends on the data files its helper modules load.  `seen` is
+    the set of module files already scanned; we add to it.
+    """
+    deps = set()
+    for match in DATA_RE.finditer(text):
+        deps.add(f'data/{match.group(1)}' if match.group(1)
+                 else match.group(0))
+    deps.update(f'data/{name}.csv' for name in DATASET_RE.findall(text))
+    for module in MODULE_RE.findall(text):
+        if os.path.isfile(f'{module}.py'):
+            modules = [f'{module}.py']
+        elif os.path.isdir(module):  # Package, such as resampling.
+            modules = sorted(glob(f'{module}/*.py'))
+        else:
+            continue
+        for module_file in modules:
+            if module_file in seen:
+                continue
+            seen.add(module_file)
+            deps.add(module_file)
+            with open(module_file) as fobj:
+                deps.update(code_deps(fobj.read(), seen))
+    return deps
+
+
+def chapter_deps(chapter, image_fmt):
+    """ Data files, helper modules and images that `chapter` uses
+
+    Images are as referenced, but we replace SVG diagrams with the
+    `image_fmt` version we build from them.
+    """
+    with open(chapter) as fobj:
+        text = fobj.read()
+    deps = code_deps(text, set())
+    for image in IMAGE_RE.findall(text):
+        if image.endswith('.svg'):
+            deps.add(replace_ext(image, f'.{image_fmt}'))
+        deps.add(image)
+    if '_common.R' in text:
+        deps.update(COMMON_DEPS)
+    # Only files that exist or that we build.
+    return sorted(d for d in deps if os.path.isfile(d) or
+                  any(d in built for built in built_diagrams.values()))
+
+
+clean_cmd = ('rm -rf _quarto-python.yml _quarto-r.yml *_cache/ _freeze/ '
+             '.freeze-edition .quarto/ notebooks/*')
+
+# Quarto keeps frozen results in _freeze/, whatever the profile, so the
+# editions cannot share it.  Clear it if it has results for the other
+# edition.  The editions also share _variables.yml, so write that again for
+# this edition; the edition's own _quarto-$lang.yml is up to date already.
+freeze_cmd = ('test "$$(cat .freeze-edition 2>/dev/null)" = $lang || '
+              '{ rm -rf _freeze/; '
+              '../scripts/set_version.py --output=/dev/null $lang && '
+              'echo $lang > .freeze-edition; }')
 
 w.rule('svg2x', 'inkscape --export-area-drawing -o $out --export-dpi=300 $in')
-w.rule('compile-config', f'{clean_cmd}; ../scripts/set_version.py --output=_quarto-$lang.yml $lang')
+w.rule('compile-config', '../scripts/set_version.py --output=_quarto-$lang.yml $lang')
 w.rule('quarto-render', 'quarto render $in --no-clean --to $format --profile $lang')
-w.rule('quarto-render-project', 'quarto render --to $format --profile $lang')
+w.rule('quarto-render-project', 'quarto render --to $format --profile $profile')
+w.rule('select-freeze', freeze_cmd)
 w.rule('copy', 'cp $in $out')
 w.rule('cleanup', clean_cmd)
 w.rule('print-help', 'echo -ne "$$(cat .ninja-usage)"')
@@ -69,6 +141,10 @@ nb_dir = quarto_conf['noteout']['nb-dir']
 data_files = glob('data/*.csv')
 
 for lang in languages:
+    # Never written, so always runs; renders wait for it (order-only).
+    freeze_target = f'{lang}-freeze'
+    w.build(freeze_target, 'select-freeze', variables={'lang': lang})
+
     data_out_files = []
     for data_file in data_files:
         data_out_file = f'../{lang}-book/{nb_dir}/{data_file}'
@@ -82,18 +158,34 @@ for lang in languages:
             'pdf': 'pdf'
         }[fmt]
 
-        # Individual chapters
-        output_files = [f'../{lang}-book/{replace_ext(ch, f".{fmt}")}' for ch in Rmd_chapters]
+        # Individual chapters, depending only on the files each one uses.
+        # Rendering a single chapter always executes it, and stores the
+        # results in _freeze.  HTML only: the PDF book is a single file, so
+        # there are no per-chapter PDF outputs to check.
+        output_files = []
+        if fmt == 'html':
+            output_files = [f'../{lang}-book/{replace_ext(ch, ".html")}'
+                            for ch in Rmd_chapters]
         for (infile, outfile) in zip(Rmd_chapters, output_files):
             w.build(
                 outfile,
                 'quarto-render',
                 infile,
-                implicit=[f'_quarto-{lang}.yml', 'simon_refs.bib'] + built_diagrams[image_fmt],
+                implicit=[f'_quarto-{lang}.yml', 'simon_refs.bib'] + chapter_deps(infile, image_fmt),
+                order_only=[freeze_target],
                 variables={'lang': lang, 'format': fmt}
             )
-
-        # Book builds, e.g. `python-book` and `python-book-pdf`
+        # The PDF book depends directly on the files the chapters use.
+        chapter_inputs = [] if output_files else sorted(
+            {dep for ch in Rmd_chapters for dep in chapter_deps(ch, image_fmt)}
+            | set(Rmd_chapters))
+
+        # Book builds, e.g. `python-book` and `python-book-pdf`.  The HTML
+        # book depends on the rendered chapters; with `freeze: auto`, the
+        # project render reuses their frozen results, rather than executing
+        # them again.  There are no chapter renders for the PDF book, so
+        # frozen results may be stale; the `pdf` profile (_quarto-pdf.yml)
+        # turns off freezing, so the PDF render executes every chapter.
         target_postfix = '' if (fmt == 'html') else '-pdf'
 
         w.build(
@@ -102,8 +194,12 @@ for lang in languages:
             "",
             implicit=([f'_quarto-{lang}.yml', 'simon_refs.bib'] +
                       built_diagrams[image_fmt] +
+                      output_files +
+                      chapter_inputs +
                       data_out_files),
-            variables={'lang': lang, 'format': fmt}
+            order_only=[freeze_target],
+            variables={'lang': lang, 'format': fmt,
+                       'profile': lang if fmt == 'html' else f'{lang},pdf'}
         )
 
 w.build('bibcheck', 'check-bibliography', 'simon_refs.bib')
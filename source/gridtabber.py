@@ -1,11 +1,8 @@
 """ Routines for working with grid tables
 """
 
-# We need to catch warnings, as these break up the generated Markdown.
 import warnings
 
-warnings.filterwarnings("error")
-
 
 def replace_val(part, val):
     vs = f' {val}'
@@ -40,7 +37,11 @@ def footerize_table(tab_md, indices=(-2, -1)):
 
 
 def to_md(df, prepended=None, extended=None):
-    tab_md = df.to_markdown(index=None, tablefmt='grid', numalign="left")
+    # We need to catch warnings, as these break up the generated Markdown.
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        tab_md = df.to_markdown(index=None, tablefmt='grid',
+                                numalign="left")
     if prepended is not None:
         tab_md = extend_with_row(tab_md, prepended)
     if extended is not None:
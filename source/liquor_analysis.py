@@ -7,16 +7,32 @@ Used in:
 * testing_measured.Rmd
 """
 
+from functools import lru_cache
+
 import numpy as np
-import pandas as pd
-import matplotlib.pyplot as plt
+
+# We import Pandas and Matplotlib, and load the data, on first use, to keep
+# import fast.
+
+
+@lru_cache(maxsize=None)
+def _prices():
+    import data
+    liquor = data.liquor_prices
+    return tuple(np.array(liquor['price'][liquor['state_type'] == label])
+                 for label in ('government', 'private'))
 
 
-IN_DATA = pd.read_csv('data/liquor_prices.csv').groupby('state_type')['price']
-GOVT, PRIV = [np.array(values) for label, values in IN_DATA]
+def __getattr__(name):
+    # GOVT and PRIV price arrays.
+    if name in ('GOVT', 'PRIV'):
+        return _prices()[name == 'PRIV']
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 def md_table():
+    import pandas as pd
+    GOVT, PRIV = _prices()
     df = pd.DataFrame()
     df['Private'] = PRIV
     row_labels = df.index[:len(GOVT)]
@@ -31,11 +47,14 @@ def md_table():
                             counts.to_frame().T,
                             means.to_frame().T])
     with_means = with_means.round(2).astype(object).fillna('')
-    with_means.loc['**Count**'] = with_means.loc['**Count**'].astype(int).astype(object)
+    with_means.loc['**Count**'] = (
+        with_means.loc['**Count**'].astype(int).astype(object))
     return with_means.to_markdown(tablefmt="grid")
 
 
 def price_plots():
+    import matplotlib.pyplot as plt
+    GOVT, PRIV = _prices()
     fig, axes = plt.subplots(1, 3)
     bins = np.arange(3.5, 5.5, 0.1)
     axis_lims = [np.min(bins), np.max(bins), 0, 8]
@@ -0,0 +1,72 @@
+""" Vectorized resampling helpers for the book simulations
+
+We import the submodules on first use of one of their names, so ``import
+resampling`` is cheap, and a chapter only pays for the helpers it uses.
+"""
+
+from importlib import import_module
+import sys
+import types
+
+# Submodule defining each public name.
+_EXPORTS = {
+    'kernels': ('get_rng', 'trial_blocks', 'bootstrap_indices',
+                'shuffle_indices', 'category_counts', 'iter_samples',
+                'resample_stat', 'bootstrap', 'shuffle'),
+    'parallel': ('book_seed', 'seed_sequence', 'imap_chunks', 'map_chunks',
+                 'run_trials'),
+    'streaming': ('Moments', 'TailCount', 'IntHistogram', 'Histogram',
+                  'QuantileSketch', 'simulate_stream'),
+    'permutation': ('PermutationResult', 'permutation_test'),
+    'exact': ('PMF', 'composition_pmf', 'count_pmf', 'sum_pmf'),
+    'adaptive': ('AdaptiveResult', 'run_adaptive', 'adaptive_proportion',
+                 'adaptive_mean', 'adaptive_quantile'),
+    'variance': ('Estimate', 'plain', 'antithetic', 'control_variate',
+                 'stratified', 'binomial_tail'),
+    'correlation': ('permuted_sum_products', 'permutation_correlation',
+                    'bootstrap_correlation'),
+    'sequences': ('run_lengths', 'count_runs', 'longest_run', 'first_index',
+                  'waiting_time', 'barrier_crossing', 'sequence_stat'),
+    'categorical': ('Categorical', 'Urn'),
+    'confidence': ('BootstrapResult', 'jackknife', 'bootstrap_stats',
+                   'bootstrap_ci'),
+    'rng': ('BufferedGenerator', 'make_generator'),
+    'rejection': ('ABCResult', 'abc_sample'),
+    'sweep': ('grid_points', 'sweep_results', 'sweep'),
+}
+
+# Maps public name to submodule.
+_SOURCES = {name: module for module, names in _EXPORTS.items()
+            for name in names}
+
+__all__ = list(_SOURCES)
+
+
+class _Package(types.ModuleType):
+
+    def __setattr__(self, name, value):
+        # Importing a submodule sets it as an attribute of this package.  The
+        # function ``sweep`` should not give way to the submodule ``sweep``.
+        if name in _SOURCES and isinstance(value, types.ModuleType):
+            return
+        super().__setattr__(name, value)
+
+
+def __getattr__(name):
+    # Import submodules, and the names they define, on first access.
+    if name in _SOURCES:
+        value = getattr(import_module(f'.{_SOURCES[name]}', __name__), name)
+    elif name in _EXPORTS:
+        value = import_module(f'.{name}', __name__)
+    else:
+        raise AttributeError(
+            f"module {__name__!r} has no attribute {name!r}")
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_SOURCES) | set(_EXPORTS))
+
+
+sys.modules[__name__].__class__ = _Package
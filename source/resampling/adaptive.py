@@ -0,0 +1,238 @@
+""" Run simulations until the estimate is precise enough
+
+The chapters choose a fixed number of trials, such as 10,000.  This is more
+than we need when the answer is far from any value of interest, and may be
+too few when it is close.  Here we run trials in batches, and stop when the
+confidence interval for the estimate is narrow enough, or (optionally) when
+it no longer includes a decision level, such as a p value of 0.05, or when we
+reach a limit on trials or time.  The result records how many trials we
+used, and why we stopped.
+"""
+
+from statistics import NormalDist
+import time
+
+import numpy as np
+
+from .kernels import get_rng
+from .streaming import TailCount, Moments, QuantileSketch
+
+# Trials per batch.
+BATCH_TRIALS = 10_000
+
+# Maximum total number of trials.
+MAX_TRIALS = 10_000_000
+
+
+class AdaptiveResult:
+    """ Result of adaptive simulation
+
+    Attributes
+    ----------
+    estimate : float
+        Estimate from all trials.
+    interval : tuple
+        ``(low, high)`` confidence interval for estimate.
+    n_trials : int
+        Number of trials run.
+    stop_reason : str
+        One of 'precision', 'decision', 'trials', 'time'.
+    accumulator : object
+        Accumulator with results of all trials.  See :mod:`.streaming`.
+    """
+
+    def __init__(self, estimate, interval, n_trials, stop_reason,
+                 accumulator):
+        self.estimate = estimate
+        self.interval = interval
+        self.n_trials = n_trials
+        self.stop_reason = stop_reason
+        self.accumulator = accumulator
+
+    @property
+    def half_width(self):
+        return (self.interval[1] - self.interval[0]) / 2
+
+    def __repr__(self):
+        return (f'AdaptiveResult(estimate={self.estimate}, '
+                f'interval={self.interval}, n_trials={self.n_trials}, '
+                f'stop_reason={self.stop_reason!r})')
+
+
+def _z(confidence):
+    return NormalDist().inv_cdf(0.5 + confidence / 2)
+
+
+def proportion_interval(confidence=0.95):
+    """ Function returning proportion and Wilson interval from TailCount
+
+    The Wilson interval behaves well for proportions near 0 or 1, as for small
+    p values.
+    """
+    z = _z(confidence)
+
+    def interval(acc):
+        n, p = acc.n, acc.proportion
+        center = (p + z ** 2 / (2 * n)) / (1 + z ** 2 / n)
+        half = (z / (1 + z ** 2 / n) *
+                np.sqrt(p * (1 - p) / n + z ** 2 / (4 * n ** 2)))
+        return p, (center - half, center + half)
+
+    return interval
+
+
+def mean_interval(confidence=0.95):
+    """ Function returning mean and normal interval from Moments
+    """
+    z = _z(confidence)
+
+    def interval(acc):
+        se = acc.std(1) / np.sqrt(acc.n) if acc.n > 1 else np.inf
+        return acc.mean, (acc.mean - z * se, acc.mean + z * se)
+
+    return interval
+
+
+def quantile_interval(q, confidence=0.95):
+    """ Function returning quantile `q` and interval from quantile estimator
+
+    The estimator should have ``n`` and a ``quantile`` method, as do
+    :class:`.QuantileSketch` and :class:`.IntHistogram`.  We get the interval
+    from the binomial distribution of the number of results below the
+    quantile.
+    """
+    z = _z(confidence)
+
+    def interval(acc):
+        half = z * np.sqrt(q * (1 - q) / acc.n)
+        ranks = np.clip([q, q - half, q + half], 0, 1)
+        est, low, high = acc.quantile(ranks)
+        return est, (low, high)
+
+    return interval
+
+
+def run_adaptive(chunk_func, accumulator, interval, tol=None, level=None,
+                 batch_trials=BATCH_TRIALS, min_trials=None,
+                 max_trials=MAX_TRIALS, max_seconds=None, rng=None):
+    """ Run batches of trials until interval is narrow enough
+
+    Parameters
+    ----------
+    chunk_func : callable
+        Called as ``chunk_func(rng, n)``; should return a 1-D array of `n`
+        trial results.
+    accumulator : object
+        Accumulator for results.  See :mod:`.streaming`.
+    interval : callable
+        Called as ``interval(accumulator)``; returns estimate and ``(low,
+        high)`` interval.  See :func:`proportion_interval`,
+        :func:`mean_interval` and :func:`quantile_interval`.
+    tol : None or float, optional
+        Stop when half the interval width is at or below `tol`.
+    level : None or float, optional
+        Stop when the interval no longer includes `level`.  Use this to stop
+        once it is clear which side of a threshold (such as p = 0.05) the
+        estimate is on.
+    batch_trials : int, optional
+        Number of trials in each batch.
+    min_trials : None or int, optional
+        Always run at least this many trials.  Default is `batch_trials`.
+    max_trials : int, optional
+        Stop after at least this many trials.
+    max_seconds : None or float, optional
+        Stop after first batch finishing after this many seconds.
+    rng : None or int or Generator, optional
+        See :func:`.kernels.get_rng`.
+
+    Returns
+    -------
+    result : AdaptiveResult
+    """
+    if tol is None and level is None:
+        raise ValueError('Specify one or both of `tol` and `level`')
+    rng = get_rng(rng)
+    min_trials = batch_trials if min_trials is None else min_trials
+    start = time.perf_counter()
+    n = 0
+    while True:
+        accumulator.update(chunk_func(rng, batch_trials))
+        n += batch_trials
+        estimate, (low, high) = interval(accumulator)
+        if n < min_trials:
+            continue
+        if tol is not None and (high - low) / 2 <= tol:
+            reason = 'precision'
+        elif level is not None and not low <= level <= high:
+            reason = 'decision'
+        elif n >= max_trials:
+            reason = 'trials'
+        elif (max_seconds is not None and
+              time.perf_counter() - start >= max_seconds):
+            reason = 'time'
+        else:
+            continue
+        return AdaptiveResult(estimate, (low, high), n, reason, accumulator)
+
+
+def adaptive_proportion(chunk_func, op, threshold, tol=None, level=None,
+                        confidence=0.95, **kwargs):
+    """ Estimate proportion of results for which ``result <op> threshold``
+
+    Parameters
+    ----------
+    chunk_func : callable
+        Called as ``chunk_func(rng, n)``; should return a 1-D array of `n`
+        trial results.
+    op : str
+        Comparison; see :class:`.TailCount`.
+    threshold : scalar
+        Value to compare results against.
+    tol : None or float, optional
+        Stop when half the interval width is at or below `tol`.
+    level : None or float, optional
+        Stop when the interval no longer includes `level`.
+    confidence : float, optional
+        Confidence level for interval.
+    **kwargs
+        Other arguments for :func:`run_adaptive`.
+
+    Returns
+    -------
+    result : AdaptiveResult
+
+    Examples
+    --------
+    Probability of 14 or more tails in 20 coin tosses, to within 0.002:
+
+    >>> def n_tails(rng, n):
+    ...     return np.sum(rng.integers(0, 2, size=(n, 20)), axis=1)
+    >>> res = adaptive_proportion(n_tails, '>=', 14, tol=0.002, rng=1)
+    >>> res.stop_reason, bool(res.half_width <= 0.002)
+    ('precision', True)
+    """
+    return run_adaptive(chunk_func, TailCount(op, threshold),
+                        proportion_interval(confidence), tol, level,
+                        **kwargs)
+
+
+def adaptive_mean(chunk_func, tol=None, level=None, confidence=0.95,
+                  **kwargs):
+    """ Estimate mean of trial results
+
+    See :func:`adaptive_proportion` for parameters.
+    """
+    return run_adaptive(chunk_func, Moments(), mean_interval(confidence),
+                        tol, level, **kwargs)
+
+
+def adaptive_quantile(chunk_func, q, tol=None, level=None, confidence=0.95,
+                      k=1000, **kwargs):
+    """ Estimate quantile `q` of trial results
+
+    `k` is the capacity of the :class:`.QuantileSketch`.  See
+    :func:`adaptive_proportion` for other parameters.
+    """
+    return run_adaptive(chunk_func, QuantileSketch(k),
+                        quantile_interval(q, confidence), tol, level,
+                        **kwargs)
@@ -0,0 +1,235 @@
+""" Compact arrays of labels, for draws from urns of named things
+
+The chapters often draw labels directly, as in::
+
+    cars = rnd.choice(['working', 'faulty'], p=[0.7, 0.3], size=n_trials)
+
+This makes an array of strings, using 28 bytes per element for ``'<U7'``,
+and comparisons like ``cars == 'working'`` have to compare strings.
+:class:`Categorical` stores the same labels as small integer codes (one byte
+per element for up to 256 labels), plus a table of the labels.  Comparing,
+masking and counting work on the codes, and we only convert back to strings
+for display.  :class:`Urn` draws :class:`Categorical` samples::
+
+    cars = Urn(['working', 'faulty'], p=[0.7, 0.3]).choice(n_trials, rng=rnd)
+    np.sum(cars == 'faulty')
+"""
+
+import numpy as np
+
+from .kernels import get_rng
+
+
+def _code_dtype(n_labels):
+    return np.uint8 if n_labels <= 256 else np.uint16
+
+
+class Categorical:
+    """ Array of labels, stored as integer codes into a table of labels
+
+    Parameters
+    ----------
+    codes : array-like
+        Integer codes; ``labels[codes]`` gives the labels.
+    labels : sequence
+        Distinct labels.
+
+    Attributes
+    ----------
+    codes : array
+        Integer codes.
+    labels : array
+        Distinct labels.
+    """
+
+    def __init__(self, codes, labels):
+        self.labels = np.asarray(labels)
+        if len(np.unique(self.labels)) != len(self.labels):
+            raise ValueError('labels should be distinct')
+        if len(self.labels) > 2 ** 16:
+            raise ValueError('Too many labels')
+        self.codes = np.asarray(codes, dtype=_code_dtype(len(self.labels)))
+        self._sorter = np.argsort(self.labels)
+
+    @classmethod
+    def from_labels(cls, values, labels=None):
+        """ Categorical from array-like `values` of labels
+
+        Parameters
+        ----------
+        values : array-like
+            Labels.
+        labels : None or sequence, optional
+            Distinct labels, giving order of codes.  If None, use sorted
+            distinct `values`.
+        """
+        values = np.asarray(values)
+        if labels is None:
+            labels, codes = np.unique(values, return_inverse=True)
+            return cls(codes.reshape(values.shape), labels)
+        cat = cls(np.zeros(values.shape), labels)
+        cat.codes[...] = cat.code(values)
+        return cat
+
+    @classmethod
+    def full(cls, shape, label, labels):
+        """ Categorical of given `shape`, filled with `label`
+        """
+        cat = cls(np.zeros(shape), labels)
+        cat.codes[...] = cat.code(label)
+        return cat
+
+    def _lookup(self, label):
+        # Codes for `label`, with -1 for values that are not labels.
+        values = np.asarray(label)
+        n_labels = len(self.labels)
+        pos = np.searchsorted(self.labels, values, sorter=self._sorter)
+        codes = self._sorter[np.minimum(pos, n_labels - 1)]
+        return np.where(self.labels[codes] == values, codes, -1)
+
+    def code(self, label):
+        """ Integer code(s) for `label`, which may be scalar or array-like
+        """
+        values = np.asarray(label)
+        codes = self._lookup(values)
+        bad = codes == -1
+        if np.any(bad):
+            raise ValueError(f'{values[bad].tolist()[0]!r} is not one of the '
+                             f'labels {self.labels.tolist()}')
+        codes = codes.astype(self.codes.dtype)
+        return codes[()] if codes.ndim == 0 else codes
+
+    @property
+    def shape(self):
+        return self.codes.shape
+
+    @property
+    def nbytes(self):
+        return self.codes.nbytes
+
+    def __len__(self):
+        return len(self.codes)
+
+    def _other_codes(self, other, strict=True):
+        # Codes for `other`.  If not `strict`, values that are not labels
+        # get code -1, which matches no element.
+        lookup = self.code if strict else self._lookup
+        if isinstance(other, Categorical):
+            if np.array_equal(other.labels, self.labels):
+                return other.codes
+            return lookup(other.labels)[other.codes]
+        return lookup(other)
+
+    # As for arrays of strings, comparing with a value that is not a label
+    # gives all False (or all True for !=).
+
+    def __eq__(self, other):
+        return self.codes == self._other_codes(other, strict=False)
+
+    def __ne__(self, other):
+        return self.codes != self._other_codes(other, strict=False)
+
+    def isin(self, labels):
+        """ Boolean array, True where label is one of `labels`
+        """
+        return np.isin(self.codes, self._lookup(np.atleast_1d(labels)))
+
+    def __getitem__(self, key):
+        codes = self.codes[key]
+        if np.ndim(codes) == 0:
+            return self.labels[codes]
+        return Categorical(codes, self.labels)
+
+    def __setitem__(self, key, value):
+        self.codes[key] = self._other_codes(value)
+
+    def count(self, label, axis=None):
+        """ Number of elements equal to `label`, optionally along `axis`
+        """
+        return np.sum(self == label, axis=axis)
+
+    def counts(self):
+        """ Number of each label, for 1-D, or for each row, for 2-D
+
+        Returns
+        -------
+        counts : array
+            For 1-D arrays, shape (len(labels),).  For 2-D arrays, shape
+            (n_rows, len(labels)), with counts for each row.
+        """
+        n_labels = len(self.labels)
+        if self.codes.ndim == 1:
+            return np.bincount(self.codes, minlength=n_labels)
+        if self.codes.ndim != 2:
+            raise ValueError('counts needs 1-D or 2-D array')
+        n_rows = len(self.codes)
+        # Give each row its own range of bins.
+        offsets = np.arange(n_rows)[:, None] * n_labels
+        return np.bincount((self.codes + offsets).ravel(),
+                           minlength=n_rows * n_labels).reshape(
+                               n_rows, n_labels)
+
+    def decode(self):
+        """ Array of labels
+        """
+        return self.labels[self.codes]
+
+    def __array__(self, dtype=None, copy=None):
+        return self.decode() if dtype is None else self.decode().astype(dtype)
+
+    def __repr__(self):
+        return f'Categorical({self.decode()!r})'
+
+
+class Urn:
+    """ Urn of labels, to draw :class:`Categorical` samples
+
+    Parameters
+    ----------
+    labels : sequence
+        Distinct labels.
+    p : None or sequence, optional
+        Probability of drawing each label.  If None, labels are equally
+        likely.
+    counts : None or sequence, optional
+        Number of balls with each label.  Specify at most one of `p` and
+        `counts`.
+
+    Examples
+    --------
+    >>> urn = Urn(['working', 'faulty'], p=[0.7, 0.3])
+    >>> cars = urn.choice(1_000_000, rng=1)
+    >>> cars.nbytes
+    1000000
+    >>> round(float(np.mean(cars == 'faulty')), 2)
+    0.3
+    """
+
+    def __init__(self, labels, p=None, counts=None):
+        self.labels = np.asarray(labels)
+        if p is not None and counts is not None:
+            raise ValueError('Specify at most one of p and counts')
+        if counts is not None:
+            p = np.asarray(counts) / np.sum(counts)
+        self.p = None if p is None else np.asarray(p, dtype=float)
+        self.counts = None if counts is None else np.asarray(counts)
+        if self.p is not None and self.p.shape != self.labels.shape:
+            raise ValueError('Need one probability or count per label')
+
+    def choice(self, size=None, replace=True, rng=None):
+        """ Draw Categorical sample of `size` from urn
+
+        Without replacement, we draw from the individual balls, and therefore
+        need `counts`.
+        """
+        rng = get_rng(rng)
+        dtype = _code_dtype(len(self.labels))
+        if replace:
+            codes = rng.choice(len(self.labels), size=size, p=self.p)
+        elif self.counts is None:
+            raise ValueError('Need counts to draw without replacement')
+        else:
+            balls = np.repeat(np.arange(len(self.labels), dtype=dtype),
+                              self.counts)
+            codes = rng.choice(balls, size=size, replace=False)
+        return Categorical(np.asarray(codes, dtype=dtype), self.labels)
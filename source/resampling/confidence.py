@@ -0,0 +1,247 @@
+""" Bootstrap confidence intervals for several statistics from one resample
+
+The confidence chapters draw bootstrap samples, calculate one statistic for
+each, and take percentiles of the results.  When we want intervals for
+several statistics (mean, median, trimmed mean...), we can calculate all of
+them from the same bootstrap samples, generating the samples only once.
+
+:func:`bootstrap_ci` returns :class:`BootstrapResult` objects giving
+percentile, basic and BCa (bias-corrected and accelerated) intervals.  The
+BCa interval needs the jackknife (leave-one-out) values of the statistic.
+For the mean and sum, we get these directly from the total, without
+recalculating the statistic for each of the `n` leave-one-out samples.
+
+`data` can be one array, or a tuple of arrays for independent groups; we
+resample each group separately.  Statistics are then called with one
+argument per group, as in ``statistic(group_a, group_b, axis=1)``.
+"""
+
+from statistics import NormalDist
+
+import numpy as np
+
+from .kernels import get_rng, trial_blocks, MAX_ELEMENTS
+
+# Named statistics for single arrays.
+STATISTICS = {'mean': np.mean, 'sum': np.sum, 'median': np.median,
+              'std': np.std, 'var': np.var}
+
+# Interval methods.
+METHODS = ('percentile', 'basic', 'bca')
+
+
+class BootstrapResult:
+    """ Bootstrap distribution of statistic, with confidence intervals
+
+    Attributes
+    ----------
+    observed : float
+        Statistic for original data.
+    values : array
+        Statistic for each bootstrap sample.
+    jackknife : array
+        Statistic for each leave-one-out sample (concatenated over groups).
+    """
+
+    def __init__(self, observed, values, jackknife):
+        self.observed = observed
+        self.values = values
+        self.jackknife = jackknife
+
+    @property
+    def se(self):
+        """ Bootstrap standard error
+        """
+        return np.std(self.values, ddof=1)
+
+    @property
+    def bias(self):
+        return np.mean(self.values) - self.observed
+
+    @property
+    def acceleration(self):
+        """ BCa acceleration, from jackknife values
+        """
+        u = np.mean(self.jackknife) - self.jackknife
+        denom = 6 * np.sum(u ** 2) ** 1.5
+        return np.sum(u ** 3) / denom if denom > 0 else 0.
+
+    def _bca_percents(self, alpha):
+        nd = NormalDist()
+        below = (np.mean(self.values < self.observed) +
+                 np.mean(self.values == self.observed) / 2)
+        below = np.clip(below, 1 / len(self.values),
+                        1 - 1 / len(self.values))
+        z0 = nd.inv_cdf(below)
+        a = self.acceleration
+        percents = []
+        for p in alpha:
+            z = z0 + nd.inv_cdf(p)
+            percents.append(nd.cdf(z0 + z / (1 - a * z)) * 100)
+        return percents
+
+    def interval(self, method='percentile', confidence=0.95):
+        """ Confidence interval for statistic
+
+        Parameters
+        ----------
+        method : {'percentile', 'basic', 'bca'}, optional
+            Method for interval.
+        confidence : float, optional
+            Confidence level.
+
+        Returns
+        -------
+        interval : tuple
+            ``(low, high)`` interval.
+        """
+        alpha = ((1 - confidence) / 2, (1 + confidence) / 2)
+        if method == 'percentile':
+            low, high = np.percentile(self.values, np.multiply(alpha, 100))
+        elif method == 'basic':
+            p_low, p_high = np.percentile(self.values,
+                                          np.multiply(alpha, 100))
+            low, high = 2 * self.observed - p_high, 2 * self.observed - p_low
+        elif method == 'bca':
+            low, high = np.percentile(self.values, self._bca_percents(alpha))
+        else:
+            raise ValueError(f'method should be one of {METHODS}')
+        return low, high
+
+    def __repr__(self):
+        return (f'BootstrapResult(observed={self.observed}, '
+                f'se={self.se}, interval={self.interval()})')
+
+
+def _as_groups(data):
+    if isinstance(data, tuple):
+        return [np.asarray(g) for g in data]
+    return [np.asarray(data)]
+
+
+def _as_funcs(statistics, n_groups):
+    if callable(statistics) or isinstance(statistics, str):
+        statistics = {'statistic': statistics}
+    funcs = {}
+    for name, stat in statistics.items():
+        if isinstance(stat, str):
+            if n_groups != 1:
+                raise ValueError('Named statistics need a single data array')
+            if stat not in STATISTICS:
+                raise ValueError(f'Statistic should be one of '
+                                 f'{list(STATISTICS)} or a function')
+            stat = STATISTICS[stat]
+        funcs[name] = stat
+    return funcs
+
+
+def jackknife(data, statistic):
+    """ Statistic for each leave-one-out sample of `data`
+
+    Parameters
+    ----------
+    data : array-like or tuple
+        One array, or tuple of arrays for independent groups.
+    statistic : str or callable
+        Name from :data:`STATISTICS`, or function called as
+        ``statistic(*samples, axis=1)``, with 2-D samples for each group.
+
+    Returns
+    -------
+    values : array
+        For each group in turn, the statistic for the samples leaving out
+        each element of that group, with the other groups unchanged.
+
+    Examples
+    --------
+    >>> jackknife([1, 2, 3, 6], 'mean').tolist()
+    [3.6666666666666665, 3.3333333333333335, 3.0, 2.0]
+    """
+    groups = _as_groups(data)
+    func = _as_funcs(statistic, len(groups))['statistic']
+    if len(groups) == 1 and func in (np.mean, np.sum):
+        # Leave-one-out totals, in O(n).
+        x = groups[0].astype(float)
+        totals = np.sum(x) - x
+        return totals / (len(x) - 1) if func is np.mean else totals
+    values = []
+    for i, group in enumerate(groups):
+        n = len(group)
+        keep = ~np.eye(n, dtype=bool)
+        samples = [np.broadcast_to(g, (n, len(g))) for g in groups]
+        samples[i] = np.broadcast_to(group, (n, n))[keep].reshape(n, n - 1)
+        values.append(func(*samples, axis=1))
+    return np.concatenate(values)
+
+
+def bootstrap_stats(data, statistics, n_trials, rng=None,
+                    max_elements=MAX_ELEMENTS):
+    """ Values of several statistics for the same bootstrap samples
+
+    Parameters
+    ----------
+    data : array-like or tuple
+        One array, or tuple of arrays for independent groups.
+    statistics : dict
+        Maps names to statistics.  Statistics are names from
+        :data:`STATISTICS`, or functions called as ``statistic(*samples,
+        axis=1)``, where `samples` has a 2-D array of bootstrap samples for
+        each group, one sample per row.
+    n_trials : int
+        Number of bootstrap samples.
+    rng : None or int or Generator, optional
+        See :func:`.kernels.get_rng`.
+    max_elements : int, optional
+        Maximum number of sample elements (over all groups) at any one time.
+
+    Returns
+    -------
+    values : dict
+        Maps names to arrays of statistic values, one per bootstrap sample.
+    """
+    groups = _as_groups(data)
+    funcs = _as_funcs(statistics, len(groups))
+    rng = get_rng(rng)
+    values = {name: np.zeros(n_trials) for name in funcs}
+    row_size = sum(len(g) for g in groups)
+    for start, stop in trial_blocks(n_trials, row_size, max_elements):
+        samples = [g[rng.integers(0, len(g), size=(stop - start, len(g)))]
+                   for g in groups]
+        for name, func in funcs.items():
+            values[name][start:stop] = func(*samples, axis=1)
+    return values
+
+
+def bootstrap_ci(data, statistics, n_trials=10_000, rng=None,
+                 max_elements=MAX_ELEMENTS):
+    """ Bootstrap distributions and intervals for several statistics
+
+    See :func:`bootstrap_stats` for parameters.
+
+    Returns
+    -------
+    results : dict
+        Maps names in `statistics` to :class:`BootstrapResult`.  If
+        `statistics` is a single statistic, return a single
+        :class:`BootstrapResult`.
+
+    Examples
+    --------
+    >>> gains = [31, 34, 29, 26, 32, 35, 38, 34, 31, 29, 32, 30]
+    >>> res = bootstrap_ci(gains, {'mean': 'mean', 'median': 'median'},
+    ...                    rng=1)
+    >>> low, high = res['mean'].interval('bca')
+    >>> bool(29 < low < 31.75 < high < 34)
+    True
+    """
+    single = callable(statistics) or isinstance(statistics, str)
+    groups = _as_groups(data)
+    funcs = _as_funcs(statistics, len(groups))
+    values = bootstrap_stats(tuple(groups), funcs, n_trials, rng,
+                             max_elements)
+    results = {}
+    for name, func in funcs.items():
+        observed = func(*[g[None] for g in groups], axis=1)[0]
+        results[name] = BootstrapResult(observed, values[name],
+                                        jackknife(tuple(groups), func))
+    return results['statistic'] if single else results
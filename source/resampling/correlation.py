@@ -0,0 +1,174 @@
+""" Permutation tests and bootstrap intervals for correlation and slope
+
+The correlation chapters test association by shuffling `y`, and recalculating
+``np.corrcoef(x, shuffled)[0, 1]`` (or a sum of products, or a slope) once per
+trial.  All of these are linear functions of the sum of products ``x @
+shuffled``, given the means and standard deviations of `x` and `y`, which do
+not change when we shuffle.  So we make a block of shuffled `y` rows, and get
+all the sums of products for the block with one matrix-vector product.
+
+For confidence intervals we resample (x, y) pairs with replacement (the
+"pairs bootstrap"), and get the sums, sums of squares and sums of products for
+a whole block of resamples at once.
+"""
+
+import numpy as np
+
+from .kernels import get_rng, iter_samples, MAX_ELEMENTS
+from .permutation import PermutationResult
+
+# Statistics we can calculate from the sum of products.
+STATISTICS = ('r', 'slope', 'sum_products')
+
+
+def _from_sum_products(sp, x, y, statistic):
+    # Convert sums of products `sp` to `statistic`, for fixed x, y values.
+    n = len(x)
+    if statistic == 'sum_products':
+        return sp
+    cov = sp / n - x.mean() * y.mean()
+    if statistic == 'slope':
+        return cov / x.var()
+    if statistic == 'r':
+        return cov / (x.std() * y.std())
+    raise ValueError(f'statistic should be one of {STATISTICS}')
+
+
+def _xy(x, y):
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    if x.shape != y.shape or x.ndim != 1:
+        raise ValueError('x and y should be 1-D with the same length')
+    return x, y
+
+
+def permuted_sum_products(x, y, n_trials, rng=None,
+                          max_elements=MAX_ELEMENTS):
+    """ Sums of products of `x` with `n_trials` shuffles of `y`
+
+    Parameters
+    ----------
+    x, y : array-like
+        1-D arrays of the same length.
+    n_trials : int
+        Number of shuffles.
+    rng : None or int or Generator, optional
+        See :func:`.kernels.get_rng`.
+    max_elements : int, optional
+        Maximum number of shuffled values to generate at any one time.
+
+    Returns
+    -------
+    sums : array, shape (n_trials,)
+        ``np.sum(x * shuffled)`` for each shuffle.
+    """
+    x, y = _xy(x, y)
+    sums = np.zeros(n_trials)
+    for start, stop, shuffled in iter_samples(y, n_trials, False, rng=rng,
+                                              max_elements=max_elements):
+        sums[start:stop] = shuffled @ x
+    return sums
+
+
+def permutation_correlation(x, y, statistic='r', alternative='greater',
+                            n_trials=10_000, rng=None,
+                            max_elements=MAX_ELEMENTS):
+    """ Permutation test for association of `x` and `y`
+
+    Parameters
+    ----------
+    x, y : array-like
+        1-D arrays of the same length.
+    statistic : {'r', 'slope', 'sum_products'}, optional
+        Correlation coefficient, least-squares slope of `y` on `x`, or sum of
+        products ``np.sum(x * y)``.  All give the same p value.
+    alternative : {'greater', 'less', 'two-sided'}, optional
+        Which statistic values count as extreme.
+    n_trials : int, optional
+        Number of shuffles of `y`.
+    rng : None or int or Generator, optional
+        See :func:`.kernels.get_rng`.
+    max_elements : int, optional
+        Maximum number of shuffled values to generate at any one time.
+
+    Returns
+    -------
+    result : PermutationResult
+
+    Examples
+    --------
+    >>> ath = np.array([97, 94, 93, 90, 87, 86, 86, 85, 81, 76, 74, 73])
+    >>> iq = np.array([114, 120, 107, 113, 118, 101, 109, 110, 100, 99, 103,
+    ...                105])
+    >>> res = permutation_correlation(ath, iq, rng=1)
+    >>> round(float(res.observed), 3), bool(res.p_value < 0.05)
+    (0.684, True)
+    """
+    x, y = _xy(x, y)
+    if statistic not in STATISTICS:
+        raise ValueError(f'statistic should be one of {STATISTICS}')
+    observed = _from_sum_products(x @ y, x, y, statistic)
+    null = _from_sum_products(
+        permuted_sum_products(x, y, n_trials, rng, max_elements),
+        x, y, statistic)
+    values, counts = np.unique(null, return_counts=True)
+    return PermutationResult(observed, values, counts, 'monte-carlo',
+                             alternative)
+
+
+def bootstrap_correlation(x, y, statistic='r', n_trials=10_000,
+                          confidence=0.95, rng=None,
+                          max_elements=MAX_ELEMENTS):
+    """ Pairs bootstrap for correlation or slope of `y` on `x`
+
+    Parameters
+    ----------
+    x, y : array-like
+        1-D arrays of the same length.
+    statistic : {'r', 'slope'}, optional
+        Correlation coefficient, or least-squares slope of `y` on `x`.
+    n_trials : int, optional
+        Number of resamples of (x, y) pairs.
+    confidence : float, optional
+        Confidence level for percentile interval.
+    rng : None or int or Generator, optional
+        See :func:`.kernels.get_rng`.
+    max_elements : int, optional
+        Maximum number of resampled indices to generate at any one time.
+
+    Returns
+    -------
+    values : array, shape (n_trials,)
+        Statistic for each resample.  Resamples where all `x` (or, for 'r',
+        all `y`) values are equal give NaN.
+    interval : tuple
+        ``(low, high)`` percentile interval from `values`, ignoring NaN.
+    """
+    x, y = _xy(x, y)
+    if statistic not in ('r', 'slope'):
+        raise ValueError("statistic should be 'r' or 'slope'")
+    n = len(x)
+    # Center to reduce rounding error in the sums of squares.
+    x, y = x - x.mean(), y - y.mean()
+    # Denominators below this are from resamples with all equal values.
+    min_denom = 1e-12 * (x.var() if statistic == 'slope' else
+                         x.std() * y.std())
+    values = np.zeros(n_trials)
+    for start, stop, inds in iter_samples(np.arange(n), n_trials, True,
+                                          rng=get_rng(rng),
+                                          max_elements=max_elements):
+        xs, ys = x[inds], y[inds]
+        mx, my = xs.mean(axis=1), ys.mean(axis=1)
+        cov = np.einsum('ij,ij->i', xs, ys) / n - mx * my
+        var_x = np.einsum('ij,ij->i', xs, xs) / n - mx ** 2
+        if statistic == 'slope':
+            denom = var_x
+        else:
+            var_y = np.einsum('ij,ij->i', ys, ys) / n - my ** 2
+            denom = np.sqrt(np.clip(var_x, 0, None) * np.clip(var_y, 0, None))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            values[start:stop] = np.where(denom > min_denom,
+                                          cov / denom, np.nan)
+    tail = (1 - confidence) / 2 * 100
+    low, high = np.nanpercentile(values, [tail, 100 - tail])
+    return values, (low, high)
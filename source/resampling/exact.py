@@ -0,0 +1,279 @@
+""" Exact distributions for draws from finite urns, decks and dice
+
+We describe an urn as in the simulations, with an array containing one
+element per ball (or card, or die face), such as::
+
+    deck = np.repeat(['spade', 'club', 'diamond', 'heart'], [13, 13, 13, 13])
+
+The routines here return the exact probabilities for the results of drawing
+from the urn, with or without replacement, that the simulations estimate.  We
+use convolution of generating functions for sums of draws with replacement,
+and a multivariate hypergeometric recursion for draws without replacement.
+Use these to check simulation results.
+"""
+
+from functools import lru_cache
+import math
+
+import numpy as np
+
+from .streaming import _COMPARISONS
+
+
+class PMF:
+    """ Probability mass function over numeric values
+
+    Attributes
+    ----------
+    values : array
+        Sorted distinct values.
+    probs : array
+        Probability of each of `values`.
+    """
+
+    def __init__(self, values, probs):
+        values = np.asarray(values)
+        probs = np.asarray(probs, dtype=float)
+        # Merge probabilities for equal values.
+        self.values, inverse = np.unique(values, return_inverse=True)
+        self.probs = np.bincount(inverse.ravel(), weights=probs,
+                                 minlength=len(self.values))
+
+    def prob(self, value):
+        """ Probability of result equal to `value`
+        """
+        return self.proportion('==', value)
+
+    def proportion(self, op, threshold):
+        """ Probability that ``result <op> threshold`` is True
+
+        For example, ``pmf.proportion('>=', 14)`` gives the probability that
+        the simulation estimates with ``np.sum(results >= 14) / n_trials``.
+        """
+        if op not in _COMPARISONS:
+            raise ValueError(f'op should be one of {list(_COMPARISONS)}')
+        return np.sum(self.probs[_COMPARISONS[op](self.values, threshold)])
+
+    @property
+    def mean(self):
+        return np.sum(self.values * self.probs)
+
+    @property
+    def var(self):
+        return np.sum((self.values - self.mean) ** 2 * self.probs)
+
+    def __add__(self, other):
+        """ PMF of sum of independent results from `self` and `other`
+        """
+        values = np.add.outer(self.values, other.values).ravel()
+        probs = np.multiply.outer(self.probs, other.probs).ravel()
+        return PMF(values, probs)
+
+    def __repr__(self):
+        return f'PMF(values={self.values!r}, probs={self.probs!r})'
+
+
+def urn_counts(urn):
+    """ Return distinct labels in `urn`, and number of each
+
+    Parameters
+    ----------
+    urn : array-like
+        One element per ball in the urn.
+
+    Returns
+    -------
+    labels : array
+        Sorted distinct elements of `urn`.
+    counts : tuple
+        Number of each label in `urn`.
+    """
+    labels, counts = np.unique(np.asarray(urn), return_counts=True)
+    return labels, tuple(int(c) for c in counts)
+
+
+def _iter_compositions(caps, n):
+    # Ways of splitting `n` into len(caps) parts, each part <= its cap.
+    if len(caps) == 1:
+        if n <= caps[0]:
+            yield (n,)
+        return
+    for k in range(min(caps[0], n) + 1):
+        for rest in _iter_compositions(caps[1:], n - k):
+            yield (k,) + rest
+
+
+@lru_cache(maxsize=128)
+def _compositions(counts, n_draws, replace):
+    # All possible numbers of each category among `n_draws` draws, with
+    # probabilities.  We use exact integer arithmetic up to the final
+    # division.
+    total = sum(counts)
+    caps = [n_draws if replace else c for c in counts]
+    comps = list(_iter_compositions(caps, n_draws))
+    if replace:
+        n_sequences = total ** n_draws
+        probs = [math.factorial(n_draws) //
+                 math.prod(math.factorial(k) for k in comp) *
+                 math.prod(c ** k for c, k in zip(counts, comp)) /
+                 n_sequences for comp in comps]
+    else:
+        n_hands = math.comb(total, n_draws)
+        probs = [math.prod(math.comb(c, k) for c, k in zip(counts, comp)) /
+                 n_hands for comp in comps]
+    return np.array(comps, dtype=int).reshape(-1, len(counts)), np.array(probs)
+
+
+def composition_pmf(urn, n_draws, replace=False):
+    """ Probabilities for numbers of each label in `n_draws` draws from `urn`
+
+    Parameters
+    ----------
+    urn : array-like
+        One element per ball in the urn.
+    n_draws : int
+        Number of draws.
+    replace : bool, optional
+        If True, draw with replacement (multinomial), otherwise without
+        (multivariate hypergeometric).
+
+    Returns
+    -------
+    labels : array
+        Sorted distinct elements of `urn`.
+    compositions : array, shape (n_compositions, len(labels))
+        Each row gives a possible number of each label in the draws.
+    probs : array, shape (n_compositions,)
+        Probability of each composition.
+
+    Examples
+    --------
+    Probability of 5 spades and 4 clubs in a bridge hand:
+
+    >>> deck = np.repeat(['spade', 'club', 'diamond', 'heart'], 13)
+    >>> labels, comps, probs = composition_pmf(deck, 13)
+    >>> spades, clubs = (labels == 'spade'), (labels == 'club')
+    >>> is_5_4 = (comps[:, spades] == 5) & (comps[:, clubs] == 4)
+    >>> round(float(np.sum(probs[is_5_4[:, 0]])), 4)
+    0.0217
+    """
+    labels, counts = urn_counts(urn)
+    if not replace and n_draws > sum(counts):
+        raise ValueError(f'Cannot draw {n_draws} from {sum(counts)} '
+                         'without replacement')
+    comps, probs = _compositions(counts, n_draws, replace)
+    return labels, comps, probs
+
+
+def count_pmf(urn, n_draws, success, replace=False):
+    """ PMF for number of draws from `urn` with values in `success`
+
+    Parameters
+    ----------
+    urn : array-like
+        One element per ball in the urn.
+    n_draws : int
+        Number of draws.
+    success : scalar or sequence
+        Value or values counting as successes.
+    replace : bool, optional
+        If True, draw with replacement (binomial), otherwise without
+        (hypergeometric).
+
+    Returns
+    -------
+    pmf : PMF
+
+    Examples
+    --------
+    Number of girls in 5 chosen from a class of 25 girls and 25 boys:
+
+    >>> whole_class = np.repeat(['girl', 'boy'], [25, 25])
+    >>> pmf = count_pmf(whole_class, 5, 'girl')
+    >>> round(float(pmf.prob(4)), 4)
+    0.1493
+    """
+    is_success = np.isin(np.asarray(urn), np.atleast_1d(success))
+    labels, comps, probs = composition_pmf(is_success, n_draws, replace)
+    return PMF(np.sum(comps[:, labels], axis=1), probs)
+
+
+def _int_pmf(values, probs):
+    # Dense probability array for integer values, starting at min value.
+    offset = int(values.min())
+    dense = np.zeros(int(values.max()) - offset + 1)
+    np.add.at(dense, values.astype(int) - offset, probs)
+    return offset, dense
+
+
+def sum_pmf(urn, n_draws, replace=True):
+    """ PMF for sum of `n_draws` draws from `urn`
+
+    Parameters
+    ----------
+    urn : array-like
+        One element per ball in the urn (or per face of a die).  Should be
+        numeric.
+    n_draws : int
+        Number of draws.
+    replace : bool, optional
+        If True, draw with replacement (for example, rolls of a die),
+        otherwise without (for example, cards in a hand).
+
+    Returns
+    -------
+    pmf : PMF
+
+    Examples
+    --------
+    Sum of two dice:
+
+    >>> pmf = sum_pmf(np.arange(1, 7), 2)
+    >>> round(float(pmf.prob(7)), 4)
+    0.1667
+
+    High card points in a bridge hand:
+
+    >>> whole_deck = np.repeat([1, 2, 3, 4, 0], [4, 4, 4, 4, 36])
+    >>> round(float(sum_pmf(whole_deck, 13, replace=False).prob(15)), 4)
+    0.0442
+    """
+    labels, counts = urn_counts(urn)
+    labels = labels.astype(float)
+    is_int = np.all(labels == np.round(labels))
+    if replace and is_int:
+        # Generating function for one draw, raised to power n_draws.
+        offset, one = _int_pmf(labels, np.array(counts) / sum(counts))
+        dense = np.ones(1)
+        for i in range(n_draws):
+            dense = np.convolve(dense, one)
+        values = np.arange(len(dense)) + offset * n_draws
+        return PMF(values[dense > 0], dense[dense > 0])
+    if not replace and is_int:
+        return _sum_no_replace(labels.astype(int), counts, n_draws)
+    labels, comps, probs = composition_pmf(urn, n_draws, replace)
+    return PMF(comps @ labels.astype(float), probs)
+
+
+def _sum_no_replace(labels, counts, n_draws):
+    # table[j, s] is number of ways of drawing j balls with (shifted) sum s,
+    # from the categories so far.
+    offset = labels.min()
+    shifted = labels - offset
+    max_sum = int(np.sum(np.sort(np.repeat(shifted, counts))[::-1][:n_draws]))
+    table = np.zeros((n_draws + 1, max_sum + 1))
+    table[0, 0] = 1
+    for value, count in zip(shifted, counts):
+        new = np.zeros_like(table)
+        for k in range(min(count, n_draws) + 1):
+            step = k * value
+            if step > max_sum:
+                break
+            new[k:, step:] += (math.comb(count, k) *
+                               table[:n_draws + 1 - k, :max_sum + 1 - step])
+        table = new
+    ways = table[n_draws]
+    values = np.arange(max_sum + 1) + offset * n_draws
+    present = ways > 0
+    return PMF(values[present],
+               ways[present] / math.comb(sum(counts), n_draws))
@@ -0,0 +1,303 @@
+""" Batched resampling kernels
+
+The simulations in the book usually loop over trials, drawing one sample per
+trial, and storing one value in a `results` array.  The routines here draw the
+samples for many trials at once, as rows of a 2-D array, and apply the
+statistic along the rows.  We generate the rows in blocks, so the memory we
+use stays bounded, however many trials we ask for.
+"""
+
+import numpy as np
+
+from .rng import BufferedGenerator
+
+# Maximum number of sample elements to generate at any one time.
+MAX_ELEMENTS = 2 ** 22
+
+
+def get_rng(rng=None):
+    """ Return random number generator from `rng`
+
+    Parameters
+    ----------
+    rng : None or int or Generator, optional
+        If None, return result of ``np.random.default_rng()``.  We look up
+        ``default_rng`` at call time, so, inside the book notebooks, we get the
+        seeded generator installed by ``_common.py``.  Otherwise, pass `rng` to
+        ``default_rng``; this returns a Generator unchanged.  We also return
+        a :class:`.rng.BufferedGenerator` unchanged.
+
+    Returns
+    -------
+    rng : Generator or BufferedGenerator
+    """
+    if rng is None:
+        return np.random.default_rng()
+    if isinstance(rng, BufferedGenerator):
+        return rng
+    return np.random.default_rng(rng)
+
+
+def trial_blocks(n_trials, row_size, max_elements=MAX_ELEMENTS):
+    """ Yield ``(start, stop)`` trial slices with bounded numbers of elements
+
+    Parameters
+    ----------
+    n_trials : int
+        Total number of trials.
+    row_size : int
+        Number of elements we will generate for each trial.
+    max_elements : int, optional
+        Maximum number of elements in a block (but there is always at least
+        one trial per block).
+
+    Yields
+    ------
+    start, stop : int
+        Trial indices for this block.
+    """
+    per_block = max(1, max_elements // max(1, row_size))
+    for start in range(0, n_trials, per_block):
+        yield start, min(start + per_block, n_trials)
+
+
+def bootstrap_indices(n, n_trials, size=None, rng=None):
+    """ Indices for `n_trials` samples of `size` from `n`, with replacement
+
+    Returns
+    -------
+    indices : array, shape (n_trials, size)
+        Each row contains indices into a sequence of length `n`.
+    """
+    size = n if size is None else size
+    return get_rng(rng).integers(0, n, size=(n_trials, size))
+
+
+def _fisher_yates(n, n_trials, size, rng):
+    # Partial Fisher-Yates shuffle of all rows at once; we stop after the
+    # first `size` positions.
+    dtype = np.int32 if n < 2 ** 31 else np.intp
+    indices = np.tile(np.arange(n, dtype=dtype), (n_trials, 1))
+    rows = np.arange(n_trials)
+    for i in range(size):
+        j = rng.integers(i, n, size=n_trials)
+        at_i = indices[:, i].copy()
+        indices[:, i] = indices[rows, j]
+        indices[rows, j] = at_i
+    return indices[:, :size]
+
+
+def _argpartition(n, n_trials, size, rng):
+    # Indices of `size` smallest random keys in each row, in key order.
+    keys = rng.random((n_trials, n))
+    smallest = np.argpartition(keys, size - 1, axis=1)[:, :size]
+    order = np.argsort(np.take_along_axis(keys, smallest, axis=1), axis=1)
+    return np.take_along_axis(smallest, order, axis=1)
+
+
+def _permuted(n, n_trials, size, rng):
+    rows = np.broadcast_to(np.arange(n), (n_trials, n))
+    return rng.permuted(rows, axis=1)[:, :size]
+
+
+_SHUFFLE_METHODS = {'fisher-yates': _fisher_yates,
+                    'argpartition': _argpartition,
+                    'permuted': _permuted}
+
+
+def shuffle_indices(n, n_trials, size=None, rng=None, method='auto'):
+    """ Indices for `n_trials` samples of `size` from `n`, without replacement
+
+    With `size` of None, each row is a permutation of ``range(n)``.
+
+    Parameters
+    ----------
+    n : int
+        Length of sequence to sample from.
+    n_trials : int
+        Number of samples (rows).
+    size : None or int, optional
+        Number of elements in each sample.  None gives `n`.
+    rng : None or int or Generator, optional
+        See :func:`get_rng`.
+    method : {'auto', 'fisher-yates', 'argpartition', 'permuted'}, optional
+        'fisher-yates' does the first `size` steps of a Fisher-Yates shuffle
+        on each row; 'argpartition' selects the indices of the `size`
+        smallest of `n` random keys; 'permuted' shuffles whole rows.  'auto'
+        uses 'fisher-yates' for `size` up to a quarter of `n`, where it is
+        fastest, and 'permuted' otherwise.
+
+    Returns
+    -------
+    indices : array, shape (n_trials, size)
+        Each row contains indices into a sequence of length `n`.
+    """
+    size = n if size is None else size
+    if size > n:
+        raise ValueError(f'Cannot take {size} from {n} without replacement')
+    if method == 'auto':
+        method = 'fisher-yates' if 4 * size <= n else 'permuted'
+    if method not in _SHUFFLE_METHODS:
+        raise ValueError(f'method should be one of {list(_SHUFFLE_METHODS)} '
+                         "or 'auto'")
+    if size == 0:
+        return np.zeros((n_trials, 0), dtype=int)
+    return _SHUFFLE_METHODS[method](n, n_trials, size, get_rng(rng))
+
+
+def category_counts(urn, n_draws, n_trials, replace=False, rng=None):
+    """ Number of each label in `n_trials` samples of `n_draws` from `urn`
+
+    Use this when we only need the number of each label in each sample, such
+    as the number of each suit in a hand of cards.  We draw the counts
+    directly, from the multivariate hypergeometric (without replacement) or
+    multinomial (with replacement) distribution, without making the samples.
+
+    Parameters
+    ----------
+    urn : array-like
+        One element per ball in the urn.
+    n_draws : int
+        Number of draws in each sample.
+    n_trials : int
+        Number of samples.
+    replace : bool, optional
+        If True, draw with replacement.
+    rng : None or int or Generator, optional
+        See :func:`get_rng`.
+
+    Returns
+    -------
+    labels : array
+        Sorted distinct elements of `urn`.
+    counts : array, shape (n_trials, len(labels))
+        Number of each label in each sample.
+
+    Examples
+    --------
+    Number of each suit in bridge hands:
+
+    >>> deck = np.repeat(['club', 'diamond', 'heart', 'spade'], 13)
+    >>> suits, counts = category_counts(deck, 13, 10_000, rng=1)
+    >>> counts.shape, bool(np.all(np.sum(counts, axis=1) == 13))
+    ((10000, 4), True)
+    """
+    labels, n_each = np.unique(np.asarray(urn), return_counts=True)
+    rng = get_rng(rng)
+    if replace:
+        counts = rng.multinomial(n_draws, n_each / np.sum(n_each),
+                                 size=n_trials)
+    else:
+        counts = rng.multivariate_hypergeometric(n_each, n_draws,
+                                                 size=n_trials)
+    return labels, counts
+
+
+def iter_samples(data, n_trials, replace=True, size=None, rng=None,
+                 max_elements=MAX_ELEMENTS):
+    """ Yield blocks of resamples of `data`, one resample per row
+
+    Parameters
+    ----------
+    data : array-like
+        1-D sequence to resample.
+    n_trials : int
+        Number of resamples (trials).
+    replace : bool, optional
+        If True, sample with replacement (bootstrap), otherwise sample without
+        replacement (shuffle / permutation).
+    size : None or int, optional
+        Number of elements per resample.  None gives ``len(data)``.
+    rng : None or int or Generator, optional
+        See :func:`get_rng`.
+    max_elements : int, optional
+        Maximum number of elements in each yielded block.
+
+    Yields
+    ------
+    start, stop : int
+        Trial indices for this block.
+    samples : array, shape (stop - start, size)
+        Resamples for trials ``start`` through ``stop - 1``.
+    """
+    data = np.asarray(data)
+    rng = get_rng(rng)
+    n = len(data)
+    size = n if size is None else size
+    make_indices = bootstrap_indices if replace else shuffle_indices
+    for start, stop in trial_blocks(n_trials, max(size, n), max_elements):
+        indices = make_indices(n, stop - start, size, rng)
+        yield start, stop, data[indices]
+
+
+def resample_stat(data, statistic, n_trials, replace=True, size=None,
+                  rng=None, max_elements=MAX_ELEMENTS, dtype=float):
+    """ Apply `statistic` to `n_trials` resamples of `data`
+
+    Parameters
+    ----------
+    data : array-like
+        1-D sequence to resample.
+    statistic : callable
+        Called as ``statistic(samples, axis=1)`` where `samples` is a 2-D
+        array with one resample per row.  Should return a 1-D array with one
+        value per row, as do ``np.mean``, ``np.median``, ``np.sum`` and so on.
+    n_trials : int
+        Number of resamples (trials).
+    replace : bool, optional
+        If True, sample with replacement (bootstrap), otherwise sample without
+        replacement (shuffle / permutation).
+    size : None or int, optional
+        Number of elements per resample.  None gives ``len(data)``.
+    rng : None or int or Generator, optional
+        See :func:`get_rng`.
+    max_elements : int, optional
+        Maximum number of sample elements to generate at any one time.
+    dtype : dtype specifier, optional
+        Data type of returned `results`.
+
+    Returns
+    -------
+    results : array, shape (n_trials,)
+        Value of `statistic` for each resample.
+    """
+    results = np.zeros(n_trials, dtype=dtype)
+    for start, stop, samples in iter_samples(data, n_trials, replace, size,
+                                             rng, max_elements):
+        results[start:stop] = statistic(samples, axis=1)
+    return results
+
+
+def bootstrap(data, statistic, n_trials, size=None, rng=None,
+              max_elements=MAX_ELEMENTS, dtype=float):
+    """ `statistic` for `n_trials` samples of `data` with replacement
+
+    See :func:`resample_stat` for parameters.
+
+    Examples
+    --------
+    >>> gains = [31, 34, 29, 26, 32, 35, 38, 34, 31, 29, 32, 30]
+    >>> means = bootstrap(gains, np.mean, 10_000, rng=1)
+    >>> means.shape
+    (10000,)
+    """
+    return resample_stat(data, statistic, n_trials, True, size, rng,
+                         max_elements, dtype)
+
+
+def shuffle(data, statistic, n_trials, size=None, rng=None,
+            max_elements=MAX_ELEMENTS, dtype=float):
+    """ `statistic` for `n_trials` samples of `data` without replacement
+
+    See :func:`resample_stat` for parameters.
+
+    Examples
+    --------
+    Sum of 5 IQ ranks taken at random from 10:
+
+    >>> sums = shuffle(np.arange(1, 11), np.sum, 10_000, size=5, rng=1)
+    >>> bool(np.all((sums >= 15) & (sums <= 40)))
+    True
+    """
+    return resample_stat(data, statistic, n_trials, False, size, rng,
+                         max_elements, dtype)
@@ -0,0 +1,156 @@
+""" Reproducible parallel trial runner
+
+We split the trials into chunks of a fixed size, and give each chunk its own
+random number stream, spawned from a single seed.  Chunk ``i`` always gets
+the same stream, and we collect the chunk results in chunk order, so the
+results are the same whatever the number of worker processes.
+
+By default the seed is the ``_QUARTO_SEED`` that ``_common.R`` injects into
+the notebook, so parallel runs are as reproducible as the serial ones.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+import os
+import sys
+
+import numpy as np
+
+# Trials per chunk.  This must not depend on the number of workers.
+CHUNK_TRIALS = 100_000
+
+
+def book_seed():
+    """ Return seed injected into notebook by ``_common.R``, or None
+    """
+    return getattr(sys.modules.get('__main__'), '_QUARTO_SEED', None)
+
+
+def seed_sequence(seed=None):
+    """ Return SeedSequence for `seed`, defaulting to the book seed
+
+    Parameters
+    ----------
+    seed : None or int or SeedSequence, optional
+        If None, use :func:`book_seed`.  If there is no book seed, use fresh
+        entropy from the operating system.
+
+    Returns
+    -------
+    seed_seq : SeedSequence
+    """
+    if isinstance(seed, np.random.SeedSequence):
+        return seed
+    return np.random.SeedSequence(book_seed() if seed is None else seed)
+
+
+def chunk_sizes(n_trials, chunk_trials=CHUNK_TRIALS):
+    """ List of trial counts for each chunk
+    """
+    n_full, remainder = divmod(n_trials, chunk_trials)
+    return [chunk_trials] * n_full + ([remainder] if remainder else [])
+
+
+def _run_chunk(chunk_func, seed_seq, n):
+    return chunk_func(np.random.default_rng(seed_seq), n)
+
+
+def imap_chunks(chunk_func, n_trials, seed=None, n_workers=None,
+                chunk_trials=CHUNK_TRIALS):
+    """ Iterate over ``chunk_func(rng, n)`` outputs for chunks of trials
+
+    Parameters
+    ----------
+    chunk_func : callable
+        Called as ``chunk_func(rng, n)`` where `rng` is a Generator and `n` is
+        the number of trials in the chunk.  With more than one worker, this
+        must be picklable: a function defined at the top level of a module (or
+        the notebook), or a ``functools.partial`` of such a function.
+    n_trials : int
+        Total number of trials.
+    seed : None or int or SeedSequence, optional
+        See :func:`seed_sequence`.
+    n_workers : None or int, optional
+        Number of worker processes.  None means use all CPUs.  With 1 worker,
+        run the chunks in this process.
+    chunk_trials : int, optional
+        Maximum number of trials in each chunk.  Changing this changes the
+        random streams, and so the results.
+
+    Yields
+    ------
+    output : object
+        ``chunk_func`` output, in chunk order.
+    """
+    sizes = chunk_sizes(n_trials, chunk_trials)
+    seeds = seed_sequence(seed).spawn(len(sizes))
+    n_workers = os.cpu_count() if n_workers is None else n_workers
+    n_workers = min(n_workers, len(sizes))
+    if n_workers <= 1:
+        for s, n in zip(seeds, sizes):
+            yield _run_chunk(chunk_func, s, n)
+        return
+    with ProcessPoolExecutor(n_workers) as executor:
+        yield from executor.map(_run_chunk,
+                                [chunk_func] * len(sizes),
+                                seeds,
+                                sizes)
+
+
+def map_chunks(chunk_func, n_trials, seed=None, n_workers=None,
+               chunk_trials=CHUNK_TRIALS):
+    """ Return list of ``chunk_func(rng, n)`` outputs for chunks of trials
+
+    See :func:`imap_chunks` for parameters.
+    """
+    return list(imap_chunks(chunk_func, n_trials, seed, n_workers,
+                            chunk_trials))
+
+
+def run_trials(chunk_func, n_trials, seed=None, n_workers=None,
+               chunk_trials=CHUNK_TRIALS, dtype=float):
+    """ Run `n_trials` trials across worker processes, return results
+
+    Parameters
+    ----------
+    chunk_func : callable
+        Called as ``chunk_func(rng, n)``; should return a 1-D array of `n`
+        trial results.  See :func:`imap_chunks`.
+    n_trials : int
+        Total number of trials.
+    seed : None or int or SeedSequence, optional
+        See :func:`seed_sequence`.
+    n_workers : None or int, optional
+        See :func:`imap_chunks`.
+    chunk_trials : int, optional
+        See :func:`imap_chunks`.
+    dtype : dtype specifier, optional
+        Data type of returned `results`.
+
+    Returns
+    -------
+    results : array, shape (n_trials,)
+        Trial results, in chunk order.  These are identical for any value of
+        `n_workers`.
+
+    Examples
+    --------
+    >>> from functools import partial
+    >>> from resampling import bootstrap
+    >>> gains = [31, 34, 29, 26, 32, 35, 38, 34, 31, 29, 32, 30]
+    >>> func = partial(bootstrap, gains, np.mean)
+    >>> means = run_trials(lambda rng, n: func(n, rng=rng), 1000, seed=1,
+    ...                    n_workers=1, chunk_trials=300)
+    >>> means.shape
+    (1000,)
+    """
+    results = np.zeros(n_trials, dtype=dtype)
+    start = 0
+    for output in imap_chunks(chunk_func, n_trials, seed, n_workers,
+                              chunk_trials):
+        stop = start + len(output)
+        results[start:stop] = output
+        start = stop
+    if start != n_trials:
+        raise ValueError(f'Chunk functions returned {start} results; '
+                         f'expecting {n_trials}')
+    return results
@@ -0,0 +1,247 @@
+""" Permutation tests, exact where possible, Monte Carlo otherwise
+
+A two-group permutation test asks how often a random split of the pooled
+values into a group of `n_group` and the rest gives a statistic as extreme as
+the one we observed.  When there are few possible splits, as for the 252 ways
+of choosing 5 IQ ranks from 10, we can look at every split, and get the exact
+proportion.  For statistics that depend only on the sum of the first group
+(sum, mean, difference in means), and integer (or fixed-decimal) values, we
+can count the splits giving each possible sum with a subset-sum recursion,
+even when there are far too many splits to list.  Otherwise we fall back to
+shuffling, as in the book.
+"""
+
+from itertools import combinations, islice
+import math
+
+import numpy as np
+
+from .kernels import shuffle, get_rng
+
+# Maximum number of splits for which we list all splits.
+ENUMERATE_LIMIT = 200_000
+
+# Maximum size of subset-sum count table.
+SUBSET_SUM_LIMIT = 20_000_000
+
+# Number of splits to evaluate at any one time when listing all splits.
+ENUMERATE_BLOCK = 10_000
+
+
+class PermutationResult:
+    """ Result of permutation test
+
+    Attributes
+    ----------
+    observed : float
+        Observed value of the statistic.
+    values : array
+        Sorted distinct values of the statistic over the null splits.
+    counts : array
+        Number of splits (for exact tests) or trials (for Monte Carlo tests)
+        giving each of `values`.
+    exact : bool
+        True if `values` and `counts` cover every possible split.
+    method : str
+        One of 'subset-sum', 'enumerate', 'monte-carlo'.
+    alternative : str
+        One of 'less', 'greater', 'two-sided'.
+    p_value : float
+        Proportion of the null distribution as or more extreme than
+        `observed`.
+    """
+
+    def __init__(self, observed, values, counts, method, alternative):
+        self.observed = observed
+        self.values = values
+        self.counts = counts
+        self.method = method
+        self.exact = method != 'monte-carlo'
+        self.alternative = alternative
+        self.p_value = self.proportion(alternative)
+
+    @property
+    def n(self):
+        """ Number of splits (exact) or trials (Monte Carlo)
+        """
+        return np.sum(self.counts)
+
+    def proportion(self, alternative):
+        # Allow for floating point error in calculating statistic.
+        tol = 1e-9 * max(1, abs(self.observed))
+        if alternative == 'less':
+            extreme = self.values <= self.observed + tol
+        elif alternative == 'greater':
+            extreme = self.values >= self.observed - tol
+        elif alternative == 'two-sided':
+            center = np.sum(self.values * self.counts) / self.n
+            extreme = (np.abs(self.values - center) >=
+                       abs(self.observed - center) - tol)
+        else:
+            raise ValueError(f'Unknown alternative {alternative!r}')
+        return np.sum(self.counts[extreme]) / self.n
+
+    def __repr__(self):
+        return (f'PermutationResult(observed={self.observed}, '
+                f'p_value={self.p_value}, method={self.method!r})')
+
+
+def n_splits(n, n_group):
+    """ Number of ways to choose `n_group` of `n` values
+    """
+    return math.comb(n, n_group)
+
+
+def _sum_stat_funcs(name, n_group, total, n):
+    # Functions of permuted rows, and of the sum of the first group.
+    n_rest = n - n_group
+    if name == 'sum':
+        return (lambda s, axis: np.sum(s[:, :n_group], axis=axis),
+                lambda sa: sa)
+    if name == 'mean':
+        return (lambda s, axis: np.mean(s[:, :n_group], axis=axis),
+                lambda sa: sa / n_group)
+    if name == 'mean_diff':
+        return (lambda s, axis: (np.mean(s[:, :n_group], axis=axis) -
+                                 np.mean(s[:, n_group:], axis=axis)),
+                lambda sa: sa / n_group - (total - sa) / n_rest)
+    raise ValueError(f'Unknown statistic {name!r}')
+
+
+def as_integers(values, max_decimals=3):
+    """ Return integers `ints` and `scale` such that ``ints / scale == values``
+
+    Return None, None if `values` need more than `max_decimals` decimals.
+    """
+    values = np.asarray(values)
+    for decimals in range(max_decimals + 1):
+        scale = 10 ** decimals
+        scaled = np.round(values * scale)
+        if np.allclose(scaled, values * scale, rtol=0, atol=1e-6):
+            return scaled.astype(np.int64), scale
+    return None, None
+
+
+def subset_sum_counts(ints, n_group):
+    """ Count subsets of `n_group` elements from `ints` with each sum
+
+    Parameters
+    ----------
+    ints : array of int
+        Integer values.
+    n_group : int
+        Number of elements in subsets.
+
+    Returns
+    -------
+    sums : array
+        Possible sums of subsets.
+    counts : array
+        Number of subsets (as floats, to avoid overflow) giving each of
+        `sums`.
+    """
+    ints = np.asarray(ints)
+    offset = ints.min()
+    shifted = ints - offset
+    max_sum = int(np.sum(np.sort(shifted)[::-1][:n_group]))
+    # table[j, s] is number of subsets of size j with shifted sum s.
+    table = np.zeros((n_group + 1, max_sum + 1))
+    table[0, 0] = 1
+    for x in shifted:
+        table[1:, x:] += table[:-1, :max_sum + 1 - x].copy()
+    counts = table[n_group]
+    sums = np.arange(max_sum + 1) + offset * n_group
+    present = counts > 0
+    return sums[present], counts[present]
+
+
+def _enumerate(data, n_group, statistic):
+    n = len(data)
+    all_inds = np.arange(n)
+    combos = combinations(range(n), n_group)
+    results = []
+    while True:
+        block = list(islice(combos, ENUMERATE_BLOCK))
+        if not block:
+            break
+        first = np.array(block)
+        in_first = np.zeros((len(first), n), dtype=bool)
+        np.put_along_axis(in_first, first, True, axis=1)
+        rest = np.broadcast_to(all_inds, in_first.shape)[~in_first].reshape(
+            len(first), n - n_group)
+        results.append(statistic(data[np.hstack([first, rest])], axis=1))
+    return np.concatenate(results)
+
+
+def permutation_test(data, n_group, statistic='sum', alternative='less',
+                     observed=None, n_trials=10_000, rng=None,
+                     enumerate_limit=ENUMERATE_LIMIT):
+    """ Permutation test for split of `data` into first `n_group` and rest
+
+    Parameters
+    ----------
+    data : array-like
+        1-D pooled values.  The first `n_group` values are the observed first
+        group.
+    n_group : int
+        Number of values in first group.
+    statistic : str or callable, optional
+        One of 'sum', 'mean' (of the first group), 'mean_diff' (mean of first
+        group minus mean of rest), or a function called as ``statistic(rows,
+        axis=1)``, where each row of `rows` is an arrangement of `data` with
+        the first group in the first `n_group` columns, as for
+        :func:`resampling.kernels.shuffle`.  The function should not depend on
+        the order of values within each group.
+    alternative : {'less', 'greater', 'two-sided'}, optional
+        Which statistic values count as extreme.
+    observed : None or float, optional
+        Observed value of statistic.  If None, calculate from `data`.
+    n_trials : int, optional
+        Number of trials if we have to fall back to Monte Carlo.
+    rng : None or int or Generator, optional
+        See :func:`resampling.kernels.get_rng`.
+    enumerate_limit : int, optional
+        Maximum number of splits for which we list every split.
+
+    Returns
+    -------
+    result : PermutationResult
+
+    Examples
+    --------
+    Sum of IQ ranks for top 5 athletes was 17:
+
+    >>> res = permutation_test([1, 2, 3, 4, 5, 6, 7, 8, 9, 10], 5,
+    ...                        observed=17)
+    >>> res.method, int(res.n), round(float(res.p_value), 4)
+    ('subset-sum', 252, 0.0159)
+    """
+    data = np.asarray(data)
+    n = len(data)
+    if not 0 < n_group < n:
+        raise ValueError('n_group should be between 0 and len(data)')
+    sum_stat = None
+    if isinstance(statistic, str):
+        statistic, sum_stat = _sum_stat_funcs(statistic, n_group,
+                                              np.sum(data), n)
+    if observed is None:
+        observed = statistic(data[None], axis=1)[0]
+    if sum_stat is not None:
+        ints, scale = as_integers(data)
+        if ints is not None:
+            table_size = (n_group + 1) * (np.ptp(ints) * n_group + 1)
+            if table_size <= SUBSET_SUM_LIMIT:
+                sums, counts = subset_sum_counts(ints, n_group)
+                values = sum_stat(sums / scale)
+                order = np.argsort(values, kind='stable')
+                return PermutationResult(observed, values[order],
+                                         counts[order], 'subset-sum',
+                                         alternative)
+    if n_splits(n, n_group) <= enumerate_limit:
+        method = 'enumerate'
+        null = _enumerate(data, n_group, statistic)
+    else:
+        method = 'monte-carlo'
+        null = shuffle(data, statistic, n_trials, rng=get_rng(rng))
+    values, counts = np.unique(null, return_counts=True)
+    return PermutationResult(observed, values, counts, method, alternative)
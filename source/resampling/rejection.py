@@ -0,0 +1,202 @@
+""" Rejection sampling (approximate Bayesian computation) for posteriors
+
+The Bayes chapter estimates a posterior distribution by drawing many values
+from the prior, simulating fake data for each, and keeping the prior values
+where the fake data match the observed data.  :func:`abc_sample` does the
+same, in chunks of trials, until it has the number of accepted values we ask
+for.  We only keep the accepted values, so the memory we need depends on the
+chunk size and number of accepted values, and not on the number of trials.
+
+Chunk ``i`` always gets the same random number stream, and we use the chunks
+in order, stopping at the first chunk that brings us to the target.  The
+results are therefore the same whatever the number of worker processes.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+import os
+
+import numpy as np
+
+from .parallel import seed_sequence, _run_chunk, CHUNK_TRIALS
+
+# Maximum number of trials before giving up.
+MAX_TRIALS = 100_000_000
+
+
+class ABCResult:
+    """ Accepted prior values from rejection sampling
+
+    Attributes
+    ----------
+    samples : array
+        Accepted prior values, one per row (or element, for 1-D prior
+        values).
+    n_proposed : int
+        Number of prior values we drew.
+    """
+
+    def __init__(self, samples, n_proposed):
+        self.samples = samples
+        self.n_proposed = n_proposed
+
+    @property
+    def n_accepted(self):
+        return len(self.samples)
+
+    @property
+    def acceptance_rate(self):
+        return self.n_accepted / self.n_proposed if self.n_proposed else 0.
+
+    def merge(self, other):
+        """ Merge accepted values from `other` into this result
+        """
+        self.samples = np.concatenate([self.samples, other.samples])
+        self.n_proposed += other.n_proposed
+        return self
+
+    def __repr__(self):
+        return (f'ABCResult(n_accepted={self.n_accepted}, '
+                f'n_proposed={self.n_proposed}, '
+                f'acceptance_rate={self.acceptance_rate})')
+
+
+def distance(simulated, observed):
+    """ Absolute (1-D) or Euclidean (2-D) distance of rows from `observed`
+    """
+    diffs = np.asarray(simulated) - observed
+    if diffs.ndim == 1:
+        return np.abs(diffs)
+    return np.sqrt(np.sum(diffs.reshape(len(diffs), -1) ** 2, axis=1))
+
+
+def accept_mask(simulated, observed, tol=None, distance=distance):
+    """ True for rows of `simulated` matching `observed`
+
+    Parameters
+    ----------
+    simulated : array
+        Simulated data, one value or row per trial.
+    observed : scalar or array
+        Observed data.
+    tol : None or float, optional
+        If None, accept exact matches.  Otherwise, accept rows with
+        ``distance(simulated, observed) <= tol``.
+    distance : callable, optional
+        Distance function.
+
+    Returns
+    -------
+    mask : array of bool
+    """
+    simulated = np.asarray(simulated)
+    if tol is not None:
+        return distance(simulated, observed) <= tol
+    matches = simulated == observed
+    if matches.ndim == 1:
+        return matches
+    return np.all(matches.reshape(len(matches), -1), axis=1)
+
+
+def abc_chunk(prior, simulate, observed, tol, distance, rng, n):
+    """ Rejection sampling for one chunk of `n` trials
+
+    See :func:`abc_sample` for parameters.
+
+    Returns
+    -------
+    result : ABCResult
+    """
+    params = np.asarray(prior(rng, n))
+    simulated = simulate(rng, params)
+    return ABCResult(params[accept_mask(simulated, observed, tol, distance)],
+                     n)
+
+
+def abc_sample(prior, simulate, observed, n_accept, tol=None,
+               distance=distance, seed=None, n_workers=1,
+               chunk_trials=CHUNK_TRIALS, max_trials=MAX_TRIALS):
+    """ Draw from prior until `n_accept` values give data matching `observed`
+
+    Parameters
+    ----------
+    prior : callable
+        Called as ``prior(rng, n)``; returns `n` values from the prior, as a
+        1-D array, or 2-D array with one row per draw.
+    simulate : callable
+        Called as ``simulate(rng, params)``; returns simulated data for each
+        of the prior values in `params`, as a 1-D array, or array with one
+        row per prior value.
+    observed : scalar or array
+        Observed data.
+    n_accept : int
+        Number of accepted values we want.
+    tol : None or float, optional
+        If None, accept only exact matches.  Otherwise, accept simulated
+        data within `tol` of `observed`, using `distance`.
+    distance : callable, optional
+        Called as ``distance(simulated, observed)``; returns distance for
+        each trial.
+    seed : None or int or SeedSequence, optional
+        See :func:`.parallel.seed_sequence`.
+    n_workers : None or int, optional
+        Number of worker processes; None means use all CPUs.  With more than
+        one worker, `prior`, `simulate` and `distance` must be picklable.
+    chunk_trials : int, optional
+        Number of trials in each chunk.  Changing this changes the random
+        streams, and so the results.
+    max_trials : int, optional
+        Stop (and raise an error) if we have not reached `n_accept` after this
+        many trials.
+
+    Returns
+    -------
+    result : ABCResult
+        Exactly `n_accept` accepted values, from the chunks in order.
+        ``n_proposed`` is the number of trials in the chunks we used.
+
+    Examples
+    --------
+    Posterior for the probability of tails, given 14 tails in 20 tosses,
+    with a uniform prior:
+
+    >>> def prior(rng, n):
+    ...     return rng.uniform(0, 1, size=n)
+    >>> def simulate(rng, p):
+    ...     return rng.binomial(20, p)
+    >>> res = abc_sample(prior, simulate, 14, 10_000, seed=1,
+    ...                  chunk_trials=50_000)
+    >>> res.n_accepted, bool(abs(np.mean(res.samples) - 15 / 22) < 0.01)
+    (10000, True)
+    """
+    func = partial(abc_chunk, prior, simulate, observed, tol, distance)
+    seed_seq = seed_sequence(seed)
+    n_workers = os.cpu_count() if n_workers is None else n_workers
+    total = None
+    executor = ProcessPoolExecutor(n_workers) if n_workers > 1 else None
+    try:
+        n_run = 0
+        while total is None or total.n_accepted < n_accept:
+            if n_run >= max_trials:
+                raise RuntimeError(
+                    f'Only {total.n_accepted} accepted values after '
+                    f'{n_run} trials')
+            # Spawning in rounds gives the same streams as spawning all at
+            # once.
+            seeds = seed_seq.spawn(max(1, n_workers))
+            sizes = [chunk_trials] * len(seeds)
+            if executor is None:
+                results = map(_run_chunk, [func] * len(seeds), seeds, sizes)
+            else:
+                results = executor.map(_run_chunk, [func] * len(seeds),
+                                       seeds, sizes)
+            for result in results:
+                n_run += result.n_proposed
+                total = result if total is None else total.merge(result)
+                if total.n_accepted >= n_accept:
+                    break
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+    total.samples = total.samples[:n_accept]
+    return total
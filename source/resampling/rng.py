@@ -0,0 +1,165 @@
+""" Random number generators with selectable bit generator and buffering
+
+By default, ``np.random.default_rng(seed)`` makes a ``Generator`` using the
+PCG64 bit generator.  :func:`make_generator` allows other bit generators,
+some of which are faster (SFC64 in particular).
+
+The notebooks often make many small draws, such as ``rnd.choice(['heads',
+'tails'], size=20)`` once per trial.  For these, most of the time goes in
+the overhead of each call, rather than in generating the numbers.
+:class:`BufferedGenerator` generates uniform values in large blocks, and
+serves small calls to ``random``, ``integers`` and ``choice`` (with
+replacement) from the block.  It passes all other calls through to the
+wrapped generator.  The results are reproducible for a given seed, bit
+generator and buffer size, but differ from the unbuffered generator.
+"""
+
+import numpy as np
+
+# Bit generators by name.
+BIT_GENERATORS = {'PCG64': np.random.PCG64,
+                  'PCG64DXSM': np.random.PCG64DXSM,
+                  'SFC64': np.random.SFC64,
+                  'Philox': np.random.Philox,
+                  'MT19937': np.random.MT19937}
+
+# Default number of uniform values to generate for each buffer refill.
+BUFFER_SIZE = 2 ** 16
+
+# Largest range of integers we draw from buffered uniform values.
+MAX_BUFFERED_RANGE = 2 ** 32
+
+
+class BufferedGenerator:
+    """ Generator serving small draws from a buffer of uniform values
+
+    Parameters
+    ----------
+    generator : Generator
+        Generator to wrap.
+    buffer_size : int, optional
+        Number of uniform values to generate at a time.  Requests for more
+        than a quarter of this number go straight to `generator`.
+    """
+
+    def __init__(self, generator, buffer_size=BUFFER_SIZE):
+        self.generator = generator
+        self.buffer_size = buffer_size
+        self._max_request = buffer_size // 4
+        self._buffer = np.zeros(0)
+        self._pos = 0
+        # Cumulative probabilities for recent `p` arguments to `choice`.
+        self._cdfs = {}
+
+    def _uniforms(self, size):
+        # Uniform values for `size`, from buffer where possible.  Return None
+        # for requests we should pass to the wrapped generator.
+        if size is None:
+            n = 1
+        elif type(size) is int:
+            n = size
+        else:
+            n = int(np.prod(size))
+        if n > self._max_request:
+            return None
+        pos = self._pos
+        if pos + n > len(self._buffer):
+            self._buffer = self.generator.random(self.buffer_size)
+            pos = 0
+        self._pos = pos + n
+        values = self._buffer[pos:pos + n]
+        if size is None:
+            return values[0]
+        return values if type(size) is int else values.reshape(size)
+
+    def random(self, size=None, dtype=np.float64, out=None):
+        if out is None and dtype is np.float64:
+            u = self._uniforms(size)
+            if u is not None:
+                return u if size is None else u.copy()
+        return self.generator.random(size, dtype, out)
+
+    def integers(self, low, high=None, size=None, dtype=np.int64,
+                 endpoint=False):
+        if high is None:
+            low, high = 0, low
+        if (isinstance(low, int) and isinstance(high, int) and
+                0 < high - low + endpoint <= MAX_BUFFERED_RANGE):
+            u = self._uniforms(size)
+            if u is not None:
+                values = (u * (high - low + endpoint)).astype(dtype)
+                if low:
+                    values += low
+                return values
+        return self.generator.integers(low, high, size, dtype, endpoint)
+
+    def _cdf(self, p, n):
+        key = tuple(p)
+        cdf = self._cdfs.get(key)
+        if cdf is None:
+            cdf = np.cumsum(p, dtype=float)
+            if len(cdf) != n or not np.isclose(cdf[-1], 1):
+                return None
+            cdf /= cdf[-1]
+            if len(self._cdfs) > 100:
+                self._cdfs.clear()
+            self._cdfs[key] = cdf
+        return cdf
+
+    def choice(self, a, size=None, replace=True, p=None, axis=0,
+               shuffle=True):
+        if replace and axis == 0:
+            pool = np.arange(a) if isinstance(a, int) else np.asarray(a)
+            n = len(pool) if pool.ndim == 1 else 0
+            cdf = None if p is None or n == 0 else self._cdf(p, n)
+            u = (self._uniforms(size) if n and (p is None or cdf is not None)
+                 else None)
+            if u is not None:
+                if cdf is None:
+                    inds = (u * n).astype(np.intp)
+                else:
+                    inds = np.searchsorted(cdf, u, side='right')
+                    inds = np.minimum(inds, n - 1)
+                return pool[inds]
+        return self.generator.choice(a, size, replace, p, axis, shuffle)
+
+    def __getattr__(self, name):
+        return getattr(self.generator, name)
+
+    def __repr__(self):
+        return (f'BufferedGenerator({self.generator!r}, '
+                f'buffer_size={self.buffer_size})')
+
+
+def make_generator(seed=None, bit_generator='PCG64', buffer_size=0):
+    """ Make random number generator
+
+    Parameters
+    ----------
+    seed : None or int or SeedSequence, optional
+        Seed for bit generator.
+    bit_generator : str, optional
+        Name of bit generator; one of :data:`BIT_GENERATORS`.
+    buffer_size : int, optional
+        If non-zero, return :class:`BufferedGenerator` with this buffer size.
+
+    Returns
+    -------
+    rng : Generator or BufferedGenerator
+        With the default `bit_generator` and `buffer_size`, the same as
+        ``np.random.default_rng(seed)``.
+
+    Examples
+    --------
+    >>> rng = make_generator(1014, 'SFC64', buffer_size=1000)
+    >>> tosses = rng.choice(['heads', 'tails'], size=20)
+    >>> tosses.shape
+    (20,)
+    """
+    if bit_generator not in BIT_GENERATORS:
+        raise ValueError(f'bit_generator should be one of '
+                         f'{list(BIT_GENERATORS)}')
+    generator = np.random.Generator(BIT_GENERATORS[bit_generator](seed))
+    if buffer_size:
+        return BufferedGenerator(generator, buffer_size)
+    return generator
@@ -0,0 +1,822 @@
+#!/usr/bin/env python3
+""" Compile Resampling Stats programs to vectorized NumPy code
+
+The programs in ``rs_scripts`` are in the language of the original Resampling
+Stats software, with commands such as ``NUMBERS``, ``REPEAT``, ``SHUFFLE``,
+``COUNT``, ``SCORE`` and ``END``.  We parse these programs, and generate the
+source for a Python function that runs them.
+
+The outermost ``REPEAT`` becomes a trial axis.  Every variable is a 2-D array
+with one row per trial (or a single row, for values that are the same in all
+trials), and each command works on all rows at once.  We run the trials in
+blocks of at most `block_trials` rows.  ``SCORE`` adds the trial values to a
+scoreboard; we collect the scoreboards from each block into the final results.
+``IF`` becomes a mask on the trial rows.  Inner ``REPEAT`` loops stay as
+Python loops, each iteration working on all the trials in the block.
+
+Within a trial, reading a scoreboard gives the values scored in that trial.
+This is the same as Resampling Stats when the program ``CLEAR``s the
+scoreboard at the end of each trial, as do the programs in ``rs_scripts``.
+``SCORE`` in a later ``REPEAT`` adds to the scores from earlier loops.
+
+Because we run the trials at the same time, a trial cannot use values from
+the trial before.  We raise an error for programs that read a variable in a
+trial before the trial assigns it, such as ``ADD total 1 total``.  A variable
+first assigned inside ``IF`` is NaN for trials where the condition is False.
+
+Run this module as a script to compile (and optionally run) ``.rss`` files::
+
+    python -m resampling.rss --run ../rs_scripts/matching_hats.rss
+"""
+
+from argparse import ArgumentParser, RawDescriptionHelpFormatter
+from functools import reduce
+from pathlib import Path
+import re
+import sys
+
+import numpy as np
+
+from .kernels import get_rng
+from .sequences import run_lengths
+
+# Maximum number of trials to run at the same time.
+BLOCK_TRIALS = 10_000
+
+COMMANDS = {
+    'ABS', 'ADD', 'CLEAR', 'CONCAT', 'COPY', 'COUNT', 'DATA', 'DIVIDE',
+    'END', 'GENERATE', 'HISTOGRAM', 'IF', 'MAX', 'MAXSIZE', 'MEAN', 'MEDIAN',
+    'MIN', 'MULTIPLY', 'NUMBERS', 'PERCENTILE', 'PRINT', 'READ', 'REPEAT',
+    'RUNS', 'SAMPLE', 'SCORE', 'SHUFFLE', 'SUBTRACT', 'SUM', 'SUMSQRDEV',
+    'TAKE', 'URN'}
+
+_TOKEN_RE = re.compile(r'“[^”]*”|"[^"]*"|\([^)]*\)|\S+')
+_NUMBER_RE = re.compile(r'^[-+]?(\d+\.?\d*|\.\d+)$')
+_RANGE_RE = re.compile(r'^([-+]?\d+),([-+]?\d+)$')
+_URN_RE = re.compile(r'^(\d+)#([-+]?(\d+\.?\d*|\.\d+))$')
+_CMP_RE = re.compile(r'^(<>|<=|>=|=|<|>)(.*)$')
+_CMP_OPS = {'=': '==', '<>': '!=', '<': '<', '<=': '<=', '>': '>',
+            '>=': '>='}
+
+
+class RSSError(ValueError):
+    """ Error in Resampling Stats program """
+
+
+class Statement:
+
+    def __init__(self, command, args, lineno):
+        self.command = command
+        self.args = args
+        self.lineno = lineno
+        self.body = []
+
+    def error(self, msg):
+        return RSSError(f'Line {self.lineno}: {self.command}: {msg}')
+
+    def __repr__(self):
+        return f'Statement({self.command!r}, {self.args!r}, {self.lineno})'
+
+
+def tokenize(text):
+    """ Return list of ``(command, args, lineno)`` from program `text`
+
+    A line can contain more than one command; we start a new command at each
+    token that is a command name.  A ``'`` starts a comment.
+    """
+    statements = []
+    for lineno, line in enumerate(text.splitlines(), 1):
+        line = line.split("'")[0]
+        for token in _TOKEN_RE.findall(line):
+            if token.upper() in COMMANDS:
+                statements.append((token.upper(), [], lineno))
+            elif statements and statements[-1][2] == lineno:
+                statements[-1][1].append(token)
+            else:
+                raise RSSError(f'Line {lineno}: unknown command {token!r}')
+    return statements
+
+
+def parse(text):
+    """ Parse program `text` into list of :class:`Statement`
+
+    ``REPEAT`` and ``IF`` statements have their contained statements as
+    ``body``.
+    """
+    top = []
+    stack = [top]
+    openers = []
+    for command, args, lineno in tokenize(text):
+        if command == 'END':
+            if args:
+                raise RSSError(f'Line {lineno}: END takes no arguments')
+            if not openers:
+                raise RSSError(f'Line {lineno}: END without REPEAT or IF')
+            openers.pop()
+            stack.pop()
+            continue
+        statement = Statement(command, args, lineno)
+        stack[-1].append(statement)
+        if command in ('REPEAT', 'IF'):
+            openers.append(statement)
+            stack.append(statement.body)
+    if openers:
+        raise openers[-1].error('no matching END')
+    return top
+
+
+# Runtime helpers, called from generated code.
+#
+# Values are 2-D arrays, with a row per trial, or a single row for values
+# that are the same for all trials.
+
+class Vars(dict):
+    """ Program variables; missing variables raise RSSError
+    """
+
+    def __missing__(self, name):
+        raise RSSError(f'Variable {name!r} not defined')
+
+
+def last_trial(v):
+    """ Variables with values from last trial of block
+    """
+    return Vars({name: x[-1:] for name, x in v.items()})
+
+
+def value(*vals):
+    return np.array(vals)[None]
+
+
+def value_range(lo, hi):
+    return np.arange(lo, hi + 1)[None]
+
+
+def urn(*pairs):
+    return np.concatenate([np.repeat(v, n) for n, v in pairs])[None]
+
+
+def empty():
+    return np.zeros((1, 0))
+
+
+def scalar_int(x):
+    if x.shape != (1, 1):
+        raise RSSError(f'Expecting single value, got shape {x.shape[1:]}')
+    return int(x[0, 0])
+
+
+def _rows(x, n_rows):
+    return np.broadcast_to(x, (n_rows, x.shape[1]))
+
+
+def generate(rng, n_rows, n, x):
+    """ `n` draws with replacement from values `x`
+    """
+    return sample(rng, n_rows, n, x)
+
+
+def sample(rng, n_rows, n, x):
+    n_rows = max(n_rows, len(x))
+    inds = rng.integers(0, x.shape[1], size=(n_rows, n))
+    return np.take_along_axis(_rows(x, n_rows), inds, axis=1)
+
+
+def shuffle(rng, n_rows, x):
+    return rng.permuted(_rows(x, max(n_rows, len(x))), axis=1)
+
+
+def take(x, positions):
+    n_rows = max(len(x), len(positions))
+    inds = _rows(positions, n_rows).astype(int) - 1
+    return np.take_along_axis(_rows(x, n_rows), inds, axis=1)
+
+
+def compare(x, op, *vals):
+    if op == 'between':
+        return (x >= vals[0]) & (x <= vals[1])
+    return {'==': np.equal, '!=': np.not_equal, '<': np.less,
+            '<=': np.less_equal, '>': np.greater,
+            '>=': np.greater_equal}[op](x, vals[0])
+
+
+def count(x, op, *vals):
+    return np.sum(compare(x, op, *vals), axis=1, keepdims=True)
+
+
+def reduction(func, x):
+    return func(x, axis=1, keepdims=True)
+
+
+def arith(func, *args):
+    return reduce(func, args)
+
+
+def sumsqrdev(x, m):
+    return np.sum((x - m) ** 2, axis=1, keepdims=True)
+
+
+def concat(*args):
+    n_rows = max(len(a) for a in args)
+    return np.hstack([_rows(a, n_rows) for a in args])
+
+
+def percentile(x, q):
+    return np.percentile(x, q[0], axis=1).T
+
+
+def runs(x, op, *vals):
+    """ Count runs of equal values, with lengths matching comparison
+    """
+    vals = [np.asarray(val).item() for val in vals]
+    rows, _, lengths = run_lengths(x)
+    matches = compare(lengths, op, *vals)
+    return np.bincount(rows, weights=matches,
+                       minlength=len(x)).astype(int)[:, None]
+
+
+def condition(x, op, *vals):
+    if x.shape[1] != 1:
+        raise RSSError('IF needs a single value for each trial')
+    return compare(x, op, *vals)[:, 0]
+
+
+def mask_and(mask, new_mask):
+    return new_mask if mask is None else mask & new_mask
+
+
+def where(mask, new, old):
+    """ Values from `new` for rows in `mask`, values from `old` otherwise
+
+    If `old` is None (the variable is new), rows not in `mask` are NaN.
+    """
+    if mask is None:
+        return new
+    if old is None:
+        old = np.full((1, new.shape[1]), np.nan)
+    if new.shape[1] != old.shape[1]:
+        raise RSSError('Cannot change length of variable in IF block')
+    return np.where(mask[:, None], new, old)
+
+
+def read_columns(fname, n_cols):
+    data = np.loadtxt(fname, ndmin=2)
+    if data.shape[1] != n_cols:
+        raise RSSError(f'Expecting {n_cols} columns in {fname}')
+    return [col[None] for col in data.T]
+
+
+def block_sizes(n_trials, block_trials):
+    for start in range(0, n_trials, block_trials):
+        yield min(block_trials, n_trials - start)
+
+
+class Scoreboard:
+    """ Values scored within the trials of one block
+    """
+
+    def __init__(self):
+        self.pieces = []
+
+    def score(self, x, mask):
+        self.pieces.append((x, mask))
+
+    def clear(self):
+        self.pieces = []
+
+    def value(self):
+        """ Value for use within trial
+        """
+        if any(mask is not None for x, mask in self.pieces):
+            raise RSSError('Cannot use conditional scores within trial')
+        return concat(*[x for x, mask in self.pieces] or [empty()])
+
+    def flatten(self, n_rows):
+        """ All scores for block, in trial order
+        """
+        if not self.pieces:
+            return np.zeros(0)
+        values = concat(*[x for x, mask in self.pieces])
+        masks = [np.ones((n_rows, x.shape[1]), dtype=bool) if mask is None
+                 else np.repeat(_rows(mask[:, None], n_rows), x.shape[1],
+                                axis=1)
+                 for x, mask in self.pieces]
+        return _rows(values, n_rows)[np.hstack(masks)]
+
+
+def output(x):
+    """ Convert internal value to scalar or 1-D array
+    """
+    x = x[0]
+    return x[0] if len(x) == 1 else x
+
+
+def show(name, x):
+    print(f'{name}:', output(x))
+
+
+def histogram(name, x):
+    import matplotlib.pyplot as plt
+    plt.figure()
+    plt.hist(x[0], bins='auto')
+    plt.title(name)
+
+
+# Code generation
+
+def _is_number(token):
+    return bool(_NUMBER_RE.match(token))
+
+
+def _number(token):
+    return repr(float(token) if '.' in token else int(token))
+
+
+def _list_values(token):
+    return [_number(t) for t in re.split(r'[\s,]+', token[1:-1].strip())]
+
+
+def _identifier(name):
+    name = re.sub(r'\W', '_', name)
+    return name if name.isidentifier() else 'rss_' + name
+
+
+class _Compiler:
+
+    def __init__(self):
+        self.lines = []
+        self.indent = 1
+        self.n_masks = 0
+        self.masks = ['None']
+        # Names of scoreboards in the current trial loop.
+        self.boards = None
+
+    def emit(self, line):
+        self.lines.append('    ' * self.indent + line)
+
+    @property
+    def mask(self):
+        return self.masks[-1]
+
+    def var(self, name):
+        name = name.lower()
+        if self.boards is not None and name in self.boards:
+            return f"scores[{name!r}].value()"
+        return f'v[{name!r}]'
+
+    def operand(self, st, token):
+        """ Code for number, value list or variable name
+        """
+        if _is_number(token):
+            return f'rss.value({_number(token)})'
+        if token.startswith('('):
+            return f"rss.value({', '.join(_list_values(token))})"
+        if _RANGE_RE.match(token):
+            raise st.error(f'Unexpected range {token}')
+        return self.var(token)
+
+    def values(self, st, token):
+        """ Code for range, value list, number or variable name
+        """
+        match = _RANGE_RE.match(token)
+        if match:
+            return f'rss.value_range({match[1]}, {match[2]})'
+        return self.operand(st, token)
+
+    def count_of(self, st, token):
+        if _is_number(token):
+            return str(int(float(token)))
+        return f'rss.scalar_int({self.var(token)})'
+
+    def comparison(self, st, tokens):
+        """ Code for comparison arguments (op, values) from `tokens`
+        """
+        if not tokens:
+            raise st.error('Missing comparison')
+        if tokens[0].lower() == 'between':
+            if len(tokens) != 3:
+                raise st.error('BETWEEN needs two values')
+            return (f"'between', {self.operand(st, tokens[1])}, "
+                    f"{self.operand(st, tokens[2])}")
+        match = _CMP_RE.match(tokens[0])
+        if not match:
+            raise st.error(f'Cannot parse comparison {tokens[0]!r}')
+        op, rest = match.groups()
+        rest = [rest] if rest else []
+        operands = rest + tokens[1:]
+        if len(operands) != 1:
+            raise st.error(f'Cannot parse comparison {" ".join(tokens)!r}')
+        return f'{_CMP_OPS[op]!r}, {self.operand(st, operands[0])}'
+
+    def assign(self, name, code):
+        name = name.lower()
+        if self.boards is not None and name in self.boards:
+            raise RSSError(f'Cannot assign to scoreboard {name!r}')
+        if self.mask == 'None':
+            self.emit(f'v[{name!r}] = {code}')
+        else:
+            self.emit(f'v[{name!r}] = rss.where({self.mask}, {code}, '
+                      f'v.get({name!r}))')
+
+    def compile_body(self, statements):
+        for st in statements:
+            method = getattr(self, 'c_' + st.command.lower())
+            self.emit(f'# {st.command} {" ".join(st.args)}'.rstrip())
+            method(st)
+
+    def nargs(self, st, n_min, n_max=None):
+        n_max = n_min if n_max is None else n_max
+        if not n_min <= len(st.args) <= n_max:
+            raise st.error(f'Expecting {n_min}'
+                           + ('' if n_max == n_min else f' to {n_max}')
+                           + f' arguments, got {len(st.args)}')
+
+    # Commands.
+
+    def c_numbers(self, st):
+        self.nargs(st, 2)
+        self.assign(st.args[1], self.values(st, st.args[0]))
+
+    c_data = c_copy = c_numbers
+
+    def c_urn(self, st):
+        self.nargs(st, 2, len(st.args))
+        *specs, name = st.args
+        pairs = []
+        for spec in specs:
+            match = _URN_RE.match(spec)
+            if not match:
+                raise st.error(f'Cannot parse urn spec {spec!r}')
+            pairs.append(f'({match[1]}, {_number(match[2])})')
+        if not pairs or _URN_RE.match(name):
+            raise st.error('Expecting urn specs then name')
+        self.assign(name, f"rss.urn({', '.join(pairs)})")
+
+    def c_generate(self, st):
+        self.nargs(st, 3)
+        n, spec, name = st.args
+        self.assign(name, f'rss.generate(rng, T, {self.count_of(st, n)}, '
+                    f'{self.values(st, spec)})')
+
+    def c_sample(self, st):
+        self.nargs(st, 3)
+        n, src, name = st.args
+        self.assign(name, f'rss.sample(rng, T, {self.count_of(st, n)}, '
+                    f'{self.operand(st, src)})')
+
+    def c_shuffle(self, st):
+        self.nargs(st, 2)
+        src, name = st.args
+        self.assign(name, f'rss.shuffle(rng, T, {self.operand(st, src)})')
+
+    def c_take(self, st):
+        self.nargs(st, 3)
+        src, spec, name = st.args
+        self.assign(name, f'rss.take({self.operand(st, src)}, '
+                    f'{self.values(st, spec)})')
+
+    def c_count(self, st):
+        self.nargs(st, 3, 5)
+        src, *cmp_tokens, name = st.args
+        self.assign(name, f'rss.count({self.operand(st, src)}, '
+                    f'{self.comparison(st, cmp_tokens)})')
+
+    def c_runs(self, st):
+        self.nargs(st, 3, 5)
+        src, *cmp_tokens, name = st.args
+        self.assign(name, f'rss.runs({self.operand(st, src)}, '
+                    f'{self.comparison(st, cmp_tokens)})')
+
+    def _reduction(self, st, func):
+        self.nargs(st, 2)
+        src, name = st.args
+        self.assign(name, f'rss.reduction({func}, {self.operand(st, src)})')
+
+    def c_sum(self, st):
+        self._reduction(st, 'np.sum')
+
+    def c_mean(self, st):
+        self._reduction(st, 'np.mean')
+
+    def c_median(self, st):
+        self._reduction(st, 'np.median')
+
+    def c_max(self, st):
+        self._reduction(st, 'np.max')
+
+    def c_min(self, st):
+        self._reduction(st, 'np.min')
+
+    def c_abs(self, st):
+        self.nargs(st, 2)
+        src, name = st.args
+        self.assign(name, f'np.abs({self.operand(st, src)})')
+
+    def _arith(self, st, func, variadic=False):
+        self.nargs(st, 3, len(st.args) if variadic else 3)
+        *srcs, name = st.args
+        operands = ', '.join(self.operand(st, s) for s in srcs)
+        self.assign(name, f'rss.arith({func}, {operands})')
+
+    def c_add(self, st):
+        self._arith(st, 'np.add', variadic=True)
+
+    def c_subtract(self, st):
+        self._arith(st, 'np.subtract')
+
+    def c_multiply(self, st):
+        self._arith(st, 'np.multiply', variadic=True)
+
+    def c_divide(self, st):
+        self._arith(st, 'np.true_divide')
+
+    def c_sumsqrdev(self, st):
+        self.nargs(st, 3)
+        src, mean, name = st.args
+        self.assign(name, f'rss.sumsqrdev({self.operand(st, src)}, '
+                    f'{self.operand(st, mean)})')
+
+    def c_concat(self, st):
+        self.nargs(st, 2, len(st.args))
+        *srcs, name = st.args
+        operands = ', '.join(self.operand(st, s) for s in srcs)
+        self.assign(name, f'rss.concat({operands})')
+
+    def c_percentile(self, st):
+        self.nargs(st, 3)
+        src, spec, name = st.args
+        self.assign(name, f'rss.percentile({self.operand(st, src)}, '
+                    f'{self.values(st, spec)})')
+
+    def c_read(self, st):
+        args = st.args
+        if args and args[0].lower() == 'file':
+            args = args[1:]
+        if len(args) < 2:
+            raise st.error('Expecting file name and variable names')
+        fname, *names = args
+        fname = fname.strip('“”"')
+        self.emit(f'_cols = rss.read_columns({fname!r}, {len(names)})')
+        for i, name in enumerate(names):
+            self.assign(name, f'_cols[{i}]')
+
+    def c_score(self, st):
+        self.nargs(st, 2, len(st.args))
+        src, *names = st.args
+        src_code = self.operand(st, src)
+        for i, name in enumerate(names):
+            name = name.lower()
+            code = (src_code if len(names) == 1 else
+                    f'{src_code}[:, {i}:{i + 1}]')
+            if self.boards is None:  # Outside trial loop.
+                self.emit(f'v[{name!r}] = rss.concat(v.get({name!r}, '
+                          f'rss.empty()), {code})')
+            else:
+                self.emit(f'scores[{name!r}].score({code}, {self.mask})')
+
+    def c_clear(self, st):
+        self.nargs(st, 1)
+        name = st.args[0].lower()
+        if self.boards is not None and name in self.boards:
+            self.emit(f'scores[{name!r}].clear()')
+        else:
+            self.assign(name, 'rss.empty()')
+
+    def c_print(self, st):
+        self.nargs(st, 1, len(st.args))
+        self.emit('if show:')
+        for name in st.args:
+            self.emit(f'    rss.show({name.lower()!r}, {self.var(name)})')
+
+    def c_histogram(self, st):
+        self.nargs(st, 1)
+        name = st.args[0]
+        self.emit('if show:')
+        self.emit(f'    rss.histogram({name.lower()!r}, {self.var(name)})')
+
+    def c_maxsize(self, st):
+        # Arrays grow as needed; nothing to do.
+        self.emit('pass')
+
+    def c_if(self, st):
+        self.nargs(st, 3, 5)
+        src, *cmp_tokens = st.args
+        self.n_masks += 1
+        mask = f'm{self.n_masks}'
+        self.emit(f'{mask} = rss.mask_and({self.mask}, '
+                  f'rss.condition({self.operand(st, src)}, '
+                  f'{self.comparison(st, cmp_tokens)}))')
+        self.masks.append(mask)
+        self.compile_body(st.body)
+        self.masks.pop()
+
+    def c_repeat(self, st):
+        self.nargs(st, 1)
+        n = self.count_of(st, st.args[0])
+        if self.boards is not None:  # Inner loop.
+            self.emit(f'for _ in range({n}):')
+            self.indent += 1
+            self.compile_body(st.body)
+            if not st.body:
+                self.emit('pass')
+            self.indent -= 1
+            return
+        self.boards = sorted(_score_targets(st.body))
+        _check_trial(st.body, set(self.boards))
+        self.emit(f'boards = {{name: [] for name in {self.boards!r}}}')
+        self.emit(f'for T in rss.block_sizes({n}, block_trials):')
+        self.indent += 1
+        self.emit('scores = {name: rss.Scoreboard() for name in boards}')
+        self.emit('# Start with values from last trial of previous block.')
+        self.emit('v = rss.last_trial(v)')
+        self.compile_body(st.body)
+        self.emit('for name, board in scores.items():')
+        self.emit('    boards[name].append(board.flatten(T))')
+        self.indent -= 1
+        self.emit('# End of trials; keep values from last trial.')
+        self.emit('v = rss.last_trial(v)')
+        self.emit('T = 1')
+        self.emit('for name, blocks in boards.items():')
+        self.emit('    v[name] = rss.concat(v.get(name, rss.empty()), '
+                  'np.concatenate(blocks)[None])')
+        self.boards = None
+
+
+def _score_targets(statements):
+    targets = set()
+    for st in statements:
+        if st.command == 'SCORE':
+            targets.update(name.lower() for name in st.args[1:])
+        targets.update(_score_targets(st.body))
+    return targets
+
+
+# Commands that do not assign their last argument.
+_NO_ASSIGN = {'HISTOGRAM', 'IF', 'MAXSIZE', 'PRINT', 'READ', 'REPEAT',
+              'SCORE'}
+
+
+def _names(tokens):
+    # Variable names in argument `tokens`.
+    names = []
+    for token in tokens:
+        match = _CMP_RE.match(token)
+        if match:
+            token = match[2]
+        if (token and not _is_number(token) and not _RANGE_RE.match(token)
+                and not _URN_RE.match(token) and token[0] not in '(“"'
+                and token.lower() != 'between'):
+            names.append(token.lower())
+    return names
+
+
+def _reads_writes(st):
+    # Names that statement `st` reads, and names it assigns.
+    args = st.args
+    if st.command == 'READ':
+        names = args[1:] if args and args[0].lower() == 'file' else args
+        return [], _names(names[1:])
+    if st.command == 'SCORE':
+        return _names(args[:1]), []
+    if st.command == 'CLEAR':
+        return [], _names(args)
+    if st.command in _NO_ASSIGN:
+        return _names(args), []
+    return _names(args[:-1]), _names(args[-1:])
+
+
+def _all_writes(statements):
+    names = set()
+    for st in statements:
+        names.update(_reads_writes(st)[1])
+        names.update(_all_writes(st.body))
+    return names
+
+
+def _check_trial(body, boards):
+    """ Raise RSSError if trial `body` uses values from an earlier trial
+
+    This happens when the trial reads a variable before it assigns it (for
+    example, ``ADD total 1 total``), or reads a variable that it may only
+    assign inside ``IF``.  We run the trials at the same time, so we cannot
+    pass values from one trial to the next.  ``SHUFFLE a a`` is fine, because
+    a shuffle of a shuffle is just a shuffle.
+    """
+    assigned = _all_writes(body) - boards
+
+    def walk(statements, defined):
+        for st in statements:
+            reads, writes = _reads_writes(st)
+            for name in reads:
+                if name not in assigned or name in defined:
+                    continue
+                if st.command == 'SHUFFLE' and writes == [name]:
+                    continue
+                raise st.error(
+                    f'Variable {name!r} may carry its value from one trial '
+                    'to the next; assign it in each trial before use')
+            if st.command == 'IF':
+                # Assignments in IF only happen for some trials.
+                walk(st.body, set(defined))
+            else:
+                walk(st.body, defined)
+            defined.update(writes)
+
+    walk(body, set())
+
+
+def to_python(text, func_name='rss_program'):
+    """ Return source of Python function for Resampling Stats program `text`
+
+    The function has signature ``func_name(rng=None, show=False,
+    block_trials=BLOCK_TRIALS)``, and returns a dict, with a key for each
+    variable in the program, and values that are scalars or 1-D arrays.  If
+    `show` is True, the function also prints and plots, for ``PRINT`` and
+    ``HISTOGRAM`` commands.
+    """
+    compiler = _Compiler()
+    compiler.compile_body(parse(text))
+    lines = [f'def {_identifier(func_name)}(rng=None, show=False, '
+             'block_trials=BLOCK_TRIALS):',
+             '    rng = rss.get_rng(rng)',
+             '    v = rss.Vars()',
+             '    T = 1'] + compiler.lines + [
+             '    return {name: rss.output(x) for name, x in v.items()}']
+    return '\n'.join(lines) + '\n'
+
+
+def compile_rss(text, func_name='rss_program'):
+    """ Compile Resampling Stats program `text` to Python function
+
+    See :func:`to_python` for the function signature.  The function has the
+    generated code as its ``source`` attribute.
+
+    Examples
+    --------
+    >>> func = compile_rss('''
+    ... NUMBERS 1,6 a
+    ... REPEAT 1000
+    ...     SHUFFLE a c
+    ...     SUBTRACT a c d
+    ...     COUNT d =0 e
+    ...     SCORE e z
+    ... END
+    ... COUNT z >= 1 k
+    ... ''')
+    >>> results = func(rng=1)
+    >>> results['z'].shape
+    (1000,)
+    >>> bool(550 < results['k'] < 720)  # About 63% of trials.
+    True
+    """
+    source = to_python(text, func_name)
+    namespace = {'rss': sys.modules[__name__],
+                 'np': np,
+                 'BLOCK_TRIALS': BLOCK_TRIALS}
+    exec(compile(source, f'<rss {func_name}>', 'exec'), namespace)
+    func = namespace[_identifier(func_name)]
+    func.source = source
+    return func
+
+
+def compile_file(fname):
+    """ Compile Resampling Stats program in file `fname`
+    """
+    fname = Path(fname)
+    return compile_rss(fname.read_text(), fname.stem)
+
+
+def get_parser():
+    parser = ArgumentParser(description=__doc__,  # Usage from docstring
+                            formatter_class=RawDescriptionHelpFormatter)
+    parser.add_argument('rss_file', nargs='+',
+                        help='Resampling Stats program file(s)')
+    parser.add_argument('--code', action='store_true',
+                        help='Print generated Python code')
+    parser.add_argument('--run', action='store_true',
+                        help='Run compiled code, and print results')
+    parser.add_argument('--seed', type=int,
+                        help='Seed for random number generator')
+    return parser
+
+
+def main():
+    args = get_parser().parse_args()
+    n_errors = 0
+    for fname in args.rss_file:
+        try:
+            func = compile_file(fname)
+            if args.code:
+                print(func.source)
+            if args.run:
+                func(rng=args.seed, show=True)
+        except (RSSError, OSError) as e:
+            n_errors += 1
+            print(f'{fname}: {type(e).__name__}: {e}')
+        else:
+            print(f'{fname}: OK')
+    return 1 if n_errors else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,240 @@
+""" Kernels for runs, streaks and waiting times in sequences of events
+
+Several simulations walk along a sequence of coin tosses or draws in each
+trial, looking for the longest run, the first time something happens, or
+the point where a running total hits a limit.  The routines here do the same
+for a whole 2-D block of sequences, one sequence per row, using ``diff``,
+``cumsum`` and ``argmax`` along the rows instead of Python loops.
+:func:`sequence_stat` generates the blocks for many trials, keeping memory
+bounded.
+"""
+
+import numpy as np
+
+from .kernels import get_rng, trial_blocks, MAX_ELEMENTS
+
+
+def _as_2d(x):
+    x = np.asarray(x)
+    if x.ndim != 2:
+        raise ValueError('Expecting 2-D array, one sequence per row')
+    return x
+
+
+def run_lengths(x):
+    """ Rows, values and lengths of runs of equal values in rows of `x`
+
+    Parameters
+    ----------
+    x : array, shape (n_trials, seq_len)
+        One sequence per row.
+
+    Returns
+    -------
+    rows : array
+        Row index of each run.
+    values : array
+        Repeated value for each run.
+    lengths : array
+        Length of each run.
+
+    Examples
+    --------
+    >>> rows, values, lengths = run_lengths([[1, 1, 0, 1], [0, 0, 0, 1]])
+    >>> rows.tolist(), values.tolist(), lengths.tolist()
+    ([0, 0, 0, 1, 1], [1, 0, 1, 0, 1], [2, 1, 1, 3, 1])
+    """
+    x = _as_2d(x)
+    n_rows, n = x.shape
+    # A run starts at the start of each row, and where the value changes.
+    starts = np.ones(x.shape, dtype=bool)
+    starts[:, 1:] = x[:, 1:] != x[:, :-1]
+    start_inds = np.flatnonzero(starts)
+    lengths = np.diff(np.append(start_inds, n_rows * n))
+    return start_inds // n, x.ravel()[start_inds], lengths
+
+
+def _select_runs(x, value, min_length):
+    rows, values, lengths = run_lengths(x)
+    keep = lengths >= min_length
+    if value is not None:
+        keep &= values == value
+    return rows[keep], lengths[keep], len(x)
+
+
+def count_runs(x, value=None, min_length=1):
+    """ Number of runs in each row of `x`
+
+    Parameters
+    ----------
+    x : array, shape (n_trials, seq_len)
+        One sequence per row.
+    value : None or scalar, optional
+        If not None, count only runs of `value`.
+    min_length : int, optional
+        Count only runs at least this long.
+
+    Returns
+    -------
+    counts : array, shape (n_trials,)
+    """
+    rows, lengths, n_rows = _select_runs(x, value, min_length)
+    return np.bincount(rows, minlength=n_rows)
+
+
+def longest_run(x, value=None):
+    """ Length of longest run in each row of `x`
+
+    Parameters
+    ----------
+    x : array, shape (n_trials, seq_len)
+        One sequence per row.
+    value : None or scalar, optional
+        If not None, consider only runs of `value`.  Rows without `value` give
+        0.
+
+    Returns
+    -------
+    lengths : array, shape (n_trials,)
+
+    Examples
+    --------
+    >>> longest_run([[1, 1, 0, 1], [0, 0, 0, 1]], value=1).tolist()
+    [2, 1]
+    """
+    rows, lengths, n_rows = _select_runs(x, value, 1)
+    longest = np.zeros(n_rows, dtype=int)
+    np.maximum.at(longest, rows, lengths)
+    return longest
+
+
+def first_index(condition, missing=-1):
+    """ Index of first True value in each row of `condition`
+
+    Parameters
+    ----------
+    condition : array, shape (n_trials, seq_len)
+        Boolean array.
+    missing : int, optional
+        Value for rows without any True values.
+
+    Returns
+    -------
+    indices : array, shape (n_trials,)
+    """
+    condition = _as_2d(condition).astype(bool)
+    indices = np.argmax(condition, axis=1)
+    return np.where(condition[np.arange(len(condition)), indices],
+                    indices, missing)
+
+
+def waiting_time(successes, k=1, missing=-1):
+    """ Number of events up to and including the `k`-th success in each row
+
+    Parameters
+    ----------
+    successes : array, shape (n_trials, seq_len)
+        Boolean (or 0 / 1) array, True for success.
+    k : int, optional
+        Number of successes to wait for.
+    missing : int, optional
+        Value for rows with fewer than `k` successes.
+
+    Returns
+    -------
+    times : array, shape (n_trials,)
+
+    Examples
+    --------
+    >>> waiting_time([[0, 1, 0, 1, 1], [1, 0, 0, 0, 0]], k=2).tolist()
+    [4, -1]
+    """
+    counts = np.cumsum(_as_2d(successes), axis=1)
+    indices = first_index(counts >= k)
+    return np.where(indices >= 0, indices + 1, missing)
+
+
+def barrier_crossing(steps, lower, upper, start=0):
+    """ First step where running total reaches `lower` or `upper`
+
+    For example, in the gambler's ruin, each row of `steps` is a sequence of
+    +1 and -1 for wins and losses, `start` is the player's starting capital,
+    `lower` is 0 (ruin), and `upper` is the capital at which the player stops.
+
+    Parameters
+    ----------
+    steps : array, shape (n_trials, seq_len)
+        Change in total at each step.
+    lower : scalar
+        Lower barrier; total at or below `lower` is a crossing.
+    upper : scalar
+        Upper barrier; total at or above `upper` is a crossing.
+    start : scalar, optional
+        Total before first step.
+
+    Returns
+    -------
+    indices : array, shape (n_trials,)
+        Index of step at which total first reaches a barrier, -1 if never.
+    hit_upper : array, shape (n_trials,)
+        True if this first barrier was `upper`.  False where the total
+        reached `lower` or never reached a barrier.
+
+    Examples
+    --------
+    >>> steps = [[1, 1, -1, 1], [-1, -1, 1, 1], [1, -1, 1, -1]]
+    >>> indices, hit_upper = barrier_crossing(steps, 0, 3, start=1)
+    >>> indices.tolist(), hit_upper.tolist()
+    ([1, 0, -1], [True, False, False])
+    """
+    totals = start + np.cumsum(_as_2d(steps), axis=1)
+    indices = first_index((totals <= lower) | (totals >= upper))
+    crossed = indices >= 0
+    final = totals[np.arange(len(totals)), np.where(crossed, indices, 0)]
+    return indices, crossed & (final >= upper)
+
+
+def sequence_stat(generate, kernel, n_trials, seq_len, rng=None,
+                  max_elements=MAX_ELEMENTS, dtype=float):
+    """ Apply `kernel` to `n_trials` sequences from `generate`
+
+    Parameters
+    ----------
+    generate : callable
+        Called as ``generate(rng, n, seq_len)``; returns array, shape (n,
+        seq_len) of `n` sequences.
+    kernel : callable
+        Called as ``kernel(sequences)``; returns 1-D array with one result per
+        row of `sequences`, as do :func:`longest_run`, :func:`first_index`
+        and so on.
+    n_trials : int
+        Number of sequences (trials).
+    seq_len : int
+        Length of each sequence.
+    rng : None or int or Generator, optional
+        See :func:`.kernels.get_rng`.
+    max_elements : int, optional
+        Maximum number of sequence elements to generate at any one time.
+    dtype : dtype specifier, optional
+        Data type of returned `results`.
+
+    Returns
+    -------
+    results : array, shape (n_trials,)
+
+    Examples
+    --------
+    Longest run of heads in 100 coin tosses:
+
+    >>> def tosses(rng, n, seq_len):
+    ...     return rng.integers(0, 2, size=(n, seq_len))
+    >>> longest = sequence_stat(tosses, lambda s: longest_run(s, 1),
+    ...                         10_000, 100, rng=1)
+    >>> bool(5 < np.mean(longest) < 7)
+    True
+    """
+    rng = get_rng(rng)
+    results = np.zeros(n_trials, dtype=dtype)
+    for start, stop in trial_blocks(n_trials, seq_len, max_elements):
+        results[start:stop] = kernel(generate(rng, stop - start, seq_len))
+    return results
@@ -0,0 +1,354 @@
+""" Streaming accumulators for simulation results
+
+Instead of storing every trial result in a `results` array, and then taking
+counts, means, histograms and quantiles from that array, we can feed blocks of
+trial results into accumulators, and throw the blocks away.  The memory we
+need does not grow with the number of trials.
+
+Each accumulator has:
+
+* an ``update(values)`` method to add a block of trial results;
+* a ``merge(other)`` method to add the results from another accumulator of the
+  same type, for example, from another worker process;
+* an ``empty()`` method returning a new accumulator with the same settings and
+  no results.
+
+:func:`simulate_stream` runs a simulation in chunks, optionally over several
+processes, feeding each chunk into accumulators.
+"""
+
+from functools import partial
+import operator
+
+import numpy as np
+
+from .parallel import imap_chunks, CHUNK_TRIALS
+
+
+class Moments:
+    """ Accumulate count, mean and variance
+
+    We use the pairwise update of Chan, Golub and LeVeque, so updates from
+    large blocks, and merges, lose little precision.
+    """
+
+    def __init__(self):
+        self.n = 0
+        self.mean = 0.
+        self._ssd = 0.  # Sum of squared deviations from mean.
+
+    def empty(self):
+        return type(self)()
+
+    def _combine(self, n, mean, ssd):
+        if n == 0:
+            return
+        total = self.n + n
+        delta = mean - self.mean
+        self.mean += delta * n / total
+        self._ssd += ssd + delta ** 2 * self.n * n / total
+        self.n = total
+
+    def update(self, values):
+        values = np.ravel(values)
+        if len(values) == 0:
+            return self
+        mean = np.mean(values)
+        self._combine(len(values), mean, np.sum((values - mean) ** 2))
+        return self
+
+    def merge(self, other):
+        self._combine(other.n, other.mean, other._ssd)
+        return self
+
+    def var(self, ddof=0):
+        return self._ssd / (self.n - ddof)
+
+    def std(self, ddof=0):
+        return np.sqrt(self.var(ddof))
+
+
+_COMPARISONS = {'<': operator.lt,
+                '<=': operator.le,
+                '>': operator.gt,
+                '>=': operator.ge,
+                '==': operator.eq,
+                '!=': operator.ne}
+
+
+class TailCount:
+    """ Count results for which ``result <op> threshold`` is True
+
+    Parameters
+    ----------
+    op : str
+        One of '<', '<=', '>', '>=', '==', '!='.
+    threshold : scalar
+        Value to compare results against.
+
+    Examples
+    --------
+    Replaces ``k = np.sum(results >= 14)``; ``kk = k / n_trials``:
+
+    >>> counter = TailCount('>=', 14)
+    >>> counter = counter.update([12, 14, 15, 9])
+    >>> counter.count, counter.proportion
+    (2, 0.5)
+    """
+
+    def __init__(self, op, threshold):
+        if op not in _COMPARISONS:
+            raise ValueError(f'op should be one of {list(_COMPARISONS)}')
+        self.op = op
+        self.threshold = threshold
+        self.count = 0
+        self.n = 0
+
+    def empty(self):
+        return type(self)(self.op, self.threshold)
+
+    def update(self, values):
+        values = np.ravel(values)
+        self.count += int(np.count_nonzero(
+            _COMPARISONS[self.op](values, self.threshold)))
+        self.n += len(values)
+        return self
+
+    def merge(self, other):
+        self.count += other.count
+        self.n += other.n
+        return self
+
+    @property
+    def proportion(self):
+        return self.count / self.n
+
+
+class IntHistogram:
+    """ Exact counts of integer results, using ``np.bincount``
+
+    The integers may be negative; we store counts from the lowest value seen.
+    """
+
+    def __init__(self):
+        self.offset = 0
+        self.counts = np.zeros(0, dtype=np.int64)
+
+    def empty(self):
+        return type(self)()
+
+    def _add_counts(self, offset, counts):
+        if len(counts) == 0:
+            return
+        if len(self.counts) == 0:
+            self.offset, self.counts = offset, counts.astype(np.int64)
+            return
+        lo = min(self.offset, offset)
+        hi = max(self.offset + len(self.counts), offset + len(counts))
+        new_counts = np.zeros(hi - lo, dtype=np.int64)
+        new_counts[self.offset - lo:
+                   self.offset - lo + len(self.counts)] += self.counts
+        new_counts[offset - lo:offset - lo + len(counts)] += counts
+        self.offset, self.counts = lo, new_counts
+
+    def update(self, values):
+        values = np.ravel(values)
+        if len(values) == 0:
+            return self
+        if not np.issubdtype(values.dtype, np.integer):
+            as_int = values.astype(np.int64)
+            if np.any(as_int != values):
+                raise ValueError('IntHistogram needs integer values')
+            values = as_int
+        offset = int(values.min())
+        self._add_counts(offset, np.bincount(values - offset))
+        return self
+
+    def merge(self, other):
+        self._add_counts(other.offset, other.counts)
+        return self
+
+    @property
+    def n(self):
+        return int(np.sum(self.counts))
+
+    @property
+    def values(self):
+        return np.arange(self.offset, self.offset + len(self.counts))
+
+    @property
+    def proportions(self):
+        return self.counts / self.n
+
+    def quantile(self, q):
+        """ Exact quantile(s) `q`, as for ``np.quantile(..., method='lower')``
+        """
+        cum = np.cumsum(self.counts)
+        ranks = np.floor(np.asarray(q) * (self.n - 1)).astype(int)
+        return self.values[np.searchsorted(cum, ranks, side='right')]
+
+
+class Histogram:
+    """ Counts of results falling into fixed bins
+
+    Parameters
+    ----------
+    bins : array-like
+        Bin edges, as for ``np.histogram``.
+    """
+
+    def __init__(self, bins):
+        self.bins = np.asarray(bins)
+        self.counts = np.zeros(len(self.bins) - 1, dtype=np.int64)
+        self.n = 0
+
+    def empty(self):
+        return type(self)(self.bins)
+
+    def update(self, values):
+        values = np.ravel(values)
+        self.counts += np.histogram(values, self.bins)[0]
+        self.n += len(values)
+        return self
+
+    def merge(self, other):
+        self.counts += other.counts
+        self.n += other.n
+        return self
+
+
+class QuantileSketch:
+    """ Approximate quantiles from a mergeable KLL-type sketch
+
+    The sketch is a stack of compactors.  Each compactor holds up to `k`
+    values.  When a compactor fills, we sort its values, and pass every second
+    value up to the next compactor, where each value stands for twice as many
+    results.  The memory use grows only as the log of the number of results.
+    The rank error is of order ``log2(n / k) / k``.
+
+    We alternate which half we promote, rather than choosing at random, so the
+    sketch is a deterministic function of its input and merge order.
+
+    Parameters
+    ----------
+    k : int, optional
+        Capacity of each compactor.
+    """
+
+    def __init__(self, k=1000):
+        self.k = k
+        self.n = 0
+        self._levels = [np.zeros(0)]
+        self._parities = [0]
+
+    def empty(self):
+        return type(self)(self.k)
+
+    def _compress(self):
+        level = 0
+        while level < len(self._levels):
+            values = self._levels[level]
+            if len(values) >= self.k:
+                if level + 1 == len(self._levels):
+                    self._levels.append(np.zeros(0))
+                    self._parities.append(0)
+                values = np.sort(values)
+                # Keep one value back if we have an odd number.
+                n_pairs = len(values) // 2
+                parity = self._parities[level]
+                self._parities[level] = 1 - parity
+                promoted = values[parity:2 * n_pairs:2]
+                self._levels[level] = values[2 * n_pairs:]
+                self._levels[level + 1] = np.concatenate(
+                    [self._levels[level + 1], promoted])
+            level += 1
+
+    def update(self, values):
+        values = np.ravel(values).astype(float)
+        self.n += len(values)
+        self._levels[0] = np.concatenate([self._levels[0], values])
+        self._compress()
+        return self
+
+    def merge(self, other):
+        while len(self._levels) < len(other._levels):
+            self._levels.append(np.zeros(0))
+            self._parities.append(0)
+        for i, values in enumerate(other._levels):
+            self._levels[i] = np.concatenate([self._levels[i], values])
+        self.n += other.n
+        self._compress()
+        return self
+
+    @property
+    def size(self):
+        """ Number of values stored in sketch
+        """
+        return sum(len(v) for v in self._levels)
+
+    def quantile(self, q):
+        """ Approximate quantile(s) `q` of results seen so far
+        """
+        values = np.concatenate(self._levels)
+        weights = np.concatenate([np.full(len(v), 2 ** i)
+                                  for i, v in enumerate(self._levels)])
+        order = np.argsort(values, kind='stable')
+        values, weights = values[order], weights[order]
+        cum = np.cumsum(weights)
+        ranks = np.asarray(q) * (cum[-1] - 1)
+        inds = np.searchsorted(cum, ranks, side='right')
+        return values[np.minimum(inds, len(values) - 1)]
+
+
+def _accumulate_chunk(chunk_func, accumulators, rng, n):
+    values = chunk_func(rng, n)
+    return [acc.empty().update(values) for acc in accumulators]
+
+
+def simulate_stream(chunk_func, n_trials, accumulators, seed=None,
+                    n_workers=1, chunk_trials=CHUNK_TRIALS):
+    """ Run simulation in chunks, feeding results into `accumulators`
+
+    Parameters
+    ----------
+    chunk_func : callable
+        Called as ``chunk_func(rng, n)``; should return a 1-D array of `n`
+        trial results.  See :func:`resampling.parallel.imap_chunks`.
+    n_trials : int
+        Total number of trials.
+    accumulators : sequence
+        Accumulators, such as :class:`TailCount` or :class:`QuantileSketch`.
+        We merge the results for all chunks into these accumulators.
+    seed : None or int or SeedSequence, optional
+        See :func:`resampling.parallel.seed_sequence`.
+    n_workers : None or int, optional
+        Number of worker processes.  See
+        :func:`resampling.parallel.imap_chunks`.
+    chunk_trials : int, optional
+        Maximum number of trials in each chunk, and so the maximum length of
+        array we need in each worker.
+
+    Returns
+    -------
+    accumulators : sequence
+        The input `accumulators`, updated with the results of all trials.
+
+    Examples
+    --------
+    >>> from resampling import bootstrap
+    >>> gains = [31, 34, 29, 26, 32, 35, 38, 34, 31, 29, 32, 30]
+    >>> def means(rng, n):
+    ...     return bootstrap(gains, np.mean, n, rng=rng)
+    >>> moments, sketch = simulate_stream(
+    ...     means, 100_000, [Moments(), QuantileSketch()], seed=1)
+    >>> moments.n
+    100000
+    >>> bool(abs(moments.mean - np.mean(gains)) < 0.1)
+    True
+    """
+    func = partial(_accumulate_chunk, chunk_func, accumulators)
+    for chunk_accs in imap_chunks(func, n_trials, seed, n_workers,
+                                  chunk_trials):
+        for acc, chunk_acc in zip(accumulators, chunk_accs):
+            acc.merge(chunk_acc)
+    return accumulators
@@ -0,0 +1,152 @@
+""" Parameter sweeps with common random numbers
+
+To choose a sample size, we run the same simulation for several sample sizes
+(and perhaps several effect sizes), and look at how the result, such as the
+power of a test, changes.  If each setting uses fresh random numbers, the
+curves are bumpy from simulation noise, and the full grid costs the sum of
+all the settings.
+
+:func:`sweep` instead draws one block of random numbers, big enough for the
+largest sample size, and uses it for every setting.  A sample of size `n` is
+the first `n` columns of the block, so the samples for increasing `n` are
+nested.  Differences between settings then reflect the settings, not the
+noise, and the whole grid costs little more than its largest point.
+"""
+
+from functools import partial
+from itertools import product
+
+import numpy as np
+
+from .kernels import MAX_ELEMENTS
+from .parallel import imap_chunks
+
+
+def grid_points(grid):
+    """ List of dicts, one for each combination of values in `grid`
+
+    Parameters
+    ----------
+    grid : dict
+        Maps parameter names to sequences of values.
+
+    Returns
+    -------
+    points : list of dict
+
+    Examples
+    --------
+    >>> grid_points({'sampsize': [10, 20], 'effect': [0, 1]})
+    ... # doctest: +NORMALIZE_WHITESPACE
+    [{'sampsize': 10, 'effect': 0}, {'sampsize': 10, 'effect': 1},
+     {'sampsize': 20, 'effect': 0}, {'sampsize': 20, 'effect': 1}]
+    """
+    names = list(grid)
+    return [dict(zip(names, values))
+            for values in product(*(grid[name] for name in names))]
+
+
+def _sweep_chunk(draw, evaluate, points, size_param, max_size, rng, n):
+    # Results for each grid point, from one block of random numbers.
+    block = draw(rng, n, max_size)
+    results = np.zeros((len(points), n))
+    for i, params in enumerate(points):
+        sample = block
+        if size_param is not None:
+            sample = block[:, :params[size_param]]
+        results[i] = evaluate(sample, **params)
+    return results
+
+
+def sweep_results(draw, evaluate, grid, n_trials=10_000,
+                  size_param='sampsize', seed=None, n_workers=1,
+                  chunk_trials=None):
+    """ Trial results for each point in `grid`, using common random numbers
+
+    Parameters
+    ----------
+    draw : callable
+        Called as ``draw(rng, n, max_size)``; returns block of random numbers
+        for `n` trials, one row per trial, with `max_size` columns.
+    evaluate : callable
+        Called as ``evaluate(sample, **params)`` for each combination of
+        parameters in `grid`, where `sample` is the block of random numbers
+        (with only the first ``params[size_param]`` columns).  Returns array
+        of results, one per trial (row).
+    grid : dict
+        Maps parameter names to sequences of values.
+    n_trials : int, optional
+        Number of trials.
+    size_param : None or str, optional
+        Name of parameter giving sample size.  If None, `evaluate` gets the
+        whole block, and `draw` gets `max_size` of None.
+    seed : None or int or SeedSequence, optional
+        See :func:`.parallel.seed_sequence`.
+    n_workers : None or int, optional
+        Number of worker processes.  See :func:`.parallel.imap_chunks`.
+    chunk_trials : None or int, optional
+        Number of trials in each chunk.  None gives chunks of about
+        :data:`.kernels.MAX_ELEMENTS` random numbers.
+
+    Returns
+    -------
+    points : list of dict
+        Grid points, from :func:`grid_points`.
+    results : array, shape (len(points), n_trials)
+        Results for each grid point and trial.
+    """
+    points = grid_points(grid)
+    max_size = None if size_param is None else max(grid[size_param])
+    if chunk_trials is None:
+        chunk_trials = max(1, MAX_ELEMENTS // (max_size or 1))
+    func = partial(_sweep_chunk, draw, evaluate, points, size_param,
+                   max_size)
+    results = np.zeros((len(points), n_trials))
+    start = 0
+    for output in imap_chunks(func, n_trials, seed, n_workers,
+                              chunk_trials):
+        stop = start + output.shape[1]
+        results[:, start:stop] = output
+        start = stop
+    return points, results
+
+
+def sweep(draw, evaluate, grid, n_trials=10_000, size_param='sampsize',
+          seed=None, n_workers=1, chunk_trials=None):
+    """ Table of mean trial result for each point in `grid`
+
+    For example, if `evaluate` returns True for trials where a test rejects
+    the null hypothesis, the mean is the power of the test.  See
+    :func:`sweep_results` for parameters.
+
+    Returns
+    -------
+    table : DataFrame
+        One row per grid point, with a column for each parameter, and columns
+        ``estimate`` (mean result over trials) and ``se`` (standard error of
+        estimate).
+
+    Examples
+    --------
+    Chance that the proportion of "yes" answers in a sample is within 0.05 of
+    the population proportion of 0.3, for different sample sizes:
+
+    >>> def draw(rng, n, max_size):
+    ...     return rng.uniform(size=(n, max_size))
+    >>> def within(sample, sampsize):
+    ...     return np.abs(np.mean(sample < 0.3, axis=1) - 0.3) <= 0.05
+    >>> table = sweep(draw, within, {'sampsize': [50, 100, 200, 400]},
+    ...               seed=1)
+    >>> list(table.columns)
+    ['sampsize', 'estimate', 'se']
+    >>> bool(np.all(np.diff(table['estimate']) > 0))
+    True
+    """
+    import pandas as pd
+    points, results = sweep_results(draw, evaluate, grid, n_trials,
+                                    size_param, seed, n_workers,
+                                    chunk_trials)
+    table = pd.DataFrame(points)
+    table['estimate'] = np.mean(results, axis=1)
+    table['se'] = np.std(results, axis=1, ddof=1) / np.sqrt(n_trials)
+    return table
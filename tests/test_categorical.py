@@ -0,0 +1,80 @@
+""" Tests for categorical arrays and urns
+"""
+
+import os.path as op
+import sys
+
+import numpy as np
+import pytest
+
+HERE = op.dirname(__file__)
+SOURCE = op.join(HERE, '..', 'source')
+sys.path.append(SOURCE)
+
+import resampling as rs
+
+
+def test_categorical():
+    values = np.array(['heads', 'tails', 'tails', 'heads', 'tails'])
+    cat = rs.Categorical.from_labels(values)
+    assert cat.codes.dtype == np.uint8
+    assert cat.labels.tolist() == ['heads', 'tails']
+    assert np.all(cat.decode() == values)
+    assert np.all(np.array(cat) == values)
+    assert np.all((cat == 'tails') == (values == 'tails'))
+    assert np.all((cat != 'tails') == (values != 'tails'))
+    assert cat.count('tails') == 3
+    assert cat.counts().tolist() == [2, 3]
+    assert cat[1] == 'tails'
+    assert np.all(cat[cat == 'heads'] == 'heads')
+    assert np.all(cat.isin(['heads', 'tails']))
+    # Labels not in the table match nothing, as for string arrays.
+    assert not np.any(cat == 'edge')
+    assert np.all(cat != 'edge')
+    assert (cat == 'edge').shape == cat.shape
+    assert cat.count('edge') == 0
+    assert cat.isin(['edge', 'tails']).tolist() == (
+        values == 'tails').tolist()
+    assert np.all((cat == values) & (cat != ['edge'] * len(values)))
+    joker = rs.Categorical.from_labels(['heads', 'joker'])
+    assert (cat[:2] == joker).tolist() == [True, False]
+    with pytest.raises(ValueError):
+        cat[0] = 'edge'
+    with pytest.raises(ValueError):
+        rs.Categorical([0, 1], ['a', 'a'])
+    # Given label order.
+    other = rs.Categorical.from_labels(values, ['tails', 'heads'])
+    assert other.counts().tolist() == [3, 2]
+    assert np.all(other == cat)
+    # Row counts for 2-D.
+    rows = rs.Categorical.from_labels(values.reshape(1, 5).repeat(3, axis=0))
+    assert rows.counts().tolist() == [[2, 3]] * 3
+    assert rows.count('heads', axis=1).tolist() == [2, 2, 2]
+
+
+def test_setitem():
+    says = rs.Categorical.full(6, 'not approved',
+                               ['approved', 'not approved'])
+    cars = rs.Categorical.from_labels(['working', 'faulty'] * 3)
+    says[cars == 'working'] = 'approved'
+    assert says.decode().tolist() == ['approved', 'not approved'] * 3
+    # Categorical values with different label order.
+    new = rs.Categorical.from_labels(['not approved', 'approved'],
+                                     ['not approved', 'approved'])
+    says[:2] = new
+    assert says.decode().tolist()[:2] == ['not approved', 'approved']
+
+
+def test_urn():
+    urn = rs.Urn(['working', 'faulty'], p=[0.7, 0.3])
+    cars = urn.choice(100_000, rng=1)
+    assert cars.nbytes == 100_000
+    assert abs(np.mean(cars == 'faulty') - 0.3) < 0.01
+    # Without replacement, from counts.
+    deck = rs.Urn(['red', 'black'], counts=[26, 26])
+    hand = deck.choice(52, replace=False, rng=2)
+    assert hand.counts().tolist() == [26, 26]
+    hands = deck.choice((10, 5), rng=3)
+    assert hands.counts().sum(axis=1).tolist() == [5] * 10
+    with pytest.raises(ValueError):
+        urn.choice(10, replace=False)
@@ -0,0 +1,183 @@
+""" Tests for chunk execution cache
+"""
+
+import json
+import os
+import os.path as op
+import subprocess
+import sys
+import threading
+
+import numpy as np
+
+HERE = op.dirname(__file__)
+SOURCE = op.join(HERE, '..', 'source')
+sys.path.append(SOURCE)
+
+import chunk_cache as cc
+
+
+def test_chunk_key(tmp_path):
+    (tmp_path / 'data').mkdir()
+    (tmp_path / 'data' / 'gains.csv').write_text('gain\n31\n34\n')
+    (tmp_path / 'helper.py').write_text('X = 1\n')
+    code = ("import numpy as np\nimport helper\n"
+            "df = pd.read_csv('data/gains.csv')\nopen('data/none.csv')")
+    assert cc.input_files(code, tmp_path) == [
+        tmp_path / 'data' / 'gains.csv', tmp_path / 'helper.py']
+    key = cc.chunk_key(code, 'prev', 1014, tmp_path)
+    assert key == cc.chunk_key(code, 'prev', 1014, tmp_path)
+    assert key != cc.chunk_key(code + ' ', 'prev', 1014, tmp_path)
+    assert key != cc.chunk_key(code, 'other', 1014, tmp_path)
+    assert key != cc.chunk_key(code, 'prev', 1015, tmp_path)
+    (tmp_path / 'data' / 'gains.csv').write_text('gain\n31\n')
+    assert key != cc.chunk_key(code, 'prev', 1014, tmp_path)
+    new_key = cc.chunk_key(code, 'prev', 1014, tmp_path)
+    (tmp_path / 'helper.py').write_text('X = 2\n')
+    assert new_key != cc.chunk_key(code, 'prev', 1014, tmp_path)
+
+
+def test_input_files_follow(tmp_path):
+    data = tmp_path / 'data'
+    data.mkdir()
+    (data / 'prices.csv').write_text('price\n1\n')
+    (data / 'cholost.csv').write_text('z\n1\n')
+    (data / '__init__.py').write_text('')
+    (tmp_path / 'prices.py').write_text(
+        'def load():\n    import data\n    return data.prices\n')
+    pkg = tmp_path / 'pkg'
+    pkg.mkdir()
+    (pkg / '__init__.py').write_text('')
+    (pkg / 'sub.py').write_text('from prices import load\n')
+    assert cc.input_files("x = Path('data') / 'cholost.csv'", tmp_path) == [
+        data / 'cholost.csv']
+    code = 'from pkg import sub\nx = sub.load()'
+    assert cc.input_files(code, tmp_path) == [
+        pkg / '__init__.py', pkg / 'sub.py', tmp_path / 'prices.py',
+        data / 'prices.csv', data / '__init__.py']
+    # Editing data read through the helper module misses the cache.
+    cache = cc.ChunkCache(tmp_path / 'cache')
+    key = cc.chunk_key(code, root=tmp_path)
+    cache.put(key, 'out', code)
+    assert cache.get(key) == 'out'
+    (data / 'prices.csv').write_text('price\n2\n')
+    new_key = cc.chunk_key(code, root=tmp_path)
+    assert new_key != key
+    assert cache.get(new_key) is None
+    # As does editing the package.
+    (pkg / 'sub.py').write_text('from prices import load\n\n')
+    assert cc.chunk_key(code, root=tmp_path) != new_key
+
+
+def test_put_get_restore(tmp_path):
+    cache = cc.ChunkCache(tmp_path / 'cache')
+    (tmp_path / 'figs').mkdir()
+    (tmp_path / 'figs' / 'plot-1.png').write_bytes(b'png')
+    ns = {}
+    code1 = 'import numpy as np\nresults = np.arange(3)\n_hidden = 1'
+    exec(code1, ns)
+    cache.put('k1', 'out 1', code1, ['figs/plot-1.png'], ns, 'ch.Rmd',
+              root=tmp_path)
+    code2 = 'def f(x):\n    return x + 1\ny = f(results)'
+    exec(code2, ns)
+    cache.put('k2', 'out 2', code2, [], ns, 'ch.Rmd', root=tmp_path)
+    assert cache.get('missing', root=tmp_path) is None
+    (tmp_path / 'figs' / 'plot-1.png').unlink()
+    assert cache.get('k1', root=tmp_path) == 'out 1'
+    assert (tmp_path / 'figs' / 'plot-1.png').read_bytes() == b'png'
+    # State restored from snapshot.
+    new_ns = {}
+    cache.restore(['k1'], new_ns)
+    assert sorted(n for n in new_ns if n != '__builtins__') == [
+        'np', 'results']
+    assert np.all(new_ns['results'] == [0, 1, 2])
+    # Function could not be saved, so we re-run its definition.
+    new_ns = {}
+    cache.restore(['k1', 'k2'], new_ns)
+    assert new_ns['f'](1) == 2
+    assert np.all(new_ns['y'] == [1, 2, 3])
+    assert new_ns['np'] is np
+    # Function bound by assignment; we have to re-run the code.
+    code3 = 'g = lambda x: x * 2\nz = g(y)'
+    exec(code3, ns)
+    cache.put('k3', 'out 3', code3, [], ns, 'ch.Rmd', root=tmp_path)
+    new_ns = {}
+    cache.restore(['k1', 'k2', 'k3'], new_ns)
+    assert new_ns['g'](2) == 4
+    assert np.all(new_ns['z'] == [2, 4, 6])
+
+
+def test_restore_no_rerun(tmp_path):
+    calls = []
+
+    def simulate(n):
+        calls.append(n)
+        return np.arange(n)
+
+    def helper(x):
+        return x
+    # As after running _common.py.
+    baseline = {'simulate': simulate, 'helper': helper}
+    cache = cc.ChunkCache(tmp_path, baseline=baseline)
+    ns = dict(baseline, __name__='__main__')
+    code = ('import numpy as np\n'
+            'def double(x):\n    return 2 * x\n'
+            'results = simulate(10_000)')
+    exec(code, ns)
+    cache.put('k1', 'out', code, [], ns)
+    assert json.loads((tmp_path / 'k1' / 'meta.json').read_text())[
+        'unsaved'] == ['double']
+    new_ns = dict(baseline, __name__='__main__')
+    cache.restore(['k1'], new_ns)
+    # We did not run the costly simulation again.
+    assert calls == [10_000]
+    assert np.all(new_ns['results'] == np.arange(10_000))
+    assert new_ns['double'](2) == 4
+
+
+def test_prune_clear(tmp_path):
+    cache = cc.ChunkCache(tmp_path, max_bytes=10 ** 6)
+    big = 'x' * 1000
+    for i, chapter in enumerate(['a.Rmd', 'a.Rmd', 'b.Rmd']):
+        cache.put(f'k{i}', big, '', chapter=chapter)
+        entry = tmp_path / f'k{i}' / 'meta.json'
+        os.utime(entry, (i, i))
+    assert len(cache.entries()) == 3
+    # Using entry makes it most recent.
+    cache.get('k0')
+    cache.prune(2500)
+    assert sorted(e[0] for e in cache.entries()) == ['k0', 'k2']
+    cache.clear(['a.Rmd'])
+    assert [e[0] for e in cache.entries()] == ['k2']
+    cache.clear()
+    assert cache.entries() == []
+
+
+def test_shared_cache(tmp_path):
+    # Cache directory from environment, as for render copies.
+    env = {**os.environ, 'CHUNK_CACHE_DIR': str(tmp_path / 'shared')}
+    code = 'import chunk_cache; print(chunk_cache.CACHE_DIR)'
+    out = subprocess.run([sys.executable, '-c', code], cwd=SOURCE, env=env,
+                         capture_output=True, text=True, check=True)
+    assert out.stdout.strip() == str(tmp_path / 'shared')
+    # Writers and pruners at the same time.
+    cache = cc.ChunkCache(tmp_path / 'shared', max_bytes=20_000)
+    errors = []
+
+    def work(i):
+        try:
+            for j in range(30):
+                key = f'k{(i + j) % 12}'
+                cache.put(key, 'x' * 1000, '', chapter='ch.Rmd')
+                assert cache.get(key) in (None, 'x' * 1000)
+                cache.prune()
+        except Exception as err:
+            errors.append(err)
+
+    threads = [threading.Thread(target=work, args=(i,)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert sum(e[1] for e in cache.entries()) <= 20_000
@@ -0,0 +1,78 @@
+""" Tests for bootstrap confidence intervals
+"""
+
+import os.path as op
+import sys
+
+import numpy as np
+import pytest
+
+HERE = op.dirname(__file__)
+SOURCE = op.join(HERE, '..', 'source')
+sys.path.append(SOURCE)
+
+import resampling as rs
+
+GAINS = np.array([31, 34, 29, 26, 32, 35, 38, 34, 31, 29, 32, 30])
+
+
+def _slow_jackknife(x, func):
+    return np.array([func(np.delete(x, i)) for i in range(len(x))])
+
+
+def test_jackknife():
+    for name in ('mean', 'sum', 'median', 'std'):
+        func = rs.confidence.STATISTICS[name]
+        assert np.allclose(rs.jackknife(GAINS, name),
+                           _slow_jackknife(GAINS, func))
+    # Two groups.
+    a, b = GAINS[:5], GAINS[5:]
+
+    def mean_diff(x, y, axis):
+        return np.mean(x, axis=axis) - np.mean(y, axis=axis)
+
+    expected = np.concatenate([
+        _slow_jackknife(a, np.mean) - np.mean(b),
+        np.mean(a) - _slow_jackknife(b, np.mean)])
+    assert np.allclose(rs.jackknife((a, b), mean_diff), expected)
+
+
+def test_shared_resamples():
+    stats = {'mean': 'mean', 'median': np.median,
+             'trimmed': lambda x, axis: np.mean(np.sort(x, axis=axis)[:, 2:-2],
+                                                axis=axis)}
+    values = rs.bootstrap_stats(GAINS, stats, 1000, rng=1)
+    # Same resamples as kernels bootstrap.
+    assert np.allclose(values['mean'],
+                       rs.bootstrap(GAINS, np.mean, 1000, rng=1))
+    assert np.allclose(values['median'],
+                       rs.bootstrap(GAINS, np.median, 1000, rng=1))
+    # Block size does not change results.
+    small = rs.bootstrap_stats(GAINS, stats, 1000, rng=1, max_elements=100)
+    for name in stats:
+        assert np.allclose(small[name], values[name])
+    with pytest.raises(ValueError):
+        rs.bootstrap_stats(GAINS, {'x': 'mode'}, 10)
+    with pytest.raises(ValueError):
+        rs.bootstrap_stats((GAINS, GAINS), {'x': 'mean'}, 10)
+
+
+def test_intervals():
+    res = rs.bootstrap_ci(GAINS, 'mean', 10_000, rng=2)
+    assert np.isclose(res.observed, np.mean(GAINS))
+    assert np.allclose(res.interval(),
+                       np.percentile(res.values, [2.5, 97.5]))
+    p_low, p_high = res.interval('percentile', 0.9)
+    b_low, b_high = res.interval('basic', 0.9)
+    assert np.isclose(b_low, 2 * res.observed - p_high)
+    assert np.isclose(b_high, 2 * res.observed - p_low)
+    # BCa with zero bias and acceleration is the percentile interval.
+    sym = rs.BootstrapResult(0., np.linspace(-1, 1, 1001), np.zeros(5))
+    assert np.allclose(sym.interval('bca'), sym.interval('percentile'))
+    # Skewed data; BCa shifts interval right compared to percentile.
+    skewed = np.random.default_rng(3).exponential(size=40)
+    res = rs.bootstrap_ci(skewed, 'mean', 10_000, rng=4)
+    assert res.acceleration > 0
+    assert res.interval('bca')[1] > res.interval('percentile')[1]
+    with pytest.raises(ValueError):
+        res.interval('studentized')
@@ -0,0 +1,68 @@
+""" Tests for correlation permutation tests and bootstrap
+"""
+
+import os.path as op
+import sys
+
+import numpy as np
+import pytest
+
+HERE = op.dirname(__file__)
+SOURCE = op.join(HERE, '..', 'source')
+sys.path.append(SOURCE)
+
+import resampling as rs
+
+ATH = np.array([97, 94, 93, 90, 87, 86, 86, 85, 81, 76, 74, 73])
+IQ = np.array([114, 120, 107, 113, 118, 101, 109, 110, 100, 99, 103, 105])
+
+
+def test_permuted_sum_products():
+    # Same shuffles as the kernels.
+    sums = rs.permuted_sum_products(ATH, IQ, 1000, rng=1)
+    shuffled = rs.shuffle_indices(len(IQ), 1000, rng=1)
+    assert np.allclose(sums, [np.sum(ATH * IQ[inds]) for inds in shuffled])
+    # Same results with small blocks.
+    assert np.allclose(
+        rs.permuted_sum_products(ATH, IQ, 1000, rng=1, max_elements=100),
+        sums)
+
+
+def test_permutation_correlation():
+    res = rs.permutation_correlation(ATH, IQ, rng=2)
+    assert np.isclose(res.observed, np.corrcoef(ATH, IQ)[0, 1])
+    # Null correlations from the same shuffles.
+    shuffled = IQ[rs.shuffle_indices(len(IQ), 10_000, rng=2)]
+    fake_r = [np.corrcoef(ATH, s)[0, 1] for s in shuffled]
+    assert np.isclose(res.p_value, np.mean(fake_r >= res.observed - 1e-9))
+    # Slope and sum of products give the same p value.
+    for statistic in ('slope', 'sum_products', 'r'):
+        other = rs.permutation_correlation(ATH, IQ, statistic, rng=2)
+        assert other.p_value == res.p_value
+        for alt in ('less', 'two-sided'):
+            assert np.isclose(other.proportion(alt), res.proportion(alt))
+    slope = rs.permutation_correlation(ATH, IQ, 'slope', rng=2)
+    assert np.isclose(slope.observed, np.polyfit(ATH, IQ, 1)[0])
+    with pytest.raises(ValueError):
+        rs.permutation_correlation(ATH, IQ, 'spearman')
+    with pytest.raises(ValueError):
+        rs.permutation_correlation(ATH, IQ[:-1])
+
+
+def test_bootstrap_correlation():
+    n = len(ATH)
+    inds = np.random.default_rng(3).integers(0, n, size=(1000, n))
+    for statistic, func in (
+            ('r', lambda x, y: np.corrcoef(x, y)[0, 1]),
+            ('slope', lambda x, y: np.polyfit(x, y, 1)[0])):
+        values, (low, high) = rs.bootstrap_correlation(
+            ATH, IQ, statistic, 1000, rng=3)
+        expected = np.array([func(ATH[i], IQ[i]) for i in inds])
+        assert np.allclose(values, expected)
+        assert np.isclose(low, np.percentile(expected, 2.5))
+        assert np.isclose(high, np.percentile(expected, 97.5))
+    # Resamples with all x equal give NaN.
+    values, interval = rs.bootstrap_correlation([1, 1, 1, 2], [1, 2, 3, 4],
+                                                'slope', 1000, rng=4)
+    assert np.any(np.isnan(values))
+    assert np.all(np.isfinite(interval))
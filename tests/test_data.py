@@ -0,0 +1,67 @@
+""" Tests for cached dataset loader
+"""
+
+import os.path as op
+import sys
+
+import numpy as np
+import pytest
+
+HERE = op.dirname(__file__)
+SOURCE = op.join(HERE, '..', 'source')
+sys.path.append(SOURCE)
+
+import data
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(data, 'HERE', tmp_path)
+    monkeypatch.setattr(data, 'CACHE_DIR', tmp_path / '_cache')
+    monkeypatch.setattr(data, '_TABLES', {})
+    monkeypatch.setitem(data.SCHEMAS, 'families', {'family': 'str'})
+    (tmp_path / 'families.csv').write_text(
+        'family,father,mother\n001,78.5,67.0\n002,75.5,66.5\n')
+    return tmp_path
+
+
+def test_load(data_dir):
+    assert data.names() == ['families']
+    table = data.families
+    assert table.columns == ['family', 'father', 'mother']
+    assert len(table) == 2
+    assert table['family'].tolist() == ['001', '002']
+    assert isinstance(table['father'], np.memmap)
+    assert np.all(table['father'] == [78.5, 75.5])
+    with pytest.raises(ValueError):
+        table['father'][0] = 1
+    # Same table on next access.
+    assert data.load('families') is table
+    df = table.to_frame()
+    assert list(df['mother']) == [67.0, 66.5]
+    uncached = data.load('families', use_cache=False)
+    assert not isinstance(uncached['father'], np.memmap)
+    with pytest.raises(AttributeError):
+        data.no_such_dataset
+    with pytest.raises(ValueError):
+        data.load('no_such_dataset')
+
+
+def test_cache(data_dir, monkeypatch):
+    data.load('families')
+    caches = list((data_dir / '_cache').glob('families-*'))
+    assert len(caches) == 1
+    # Loading in a new process reads cache without parsing.
+    parse = data._parse
+    data._TABLES.clear()
+    monkeypatch.setattr(data, '_parse', None)
+    assert data.load('families')['father'][0] == 78.5
+    # Changing CSV invalidates cache.
+    monkeypatch.setattr(data, '_parse', parse)
+    data._TABLES.clear()
+    (data_dir / 'families.csv').write_text(
+        'family,father,mother\n001,70.0,67.0\n')
+    assert data.load('families')['father'].tolist() == [70.0]
+    new_caches = list((data_dir / '_cache').glob('families-*'))
+    assert len(new_caches) == 1
+    assert new_caches != caches
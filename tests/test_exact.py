@@ -0,0 +1,104 @@
+""" Tests for exact permutation tests and distributions
+"""
+
+import os.path as op
+import sys
+from itertools import combinations
+from math import comb
+
+import numpy as np
+
+import pytest
+
+HERE = op.dirname(__file__)
+SOURCE = op.join(HERE, '..', 'source')
+sys.path.append(SOURCE)
+
+import resampling as rs
+from resampling import permutation as rsp
+
+TREATMT = [94, 38, 23, 197, 99, 16, 141]
+CONTROL = [52, 10, 40, 104, 51, 27, 146, 30, 46]
+
+
+def _mean_diff(rows, axis):
+    return np.mean(rows[:, :7], axis=axis) - np.mean(rows[:, 7:], axis=axis)
+
+
+def test_subset_sum_counts():
+    vals = np.array([3, 1, 4, 1, 5, 9, 2, 6])
+    sums, counts = rsp.subset_sum_counts(vals, 3)
+    brute = np.array([sum(c) for c in combinations(vals, 3)])
+    b_sums, b_counts = np.unique(brute, return_counts=True)
+    assert np.all(sums == b_sums)
+    assert np.all(counts == b_counts)
+
+
+def test_as_integers():
+    ints, scale = rsp.as_integers([6.9, 7.65, 5])
+    assert scale == 100
+    assert np.all(ints == [690, 765, 500])
+    assert rsp.as_integers([np.pi])[0] is None
+
+
+def test_iq_ranks():
+    res = rs.permutation_test(np.arange(1, 11), 5, observed=17)
+    assert res.exact and res.method == 'subset-sum'
+    assert res.n == 252
+    assert res.p_value == 4 / 252
+
+
+def test_methods_agree():
+    data = np.array(TREATMT + CONTROL)
+    ss = rs.permutation_test(data, 7, 'mean_diff', 'greater')
+    en = rs.permutation_test(data, 7, _mean_diff, 'greater')
+    assert (ss.method, en.method) == ('subset-sum', 'enumerate')
+    assert np.isclose(ss.observed, en.observed)
+    assert np.isclose(ss.p_value, en.p_value)
+    assert np.isclose(ss.proportion('two-sided'),
+                      en.proportion('two-sided'))
+    mc = rs.permutation_test(data, 7, _mean_diff, 'greater',
+                             enumerate_limit=100, n_trials=20_000, rng=0)
+    assert mc.method == 'monte-carlo' and not mc.exact
+    assert mc.n == 20_000
+    assert abs(mc.p_value - en.p_value) < 0.015
+    with pytest.raises(ValueError):
+        rs.permutation_test(data, 7, 'median')
+
+
+def test_sum_pmf():
+    die = np.arange(1, 7)
+    two = rs.sum_pmf(die, 2)
+    assert np.all(two.values == np.arange(2, 13))
+    assert np.isclose(two.prob(7), 1 / 6)
+    one = rs.sum_pmf(die, 1)
+    assert np.allclose((one + one).probs, two.probs)
+    # Integer and general routes agree.
+    deck = np.repeat([1, 2, 3, 4, 0], [4, 4, 4, 4, 36])
+    pmf = rs.sum_pmf(deck, 13, replace=False)
+    labels, comps, probs = rs.composition_pmf(deck, 13)
+    general = rs.PMF(comps @ labels, probs)
+    assert np.all(pmf.values == general.values)
+    assert np.allclose(pmf.probs, general.probs)
+    assert np.isclose(np.sum(pmf.probs), 1)
+    assert np.isclose(pmf.mean, 13 * 40 / 52)
+    # Non-integer values.
+    half = rs.sum_pmf([0.5, 1.5, 2], 2, replace=False)
+    assert np.allclose(half.values, [2, 2.5, 3.5])
+
+
+def test_count_pmf():
+    coin = ['heads', 'tails']
+    pmf = rs.count_pmf(coin, 20, 'tails', replace=True)
+    assert np.all(pmf.values == np.arange(21))
+    assert np.isclose(pmf.prob(10), comb(20, 10) / 2 ** 20)
+    assert np.isclose(pmf.proportion('>=', 14) + pmf.proportion('<=', 6),
+                      2 * sum(comb(20, k) for k in range(14, 21)) / 2 ** 20)
+    whole_class = np.repeat(['girl', 'boy'], [25, 25])
+    girls = rs.count_pmf(whole_class, 5, 'girl')
+    assert np.isclose(girls.prob(4), comb(25, 4) * 25 / comb(50, 5))
+    # Check against simulation.
+    sim = rs.shuffle(whole_class == 'girl', np.sum, 20_000, size=5, rng=0)
+    assert abs(np.mean(sim == 4) - girls.prob(4)) < 0.01
+    with pytest.raises(ValueError):
+        rs.count_pmf(whole_class, 51, 'girl')
@@ -0,0 +1,81 @@
+""" Tests for fused noteout filter runner
+"""
+
+import io
+import os.path as op
+import sys
+
+import pytest
+
+pf = pytest.importorskip('panflute')
+
+HERE = op.dirname(__file__)
+sys.path.append(op.join(HERE, '..', 'source', 'filters'))
+
+import run_noteout as rn
+
+# Two filters, where the second depends on the output of the first.
+FILTERS = {
+    'upper': '''
+import panflute as pf
+
+def action(elem, doc):
+    if isinstance(elem, pf.Str):
+        return pf.Str(elem.text.upper())
+
+def main(doc=None):
+    return pf.run_filter(action, doc=doc)
+''',
+    'drop_spam': '''
+import panflute as pf
+
+def action(elem, doc):
+    if isinstance(elem, pf.Str) and elem.text == 'SPAM':
+        return []
+
+def main(doc=None):
+    return pf.run_filter(action, doc=doc)
+'''}
+
+
+@pytest.fixture
+def filters_package(tmp_path, monkeypatch):
+    pkg = tmp_path / 'fake_noteout'
+    pkg.mkdir()
+    (pkg / '__init__.py').write_text('')
+    for name, code in FILTERS.items():
+        (pkg / f'{name}.py').write_text(code)
+    monkeypatch.syspath_prepend(str(tmp_path))
+    return 'fake_noteout'
+
+
+def _doc():
+    return pf.Doc(pf.Para(pf.Str('eggs'), pf.Space(), pf.Str('spam')))
+
+
+def _json(doc):
+    out = io.StringIO()
+    pf.dump(doc, out)
+    return out.getvalue()
+
+
+def test_run_pipeline(filters_package):
+    doc = rn.run_pipeline(['upper', 'drop_spam'], _doc(), filters_package)
+    assert pf.stringify(doc).strip() == 'EGGS'
+    # Same as running filters one by one, through JSON.
+    doc = _doc()
+    for name in ('upper', 'drop_spam'):
+        doc = pf.load(io.StringIO(_json(doc)))
+        doc = rn.run_pipeline([name], doc, filters_package)
+    assert _json(doc) == _json(
+        rn.run_pipeline(['upper', 'drop_spam'], _doc(), filters_package))
+    # Order matters.
+    doc = rn.run_pipeline(['drop_spam', 'upper'], _doc(), filters_package)
+    assert pf.stringify(doc).strip() == 'EGGS SPAM'
+
+
+def test_pipelines():
+    assert rn.PIPELINES['noteout_pre'] == ['filter_pre', 'filter_divspans']
+    for name in rn.PIPELINES:
+        assert op.islink(op.join(HERE, '..', 'source', 'filters',
+                                 f'{name}.py'))
@@ -0,0 +1,120 @@
+""" Test book helper modules import lazily
+"""
+
+import os.path as op
+import subprocess
+import sys
+
+import numpy as np
+
+HERE = op.dirname(__file__)
+SOURCE = op.join(HERE, '..', 'source')
+SCRIPTS = op.join(HERE, '..', 'scripts')
+sys.path.append(SOURCE)
+sys.path.append(SCRIPTS)
+
+import import_budget as ib
+
+
+def _imported(code):
+    # Names of modules imported after running `code` in fresh interpreter.
+    proc = subprocess.run(
+        [sys.executable, '-c', code + '\nimport sys; print(*sys.modules)'],
+        cwd=SOURCE, capture_output=True, text=True, check=True)
+    return set(proc.stdout.split())
+
+
+def test_lazy_imports():
+    for module in ('liquor_analysis', 'gridtabber', 'data'):
+        imported = _imported(f'import {module}')
+        assert 'pandas' not in imported
+        assert 'matplotlib' not in imported
+    imported = _imported('_QUARTO_SEED = 1014\n'
+                         'exec(open("_common.py").read())')
+    assert 'resampling' not in imported
+    imported = _imported('import resampling')
+    assert not [m for m in imported if m.startswith('resampling.')]
+    imported = _imported('import resampling as rs\n'
+                         'from resampling.sweep import grid_points\n'
+                         'assert callable(rs.sweep)')
+    assert 'resampling.sweep' in imported
+
+
+def test_gridtabber_warnings():
+    import warnings
+    import gridtabber
+    assert not any(f[0] == 'error' and f[2] is Warning
+                   for f in warnings.filters)
+
+
+def test_liquor_prices():
+    import liquor_analysis as la
+    assert len(la.GOVT) > 0 and len(la.PRIV) > 0
+    assert np.mean(la.PRIV) > np.mean(la.GOVT)
+
+
+def test_parse_importtime():
+    stderr = '\n'.join([
+        'import time: self [us] | cumulative | imported package',
+        'import time:       120 |        120 |   _io',
+        'import time:       300 |        900 | foo',
+        'not a timing line'])
+    assert ib.parse_importtime(stderr) == [('_io', 120, 120, 1),
+                                           ('foo', 300, 900, 0)]
+    assert ib.parse_budgets(['data=10'])['data'] == 10
+
+
+def _common_ns():
+    # Namespace after running _common.py, as notebooks and reticulate do.
+    ns = {'_QUARTO_SEED': 1014}
+    default_rng = np.random.default_rng
+    try:
+        with open(op.join(SOURCE, '_common.py')) as fobj:
+            exec(fobj.read(), ns)
+    finally:
+        np.random.default_rng = default_rng
+    return ns
+
+
+def test_var_token():
+    ns = _common_ns()
+    token = ns['_var_token']
+    ns['results'] = np.zeros(1000)
+    ns['when'] = np.array(['2024-01-01'], dtype='M8[D]')
+    ns['n'] = 10
+    first = token('results')
+    assert first == token('results')
+    ns['results'][-1] = 1
+    assert token('results') != first
+    # New array with same values.
+    ns['results'] = ns['results'].copy()
+    assert token('results') != first
+    assert token('when') is not None
+    assert token('n') is None
+    assert token('missing') is None
+    assert ns['get_var']('n') == 10
+
+
+class FakeR:
+    # Stands in for reticulate's ``r``; ``._to_py`` returns views of
+    # "R memory", as in _common.R.
+
+    def __init__(self, **variables):
+        self.variables = variables
+
+    def __getattr__(self, name):
+        if name != '._to_py':
+            raise AttributeError(name)
+        return lambda var_name: self.variables[var_name]
+
+
+def test_get_var_copy():
+    ns = _common_ns()
+    r_memory = np.arange(10.)
+    ns['r'] = FakeR(heights=r_memory)
+    heights = ns['get_var']('heights')
+    heights[0] = 99
+    assert r_memory[0] == 0
+    view = ns['get_var']('heights', copy=False)
+    view[0] = 99
+    assert r_memory[0] == 99
@@ -0,0 +1,80 @@
+""" Tests for postprocess_site script
+"""
+
+import os.path as op
+import sys
+
+HERE = op.dirname(__file__)
+SCRIPTS = op.join(HERE, '..', 'scripts')
+sys.path.append(SCRIPTS)
+
+import postprocess_site as ps
+
+VARS = {'lang': 'Python', 'other': 'R'}
+
+
+def test_substitute():
+    assert ps.substitute(b'No vars', VARS) == b'No vars'
+    assert (ps.substitute(b'{{< var lang >}} and {{&lt; var other &gt;}}',
+                          VARS) == b'Python and R')
+    text = 'ñ {{< var lang >}} ñ'.encode()
+    assert ps.substitute(text, VARS) == 'ñ Python ñ'.encode()
+
+
+def test_stream(tmp_path):
+    parts = ['ñandú {{< var lang >}} ', '{{ not a var }} ',
+             '{{&lt; var other &gt;}}']
+    contents = ''.join(parts * 50)
+    expected = ps.substitute(contents.encode(), VARS)
+    path = tmp_path / 'search.json'
+    for block_bytes in (7, 64, 300, 10_000):
+        path.write_text(contents)
+        digest = ps.process_file(path, VARS, block_bytes)
+        assert path.read_bytes() == expected
+        assert digest == ps._file_hash(path)
+    assert [p.name for p in tmp_path.iterdir()] == ['search.json']
+
+
+def test_stream_boundaries(tmp_path):
+    # Block boundary at every position in, and around, a reference.
+    block_bytes = 64
+    path = tmp_path / 'search.json'
+    for ref in ('{{< var lang >}}', '{{&lt; var other &gt;}}'):
+        for offset in range(len(ref) + 1):
+            contents = ('x' * (block_bytes - offset) + ref + ' ' +
+                        'y' * block_bytes)
+            path.write_text(contents)
+            ps.process_file(path, VARS, block_bytes)
+            assert path.read_bytes() == ps.substitute(contents.encode(),
+                                                      VARS)
+            assert '{{' not in path.read_text()
+
+
+def test_postprocess_site(tmp_path):
+    site = tmp_path / 'python-book'
+    (site / 'sub' / 'deeper').mkdir(parents=True)
+    (site / 'index.html').write_text('<p>{{< var lang >}}</p>')
+    (site / 'sub' / 'deeper' / 'page.html').write_text(
+        '<p>{{&lt; var other &gt;}}</p>')
+    (site / 'sub' / 'search.json').write_text('{"x": "plain"}')
+    (site / 'style.css').write_text('{{< var lang >}}')
+    processed = ps.postprocess_site(site, VARS, n_workers=2)
+    assert len(processed) == 3
+    assert (site / 'index.html').read_text() == '<p>Python</p>'
+    assert ((site / 'sub' / 'deeper' / 'page.html').read_text() ==
+            '<p>R</p>')
+    assert (site / 'style.css').read_text() == '{{< var lang >}}'
+    # Nothing to do second time.
+    assert ps.postprocess_site(site, VARS, n_workers=1) == []
+    # Same contents, new modification time; still nothing to do.
+    (site / 'index.html').write_text('<p>Python</p>')
+    assert ps.postprocess_site(site, VARS, n_workers=1) == []
+    (site / 'index.html').write_text('<p>{{< var other >}}</p>')
+    assert ps.postprocess_site(site, VARS) == [site / 'index.html']
+    assert (site / 'index.html').read_text() == '<p>R</p>'
+    # Changing variables checks all files again.
+    assert len(ps.postprocess_site(site, {'lang': 'R'})) == 3
+    # The manifest is not in the published site.
+    assert not [p for p in site.rglob('*') if 'postprocess' in p.name]
+    assert ps.manifest_path_for(site).is_file()
+    assert ps.manifest_path_for(site).parent == tmp_path.resolve()
@@ -0,0 +1,135 @@
+""" Tests for dataset registry
+"""
+
+from functools import partial
+from http.server import HTTPServer, SimpleHTTPRequestHandler
+import json
+import os.path as op
+import sys
+import threading
+
+import pytest
+
+HERE = op.dirname(__file__)
+DATA = op.join(HERE, '..', 'source', 'data')
+sys.path.append(DATA)
+
+import registry as rg
+
+RECIPE = '''\
+import sys
+from pathlib import Path
+Path('doubled.txt').write_text(Path(sys.argv[1]).read_text() * 2)
+'''
+
+
+@pytest.fixture
+def server(tmp_path):
+    # Local file server standing in for the remote datasets.
+    served = tmp_path / 'served'
+    served.mkdir()
+    handler = partial(SimpleHTTPRequestHandler, directory=str(served))
+    httpd = HTTPServer(('127.0.0.1', 0), handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield served, f'http://127.0.0.1:{httpd.server_port}'
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def make_registry(tmp_path, base_url, sha=None, fetcher=rg.fetch_url):
+    root = tmp_path / 'data'
+    root.mkdir(exist_ok=True)
+    (root / 'double.py').write_text(RECIPE)
+    manifest = {'doubled': {
+        'sources': {'words': {'url': f'{base_url}/words.txt',
+                              'sha256': sha}},
+        'recipe': 'double.py',
+        'outputs': ['doubled.txt']}}
+    (root / 'manifest.json').write_text(json.dumps(manifest))
+    return rg.Registry(root / 'manifest.json', fetcher=fetcher)
+
+
+def test_build(tmp_path, server):
+    served, base_url = server
+    (served / 'words.txt').write_text('spam ')
+    fetched = []
+
+    def fetcher(url):
+        fetched.append(url)
+        return rg.fetch_url(url)
+
+    reg = make_registry(tmp_path, base_url, fetcher=fetcher)
+    assert reg.build('doubled')
+    assert (reg.root / 'doubled.txt').read_text() == 'spam spam '
+    assert len(fetched) == 1
+    # Second build is a no-op, and works offline.
+    (served / 'words.txt').unlink()
+    assert not reg.build('doubled')
+    assert len(fetched) == 1
+    # Changing output, or recipe, rebuilds.
+    (reg.root / 'doubled.txt').write_text('eggs')
+    assert reg.build('doubled')
+    (reg.root / 'double.py').write_text(RECIPE + '\n')
+    assert reg.build('doubled')
+    assert not reg.build('doubled')
+    assert reg.build('doubled', force=True)
+    with pytest.raises(ValueError):
+        reg.build('no_such_dataset')
+
+
+def test_refresh(tmp_path, server):
+    served, base_url = server
+    (served / 'words.txt').write_text('spam ')
+    reg = make_registry(tmp_path, base_url)
+    digests = reg.refresh(pin=True)
+    digest = digests[('doubled', 'words')]
+    assert digest == rg.sha256(b'spam ')
+    manifest = json.loads(reg.manifest_path.read_text())
+    assert manifest['doubled']['sources']['words']['sha256'] == digest
+    assert reg.build('doubled')
+    # Changed remote contents now do not match pinned sha256.
+    (served / 'words.txt').write_text('eggs ')
+    with pytest.raises(ValueError):
+        reg.refresh()
+    # The cache still has the pinned contents.
+    assert not reg.build('doubled')
+    assert reg.source_path('doubled', 'words').read_text() == 'spam '
+
+
+def test_main_fetch_error(tmp_path, server, monkeypatch, capsys):
+    served, base_url = server
+    reg = make_registry(tmp_path, base_url)
+    monkeypatch.setattr(rg, 'Registry', lambda **kwargs: reg)
+    # No words.txt on the server, so fetching gives an HTTP error.
+    for args in (['--refresh'], []):
+        monkeypatch.setattr(sys, 'argv', ['registry.py'] + args)
+        with pytest.raises(SystemExit) as excinfo:
+            rg.main()
+        assert excinfo.value.code == 1
+        assert 'failed' in capsys.readouterr().out
+
+
+def test_book_files(tmp_path, monkeypatch):
+    root = tmp_path / 'data'
+    root.mkdir()
+    (root / 'copy.py').write_text(
+        'import sys, shutil\nshutil.copy(sys.argv[1], "paper.txt")\n')
+    manifest = {'paper': {
+        'sources': {'pdf': {'path': '${book_files}/paper.pdf',
+                            'sha256': None}},
+        'recipe': 'copy.py',
+        'outputs': ['paper.txt']}}
+    (root / 'manifest.json').write_text(json.dumps(manifest))
+    book_files = tmp_path / 'elsewhere'
+    book_files.mkdir()
+    (book_files / 'paper.pdf').write_text('paper')
+    monkeypatch.delenv(rg.BOOK_FILES_VAR, raising=False)
+    with pytest.raises(ValueError):
+        rg.Registry(root / 'manifest.json').source_path('paper', 'pdf')
+    reg = rg.Registry(root / 'manifest.json', book_files=book_files)
+    assert reg.source_path('paper', 'pdf') == book_files / 'paper.pdf'
+    monkeypatch.setenv(rg.BOOK_FILES_VAR, str(book_files))
+    reg = rg.Registry(root / 'manifest.json')
+    assert reg.build('paper')
+    assert (root / 'paper.txt').read_text() == 'paper'
@@ -0,0 +1,74 @@
+""" Tests for rejection sampling
+"""
+
+import os.path as op
+import sys
+
+import numpy as np
+import pytest
+
+HERE = op.dirname(__file__)
+SOURCE = op.join(HERE, '..', 'source')
+sys.path.append(SOURCE)
+
+import resampling as rs
+
+
+def _prior(rng, n):
+    return rng.uniform(0, 1, size=n)
+
+
+def _simulate(rng, p):
+    return rng.binomial(20, p)
+
+
+def _prior_2d(rng, n):
+    # Means for two groups.
+    return rng.uniform(0, 10, size=(n, 2))
+
+
+def _simulate_2d(rng, params):
+    # Mean of 10 normal values for each group.
+    return rng.normal(params, 1 / np.sqrt(10))
+
+
+def test_exact():
+    res = rs.abc_sample(_prior, _simulate, 14, 5000, seed=1, n_workers=1,
+                        chunk_trials=10_000)
+    assert res.n_accepted == 5000
+    assert res.samples.shape == (5000,)
+    # Probability of exactly 14 with uniform prior is 1 / 21.
+    assert abs(res.acceptance_rate - 1 / 21) < 0.005
+    assert res.n_proposed % 10_000 == 0
+    # Beta(15, 7) posterior.
+    assert abs(np.mean(res.samples) - 15 / 22) < 0.01
+    # Same result for any number of workers.
+    for n_workers in (2, 3):
+        other = rs.abc_sample(_prior, _simulate, 14, 5000, seed=1,
+                              n_workers=n_workers, chunk_trials=10_000)
+        assert np.all(other.samples == res.samples)
+        assert other.n_proposed == res.n_proposed
+
+
+def test_tolerance():
+    observed = np.array([3, 7])
+    res = rs.abc_sample(_prior_2d, _simulate_2d, observed, 2000, tol=0.5,
+                        seed=2, n_workers=1, chunk_trials=20_000)
+    assert res.samples.shape == (2000, 2)
+    assert np.allclose(np.mean(res.samples, axis=0), observed, atol=0.1)
+    assert 0 < res.acceptance_rate < 0.1
+
+
+def test_merge_and_limit():
+    rng = np.random.default_rng(3)
+    first = rs.rejection.abc_chunk(_prior, _simulate, 14, None,
+                                   rs.rejection.distance, rng, 1000)
+    second = rs.rejection.abc_chunk(_prior, _simulate, 14, None,
+                                    rs.rejection.distance, rng, 1000)
+    n_acc = first.n_accepted + second.n_accepted
+    first.merge(second)
+    assert first.n_accepted == n_acc
+    assert first.n_proposed == 2000
+    with pytest.raises(RuntimeError):
+        rs.abc_sample(_prior, _simulate, 21, 10, seed=4, n_workers=1,
+                      chunk_trials=1000, max_trials=5000)
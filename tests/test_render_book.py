@@ -0,0 +1,153 @@
+""" Tests for parallel render scheduler
+"""
+
+import os
+import os.path as op
+import sys
+import threading
+import time
+
+import pytest
+import yaml
+
+HERE = op.dirname(__file__)
+sys.path.append(op.join(HERE, '..', 'scripts'))
+
+import render_book as rb
+
+
+def test_chapters():
+    chapters = rb.get_chapters()
+    assert chapters[0] == 'index.Rmd'
+    assert 'bayes_simulation.Rmd' in chapters
+
+
+def test_run_jobs():
+    jobs = rb.schedule([(lang, ch) for lang in ('python', 'r')
+                        for ch in 'abcd'], {'python:a': 0.2, 'r:a': 0.1})
+    assert jobs[-2:] == [('python', 'a'), ('r', 'a')]
+    lock = threading.Lock()
+    events = []
+    running = [0, 0]  # Now, maximum.
+
+    def run_chapter(lang, chapter):
+        with lock:
+            running[0] += 1
+            running[1] = max(running)
+            events.append((lang, chapter))
+        time.sleep(0.05)
+        with lock:
+            running[0] -= 1
+
+    def run_book(lang):
+        with lock:
+            events.append((lang, 'book'))
+
+    durations = rb.run_jobs(jobs, run_chapter, run_book, n_workers=4)
+    assert sorted(durations) == sorted(
+        [rb.job_name(*job) for job in jobs] + ['python:book', 'r:book'])
+    assert running[1] == 4
+    # Book after all chapters for each language.
+    for lang in ('python', 'r'):
+        book_at = events.index((lang, 'book'))
+        assert all(events.index(job) < book_at for job in jobs
+                   if job[0] == lang)
+
+
+def test_run_jobs_error():
+    started = []
+
+    def run_chapter(lang, chapter):
+        started.append(chapter)
+        if chapter == 'b':
+            raise RuntimeError('render failed')
+
+    with pytest.raises(RuntimeError):
+        rb.run_jobs([('r', ch) for ch in 'abcde'], run_chapter,
+                    lambda lang: started.append('book'), n_workers=1)
+    # We cancelled the jobs still waiting to start.
+    assert started == ['a', 'b']
+
+
+def test_sync_tree(tmp_path):
+    src, dst = tmp_path / 'src', tmp_path / 'dst'
+    (src / 'data').mkdir(parents=True)
+    (src / '.quarto').mkdir()
+    (src / 'data' / 'a.csv').write_text('a')
+    (src / 'ch.Rmd').write_text('text')
+    rb.sync_tree(src, dst)
+    assert (dst / 'data' / 'a.csv').read_text() == 'a'
+    assert not (dst / '.quarto').exists()
+    # Unchanged files not copied again.
+    os.utime(dst / 'ch.Rmd', (0, 0))
+    (dst / 'ch.Rmd').write_text('edit')
+    os.utime(dst / 'ch.Rmd', (0, os.stat(src / 'ch.Rmd').st_mtime))
+    rb.sync_tree(src, dst)
+    assert (dst / 'ch.Rmd').read_text() == 'edit'
+    (src / 'ch.Rmd').write_text('new text')
+    rb.sync_tree(src, dst)
+    assert (dst / 'ch.Rmd').read_text() == 'new text'
+    # Mirror deletions, but leave skipped names alone.
+    (dst / '.quarto').mkdir()
+    (src / 'data' / 'a.csv').unlink()
+    (src / 'ch.Rmd').unlink()
+    (src / 'ch.Rmd').mkdir()
+    (src / 'ch.Rmd' / 'f.txt').write_text('f')
+    rb.sync_tree(src, dst)
+    assert sorted(p.name for p in dst.iterdir()) == [
+        '.quarto', 'ch.Rmd', 'data']
+    assert list((dst / 'data').iterdir()) == []
+    assert (dst / 'ch.Rmd' / 'f.txt').read_text() == 'f'
+    (src / 'ch.Rmd' / 'f.txt').unlink()
+    (src / 'data').rmdir()
+    rb.sync_tree(src, dst)
+    assert sorted(p.name for p in dst.iterdir()) == ['.quarto', 'ch.Rmd']
+    assert list((dst / 'ch.Rmd').iterdir()) == []
+
+
+def test_workspace(tmp_path):
+    project = tmp_path / '_render-python'
+    project.mkdir()
+    config = {'project': {'type': 'book', 'output-dir': '../python-book'}}
+    (project / '_quarto-python.yml').write_text(yaml.safe_dump(config))
+    chapters = [f'ch{i}.Rmd' for i in range(8)]
+    for chapter in chapters:
+        (project / chapter).write_text(chapter)
+    workspace = rb.Workspace(project, '_quarto-python.yml', 3)
+    lock = threading.Lock()
+    in_use = set()
+
+    def render(chapter, copy_dir):
+        with lock:
+            # No other render in this copy.
+            assert copy_dir not in in_use
+            in_use.add(copy_dir)
+        config = yaml.safe_load((copy_dir / '_quarto-python.yml').read_text())
+        assert config['project']['output-dir'] == rb.CHAPTER_OUTPUT
+        stem = chapter[:-4]
+        frozen = copy_dir / '_freeze' / stem
+        frozen.mkdir(parents=True, exist_ok=True)
+        (frozen / 'html.json').write_text((copy_dir / chapter).read_text())
+        libs = copy_dir / '_freeze' / 'site_libs' / stem
+        libs.mkdir(parents=True, exist_ok=True)
+        (copy_dir / '.quarto').mkdir(exist_ok=True)
+        time.sleep(0.02)
+        with lock:
+            in_use.remove(copy_dir)
+
+    rb.run_jobs([('python', ch) for ch in chapters],
+                lambda lang, ch: workspace.run(
+                    ch, lambda copy_dir: render(ch, copy_dir)),
+                lambda lang: None, n_workers=3)
+    copies = sorted(p.name for p in tmp_path.iterdir())
+    assert copies == ['_render-python'] + [
+        f'_render-python-{i}' for i in range(3)]
+    for chapter in chapters:
+        stem = chapter[:-4]
+        frozen = project / '_freeze' / stem / 'html.json'
+        assert frozen.read_text() == chapter
+        assert (project / '_freeze' / 'site_libs' / stem).is_dir()
+    # Project files of the copies stay in the copies.
+    assert not (project / '.quarto').exists()
+    assert (project / '_quarto-python.yml').read_text() == yaml.safe_dump(
+        config)
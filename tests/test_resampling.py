@@ -0,0 +1,182 @@
+""" Tests for resampling kernels
+"""
+
+import os.path as op
+import sys
+from functools import partial
+
+import numpy as np
+import pytest
+
+HERE = op.dirname(__file__)
+SOURCE = op.join(HERE, '..', 'source')
+sys.path.append(SOURCE)
+
+import resampling as rs
+from resampling import parallel
+
+
+GAINS = np.array([31, 34, 29, 26, 32, 35, 38, 34, 31, 29, 32, 30])
+
+
+def test_trial_blocks():
+    assert list(rs.trial_blocks(10, 3, 9)) == [(0, 3), (3, 6), (6, 9),
+                                               (9, 10)]
+    assert list(rs.trial_blocks(2, 100, 10)) == [(0, 1), (1, 2)]
+    assert list(rs.trial_blocks(0, 3)) == []
+
+
+def test_indices():
+    inds = rs.bootstrap_indices(5, 100, rng=0)
+    assert inds.shape == (100, 5)
+    assert np.all((inds >= 0) & (inds < 5))
+    inds = rs.shuffle_indices(6, 50, rng=0)
+    assert np.all(np.sort(inds, axis=1) == np.arange(6))
+    inds = rs.shuffle_indices(10, 50, size=5, rng=0)
+    assert inds.shape == (50, 5)
+    assert np.all(np.diff(np.sort(inds, axis=1), axis=1) > 0)
+    with pytest.raises(ValueError):
+        rs.shuffle_indices(10, 50, size=5, method='bogus')
+
+
+def test_shuffle_methods():
+    # Each method gives uniform samples, in random order.
+    n, size, n_trials = 8, 3, 40_000
+    for method in ('fisher-yates', 'argpartition', 'permuted'):
+        inds = rs.shuffle_indices(n, n_trials, size, rng=2, method=method)
+        assert inds.shape == (n_trials, size)
+        assert np.all(np.diff(np.sort(inds, axis=1), axis=1) > 0)
+        # Each index equally likely at each position.
+        for col in inds.T:
+            props = np.bincount(col, minlength=n) / n_trials
+            assert np.allclose(props, 1 / n, atol=0.01)
+        # All ordered pairs in first two positions equally likely.
+        pairs = np.bincount(inds[:, 0] * n + inds[:, 1], minlength=n * n)
+        pairs = pairs.reshape(n, n)[~np.eye(n, dtype=bool)] / n_trials
+        assert np.allclose(pairs, 1 / (n * (n - 1)), atol=0.004)
+
+
+def test_category_counts():
+    deck = np.repeat(['club', 'diamond', 'heart', 'spade'], 13)
+    for replace in (False, True):
+        suits, counts = rs.category_counts(deck, 13, 20_000, replace, rng=3)
+        assert suits.tolist() == ['club', 'diamond', 'heart', 'spade']
+        assert np.all(np.sum(counts, axis=1) == 13)
+        assert np.allclose(np.mean(counts, axis=0), 13 / 4, atol=0.05)
+    labels, comps, probs = rs.composition_pmf(deck, 13)
+    # Probability of exactly 5 spades, from exact distribution.
+    p_5 = np.sum(probs[comps[:, 3] == 5])
+    suits, counts = rs.category_counts(deck, 13, 100_000, rng=4)
+    assert abs(np.mean(counts[:, 3] == 5) - p_5) < 0.005
+
+
+def test_bootstrap_shuffle():
+    means = rs.bootstrap(GAINS, np.mean, 1000, rng=1)
+    assert means.shape == (1000,)
+    assert np.all((means >= GAINS.min()) & (means <= GAINS.max()))
+    # Block size does not change the results.
+    assert np.all(rs.bootstrap(GAINS, np.mean, 1000, rng=1,
+                               max_elements=50) == means)
+    # Shuffles without size preserve the sum.
+    sums = rs.shuffle(GAINS, np.sum, 100, rng=1, dtype=int)
+    assert np.all(sums == np.sum(GAINS))
+    sums = rs.shuffle(np.arange(1, 11), np.sum, 1000, size=5, rng=1)
+    assert np.all((sums >= 15) & (sums <= 40))
+
+
+def test_default_rng():
+    # Default generator picked up at call time.
+    orig = np.random.default_rng
+    try:
+        np.random.default_rng = (lambda *args, **kwargs:
+                                 orig(*args, **kwargs) if (args or kwargs)
+                                 else orig(1014))
+        first = rs.bootstrap(GAINS, np.median, 100)
+        assert np.all(rs.bootstrap(GAINS, np.median, 100) == first)
+    finally:
+        np.random.default_rng = orig
+
+
+def _boot_means(rng, n):
+    return rs.bootstrap(GAINS, np.mean, n, rng=rng)
+
+
+def test_run_trials():
+    serial = rs.run_trials(_boot_means, 1050, seed=12, n_workers=1,
+                           chunk_trials=100)
+    assert serial.shape == (1050,)
+    # Same result whatever the number of workers.
+    for n_workers in (2, 3):
+        assert np.all(rs.run_trials(_boot_means, 1050, seed=12,
+                                    n_workers=n_workers,
+                                    chunk_trials=100) == serial)
+    assert np.any(rs.run_trials(_boot_means, 1050, seed=13, n_workers=1,
+                                chunk_trials=100) != serial)
+    outputs = rs.map_chunks(partial(_boot_means), 250, seed=12, n_workers=1,
+                            chunk_trials=100)
+    assert [len(o) for o in outputs] == [100, 100, 50]
+    assert parallel.chunk_sizes(200, 100) == [100, 100]
+
+
+def test_book_seed():
+    main = sys.modules['__main__']
+    assert rs.book_seed() is None
+    main._QUARTO_SEED = 1014
+    try:
+        assert rs.book_seed() == 1014
+        first = rs.run_trials(_boot_means, 200, n_workers=1)
+        assert np.all(rs.run_trials(_boot_means, 200, n_workers=1) == first)
+    finally:
+        del main._QUARTO_SEED
+
+
+def test_make_generator():
+    # Default configuration is NumPy default_rng.
+    assert np.all(rs.make_generator(1014).random(10) ==
+                  np.random.default_rng(1014).random(10))
+    for name in rs.rng.BIT_GENERATORS:
+        first = rs.make_generator(1014, name, 1000)
+        second = rs.make_generator(1014, name, 1000)
+        draws = [first.choice(['heads', 'tails'], size=20),
+                 first.integers(1, 7, size=(3, 2)),
+                 first.random(5)]
+        assert np.all(second.choice(['heads', 'tails'], size=20) == draws[0])
+        assert np.all(second.integers(1, 7, size=(3, 2)) == draws[1])
+        assert np.all(second.random(5) == draws[2])
+    with pytest.raises(ValueError):
+        rs.make_generator(1, 'RANDU')
+
+
+def test_buffered_generator():
+    rnd = rs.make_generator(1, 'SFC64', 1000)
+    assert rs.get_rng(rnd) is rnd
+    ints = np.concatenate([rnd.integers(1, 7, size=10) for i in range(5000)])
+    assert set(ints) == set(range(1, 7))
+    assert np.allclose(np.bincount(ints)[1:] / len(ints), 1 / 6, atol=0.01)
+    assert np.all(rnd.integers(5, 7, size=100, endpoint=True) <= 7)
+    cars = np.array([rnd.choice(['working', 'faulty'], p=[0.7, 0.3])
+                     for i in range(20_000)])
+    assert abs(np.mean(cars == 'faulty') - 0.3) < 0.015
+    assert 0 <= rnd.random() < 1
+    # Large and unusual requests go to the wrapped generator.
+    assert rnd.random(1000).shape == (1000,)
+    assert rnd.choice(10, size=10, replace=False).tolist() != list(range(10))
+    assert rnd.normal(size=3).shape == (3,)
+    # Kernels accept buffered generators.
+    assert rs.bootstrap(GAINS, np.mean, 100, rng=rnd).shape == (100,)
+
+
+def test_common_patch():
+    ns = {'_QUARTO_SEED': 1014, '_QUARTO_BIT_GENERATOR': 'SFC64',
+          '_QUARTO_RNG_BUFFER': 1000}
+    default_rng = np.random.default_rng
+    try:
+        with open(op.join(SOURCE, '_common.py')) as fobj:
+            exec(fobj.read(), ns)
+        first = np.random.default_rng()
+        assert isinstance(first, rs.BufferedGenerator)
+        assert np.all(first.random(10) ==
+                      np.random.default_rng().random(10))
+        assert isinstance(np.random.default_rng(1), np.random.Generator)
+    finally:
+        np.random.default_rng = default_rng
@@ -0,0 +1,166 @@
+""" Tests for Resampling Stats compiler
+"""
+
+import os.path as op
+import sys
+
+import numpy as np
+
+import pytest
+
+HERE = op.dirname(__file__)
+SOURCE = op.join(HERE, '..', 'source')
+RS_SCRIPTS = op.join(HERE, '..', 'rs_scripts')
+sys.path.append(SOURCE)
+
+from resampling import rss
+
+
+def test_tokenize():
+    assert rss.tokenize("' A comment\nNUMBERS 1,6 a\n") == [
+        ('NUMBERS', ['1,6', 'a'], 2)]
+    # More than one command per line.
+    assert rss.tokenize("SHUFFLE a b TAKE b 1,10 c ' comment") == [
+        ('SHUFFLE', ['a', 'b'], 1),
+        ('TAKE', ['b', '1,10', 'c'], 1)]
+    assert rss.tokenize('DATA (1 2.5 3) d') == [
+        ('DATA', ['(1 2.5 3)', 'd'], 1)]
+    with pytest.raises(rss.RSSError):
+        rss.tokenize('FOO 1 2')
+
+
+def test_parse():
+    statements = rss.parse('REPEAT 10\nIF a >= 2\nSCORE a z\nEND\nEND\n')
+    assert len(statements) == 1
+    assert statements[0].command == 'REPEAT'
+    assert statements[0].body[0].command == 'IF'
+    assert statements[0].body[0].body[0].args == ['a', 'z']
+    for bad in ('END', 'REPEAT 10\nSCORE a z'):
+        with pytest.raises(rss.RSSError):
+            rss.parse(bad)
+
+
+def test_matching_hats():
+    func = rss.compile_file(op.join(RS_SCRIPTS, 'matching_hats.rss'))
+    assert func.__name__ == 'matching_hats'
+    res = func(rng=42)
+    assert res['z'].shape == (1000,)
+    assert np.all(res['z'] <= 6)
+    assert res['kk'] == res['k'] / 1000
+    # Block size does not change the result.
+    small = func(rng=42, block_trials=7)
+    assert np.all(small['z'] == res['z'])
+    # Check against loop as in the chapter code.
+    rnd = np.random.default_rng(43)
+    hats = np.arange(1, 7)
+    loop_z = [np.sum(rnd.permuted(hats) == hats) for i in range(1000)]
+    assert abs(np.mean(loop_z) - np.mean(res['z'])) < 0.15
+
+
+def test_if_mask():
+    # Conditional SCORE only scores trials where condition holds.
+    func = rss.compile_rss("""
+URN 13#1 39#0 deck
+REPEAT 2000
+    SHUFFLE deck deck$
+    TAKE deck$ 1,13 hand
+    COUNT hand =1 spades
+    IF spades >= 5
+        SCORE spades z
+        COPY (1) flag
+    END
+    SCORE spades all
+END
+COUNT all >= 5 k
+""")
+    res = func(rng=1, block_trials=300)
+    assert len(res['z']) == res['k']
+    assert np.all(res['z'] >= 5)
+    assert len(res['all']) == 2000
+
+
+def test_inner_repeat():
+    func = rss.compile_rss("""
+NUMBERS (1 2 3) a
+REPEAT 100
+    REPEAT 5
+        SHUFFLE a a
+        SCORE a t1 t2 t3
+    END
+    MEAN t1 tt1
+    SCORE tt1 z
+    CLEAR t1
+    CLEAR t2
+    CLEAR t3
+    SUM t3 e
+END
+""")
+    res = func(rng=2)
+    assert res['z'].shape == (100,)
+    assert np.all((res['z'] >= 1) & (res['z'] <= 3))
+    # Scoreboards cleared in each trial.
+    assert len(res['t1']) == 0 and res['e'] == 0
+
+
+def test_runs():
+    x = np.array([[0, 0, 1, 1, 1, 0], [1, 0, 1, 0, 1, 0]])
+    assert np.all(rss.runs(x, '>=', 1) == [[3], [6]])
+    assert np.all(rss.runs(x, '>=', 2) == [[2], [0]])
+
+
+def test_undefined():
+    with pytest.raises(rss.RSSError):
+        rss.compile_file(op.join(RS_SCRIPTS, 'pigs1.rss'))()
+
+
+def test_carry_over():
+    # Values carried from one trial to the next cannot be vectorized.
+    for body in ('ADD total 1 total\nSCORE total z',
+                 'GENERATE 1 1,6 a\nIF a > 3\nCOPY (1) big\nEND\n'
+                 'SCORE big z'):
+        with pytest.raises(rss.RSSError):
+            rss.compile_rss(f'NUMBERS 0 total\nNUMBERS 0 big\n'
+                            f'REPEAT 10\n{body}\nEND')
+    # Assigning in the trial before use is fine, as is shuffling in place,
+    # and accumulating in an inner loop.
+    func = rss.compile_rss("""
+NUMBERS 1,6 a
+REPEAT 10
+    SHUFFLE a a
+    NUMBERS 0 total
+    REPEAT 3
+        ADD total 1 total
+    END
+    SCORE total z
+END
+""")
+    assert np.all(func(rng=1)['z'] == 3)
+
+
+def test_score_appends():
+    func = rss.compile_file(op.join(RS_SCRIPTS, 'testing_counts_1_06.rss'))
+    res = func(rng=1)
+    assert res['z'].shape == (2000,)
+    # First loop scores counts of 1500, second loop as well.
+    assert np.all((res['z'] > 500) & (res['z'] < 1000))
+    func = rss.compile_rss('SCORE 1 z\nREPEAT 3\nSCORE 2 z\nEND')
+    assert func()['z'].tolist() == [1, 2, 2, 2]
+
+
+def test_if_new_variable():
+    # A variable first assigned in IF is undefined where IF is False.
+    res = rss.compile_rss('NUMBERS 1 a\nIF a > 5\nCOPY (1) flag\nEND')()
+    assert np.isnan(res['flag'])
+    res = rss.compile_rss('NUMBERS 9 a\nIF a > 5\nCOPY (1) flag\nEND')()
+    assert res['flag'] == 1
+    func = rss.compile_rss("""
+REPEAT 20
+    GENERATE 1 1,2 a
+    IF a = 1
+        COPY (7) flag
+    END
+    SCORE a z
+END
+""")
+    res = func(rng=3)
+    assert res['flag'] == 7 if res['z'][-1] == 1 else np.isnan(res['flag'])
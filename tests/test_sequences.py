@@ -0,0 +1,80 @@
+""" Tests for sequence kernels
+"""
+
+import os.path as op
+import sys
+
+import numpy as np
+
+HERE = op.dirname(__file__)
+SOURCE = op.join(HERE, '..', 'source')
+sys.path.append(SOURCE)
+
+import resampling as rs
+
+
+def _loop_runs(seq):
+    # Values and lengths of runs, by walking along the sequence.
+    runs = []
+    for v in seq:
+        if runs and runs[-1][0] == v:
+            runs[-1][1] += 1
+        else:
+            runs.append([v, 1])
+    return runs
+
+
+def test_runs():
+    x = np.random.default_rng(0).integers(0, 3, size=(500, 30))
+    loop_runs = [_loop_runs(row) for row in x]
+    rows, values, lengths = rs.run_lengths(x)
+    assert len(rows) == sum(len(r) for r in loop_runs)
+    assert np.all(rs.count_runs(x) == [len(r) for r in loop_runs])
+    assert np.all(rs.count_runs(x, 2, min_length=2) ==
+                  [sum(v == 2 and n >= 2 for v, n in r) for r in loop_runs])
+    assert np.all(rs.longest_run(x) ==
+                  [max(n for v, n in r) for r in loop_runs])
+    assert np.all(rs.longest_run(x, 1) ==
+                  [max([n for v, n in r if v == 1] + [0])
+                   for r in loop_runs])
+
+
+def test_first_and_waiting():
+    succ = np.random.default_rng(1).random((1000, 20)) < 0.2
+    for k in (1, 3):
+        expected = []
+        for row in succ:
+            cum = np.cumsum(row)
+            expected.append(np.argmax(cum >= k) + 1 if cum[-1] >= k else -1)
+        assert np.all(rs.waiting_time(succ, k) == expected)
+    assert np.all(rs.first_index(succ) ==
+                  np.where(succ.any(axis=1), np.argmax(succ, axis=1), -1))
+
+
+def test_gamblers_ruin():
+    steps = np.random.default_rng(2).choice([-1, 1], size=(2000, 200))
+    indices, hit_upper = rs.barrier_crossing(steps, 0, 10, start=3)
+    for row, ind, up in zip(steps, indices, hit_upper):
+        total = 3
+        for i, step in enumerate(row):
+            total += step
+            if total in (0, 10):
+                assert (ind, up) == (i, total == 10)
+                break
+        else:
+            assert (ind, up) == (-1, False)
+    # Fair game; probability of reaching 10 before 0 is 3 / 10.
+    assert abs(np.mean(hit_upper) - 0.3) < 0.04
+
+
+def test_sequence_stat():
+    def flips(rng, n, seq_len):
+        return rng.integers(0, 2, size=(n, seq_len))
+
+    res = rs.sequence_stat(flips, rs.longest_run, 1000, 50, rng=3)
+    small = rs.sequence_stat(flips, rs.longest_run, 1000, 50, rng=3,
+                             max_elements=200)
+    assert np.all(res == rs.longest_run(flips(np.random.default_rng(3),
+                                              1000, 50)))
+    assert small.shape == (1000,)
+    assert np.all(small >= 1)
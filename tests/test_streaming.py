@@ -0,0 +1,108 @@
+""" Tests for streaming accumulators
+"""
+
+import os.path as op
+import sys
+
+import numpy as np
+
+HERE = op.dirname(__file__)
+SOURCE = op.join(HERE, '..', 'source')
+sys.path.append(SOURCE)
+
+import resampling as rs
+
+
+def _split_update(acc, values, n_parts=7):
+    # Update separate accumulators with parts of `values`, then merge.
+    parts = [acc.empty().update(p) for p in np.array_split(values, n_parts)]
+    for part in parts:
+        acc.merge(part)
+    return acc
+
+
+def test_moments():
+    values = np.random.default_rng(0).normal(10, 2, size=10_001)
+    for acc in (rs.Moments().update(values),
+                _split_update(rs.Moments(), values)):
+        assert acc.n == len(values)
+        assert np.isclose(acc.mean, np.mean(values))
+        assert np.isclose(acc.var(), np.var(values))
+        assert np.isclose(acc.std(1), np.std(values, ddof=1))
+
+
+def test_tail_count():
+    values = np.arange(-5, 20)
+    for op_name, expected in (('<=', 11), ('>', 14), ('==', 1)):
+        acc = _split_update(rs.TailCount(op_name, 5), values)
+        assert acc.count == expected
+        assert acc.proportion == expected / len(values)
+
+
+def test_int_histogram():
+    values = np.random.default_rng(1).integers(-3, 12, size=1000)
+    acc = _split_update(rs.IntHistogram(), values)
+    vals, counts = np.unique(values, return_counts=True)
+    assert np.all(acc.values == vals)
+    assert np.all(acc.counts == counts)
+    assert np.all(acc.quantile([0.025, 0.5, 0.975]) ==
+                  np.quantile(values, [0.025, 0.5, 0.975], method='lower'))
+    hist = _split_update(rs.Histogram(np.arange(-3, 13)), values)
+    assert np.all(hist.counts == counts)
+
+
+def test_quantile_sketch():
+    values = np.random.default_rng(2).normal(size=200_000)
+    qs = [0.01, 0.25, 0.5, 0.75, 0.99]
+    acc = _split_update(rs.QuantileSketch(200), values)
+    assert acc.n == len(values)
+    assert acc.size < 5000
+    # Rank error should be small.
+    est_ranks = (np.searchsorted(np.sort(values), acc.quantile(qs)) /
+                 len(values))
+    assert np.allclose(est_ranks, qs, atol=0.02)
+
+
+def _ints(rng, n):
+    return rng.integers(0, 10, size=n)
+
+
+def test_simulate_stream():
+    accs = rs.simulate_stream(_ints, 1050, [rs.IntHistogram(),
+                                            rs.TailCount('>=', 5)],
+                              seed=3, chunk_trials=100)
+    results = rs.run_trials(_ints, 1050, seed=3, n_workers=1,
+                            chunk_trials=100, dtype=int)
+    assert np.all(accs[0].counts == np.bincount(results))
+    assert accs[1].count == np.sum(results >= 5)
+    par_accs = rs.simulate_stream(_ints, 1050, [rs.IntHistogram()],
+                                  seed=3, n_workers=2, chunk_trials=100)
+    assert np.all(par_accs[0].counts == accs[0].counts)
+
+
+def _n_tails(rng, n):
+    return np.sum(rng.integers(0, 2, size=(n, 20)), axis=1)
+
+
+def test_adaptive():
+    # Far from decision level; stop after first batch.
+    res = rs.adaptive_proportion(_n_tails, '>=', 18, level=0.05,
+                                 batch_trials=1000, rng=0)
+    assert res.stop_reason == 'decision'
+    assert res.n_trials == 1000
+    assert res.interval[1] < 0.05
+    res = rs.adaptive_proportion(_n_tails, '>=', 14, tol=0.005,
+                                 batch_trials=1000, rng=0)
+    assert res.stop_reason == 'precision'
+    assert res.half_width <= 0.005
+    assert res.interval[0] <= res.estimate <= res.interval[1]
+    assert res.n_trials == res.accumulator.n
+    res = rs.adaptive_mean(_n_tails, tol=1e-6, batch_trials=1000,
+                           max_trials=3000, rng=0)
+    assert (res.stop_reason, res.n_trials) == ('trials', 3000)
+    assert abs(res.estimate - 10) < 0.2
+    res = rs.adaptive_quantile(_n_tails, 0.5, tol=0.5, batch_trials=1000,
+                               rng=0)
+    assert res.estimate == 10
+    res = rs.adaptive_mean(_n_tails, tol=1e-6, max_seconds=0, rng=0)
+    assert res.stop_reason == 'time'
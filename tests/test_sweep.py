@@ -0,0 +1,67 @@
+""" Tests for parameter sweeps
+"""
+
+import os.path as op
+import sys
+
+import numpy as np
+
+HERE = op.dirname(__file__)
+SOURCE = op.join(HERE, '..', 'source')
+sys.path.append(SOURCE)
+
+import resampling as rs
+
+
+def _draw(rng, n, max_size):
+    # Standard normal values for two groups, in last axis.
+    return rng.normal(size=(n, max_size, 2))
+
+
+def _rejects(sample, sampsize, effect):
+    # One-sided z test for difference in means, known SD of 1.
+    means = np.mean(sample, axis=1)
+    diffs = means[:, 1] + effect - means[:, 0]
+    return diffs / np.sqrt(2 / sampsize) > 1.645
+
+
+def _draw_2d(rng, n, max_size):
+    return rng.normal(size=(n, max_size))
+
+
+def _first(sample, sampsize):
+    return sample[:, -1]
+
+
+def test_nested_samples():
+    points, results = rs.sweep_results(_draw_2d, _first,
+                                       {'sampsize': [1, 3, 5]}, 100, seed=1,
+                                       chunk_trials=30)
+    assert [p['sampsize'] for p in points] == [1, 3, 5]
+    # Same block for all points; each sample is a prefix of the block.
+    block = np.concatenate(
+        [_draw_2d(np.random.default_rng(s), n, 5) for s, n in
+         zip(np.random.SeedSequence(1).spawn(4), [30, 30, 30, 10])])
+    assert np.all(results == block[:, [0, 2, 4]].T)
+    # Same results with several workers.
+    for n_workers in (1, 2):
+        assert np.all(rs.sweep_results(
+            _draw_2d, _first, {'sampsize': [1, 3, 5]}, 100, seed=1,
+            n_workers=n_workers, chunk_trials=30)[1] == results)
+
+
+def test_power_curves():
+    grid = {'sampsize': [5, 10, 20, 40], 'effect': [0, 0.5, 1]}
+    table = rs.sweep(_draw, _rejects, grid, 4000, seed=2)
+    assert list(table.columns) == ['sampsize', 'effect', 'estimate', 'se']
+    assert len(table) == 12
+    power = table.pivot(index='sampsize', columns='effect',
+                        values='estimate')
+    # False positive rate near 0.05 for zero effect.
+    assert np.allclose(power[0], 0.05, atol=0.015)
+    # Power increases with sample size and effect size; with common random
+    # numbers, it does so without simulation noise.
+    assert np.all(np.diff(power[0.5]) > 0)
+    assert np.all(np.diff(power[1]) >= 0)
+    assert np.all(power[1] >= power[0.5])
+    assert np.all(table['se'] > 0)
@@ -0,0 +1,65 @@
+""" Tests for variance reduction
+"""
+
+import os.path as op
+import sys
+
+import numpy as np
+import pytest
+from scipy import stats
+
+HERE = op.dirname(__file__)
+SOURCE = op.join(HERE, '..', 'source')
+sys.path.append(SOURCE)
+
+import resampling as rs
+
+
+def _n_tails(u):
+    return np.sum(u < 0.5, axis=1)
+
+
+def _tails_ge_14(u):
+    return _n_tails(u) >= 14
+
+
+def test_uniform_estimators():
+    expected = stats.binom(20, 0.5).sf(13)
+    plain = rs.plain(_tails_ge_14, 100_000, 20, rng=0)
+    assert abs(plain.estimate - expected) < 4 * plain.se
+    assert np.isclose(plain.efficiency, 1)
+    for func in (rs.antithetic, rs.stratified):
+        est = func(_tails_ge_14, 100_000, 20, rng=0)
+        assert est.n_trials == 100_000
+        assert abs(est.estimate - expected) < 4 * est.se
+        # Large reduction in variance for counts, which are linear in the
+        # draws.
+        est = func(_n_tails, 100_000, 20, rng=0)
+        assert abs(est.estimate - 10) <= 4 * est.se
+        assert est.efficiency > 10
+
+
+def test_control_variate():
+    rng = np.random.default_rng(1)
+    # Number of girls in 10 from 20 girls and 20 boys.
+    counts = rng.hypergeometric(20, 20, 10, size=50_000)
+    values = counts >= 8
+    est = rs.control_variate(values, counts, 10 * 20 / 40)
+    expected = stats.hypergeom(40, 20, 10).sf(7)
+    assert abs(est.estimate - expected) < 4 * est.se
+    assert est.ess > est.n_trials
+
+
+def test_binomial_tail():
+    for n, p, k, op in ((100, 0.5, 70, '>='),
+                        (1500, 0.5, 840, '>='),
+                        (50, 0.3, 5, '<=')):
+        dist = stats.binom(n, p)
+        expected = dist.sf(k - 1) if op == '>=' else dist.cdf(k)
+        est = rs.binomial_tail(n, p, k, op, n_trials=20_000, rng=2)
+        assert abs(est.estimate - expected) < 4 * est.se
+        assert abs(est.estimate - expected) / expected < 0.05
+        # At least 10 times more efficient than plain simulation.
+        assert est.efficiency > 10
+    with pytest.raises(ValueError):
+        rs.binomial_tail(10, 0.5, 8, '>')